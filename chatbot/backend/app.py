@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 import aws_cdk as cdk
 from stacks.s3_stack import S3Stack
+from stacks.dynamodb_stack import DynamoDBStack
 from stacks.bedrock_stack import BedrockStack
 from stacks.iam_roles_stack import RolesStack
 from stacks.api_gateway_stack import ApiGatewayStack
+from stacks.websocket_stack import WebSocketStack
 from stacks.lambda_layer_stack import LambdaLayerStack
 from stacks import environment as env
 import os
@@ -14,11 +16,14 @@ cdk_env = cdk.Environment(region=os.environ.get("CDK_DEFAULT_REGION", "us-east-1
 
 s3_stack = S3Stack(app, f"{env.PROJECT_NAME}-S3Stack", env=cdk_env)
 
+dynamodb_stack = DynamoDBStack(app, f"{env.PROJECT_NAME}-DynamoDBStack", env=cdk_env)
+
 role_stack = RolesStack(
     app,
     f"{env.PROJECT_NAME}-RoleStack",
     env=cdk_env,
     storage=s3_stack,
+    database=dynamodb_stack,
 )
 
 layer_stack = LambdaLayerStack(app, f"{env.PROJECT_NAME}-LayerStack", env=cdk_env)
@@ -31,22 +36,37 @@ bedrock_stack = BedrockStack(
     env=cdk_env,
 )
 
+websocket_stack = WebSocketStack(
+    app,
+    f"{env.PROJECT_NAME}-WebSocketStack",
+    roles=role_stack,
+    database=dynamodb_stack,
+    env=cdk_env,
+)
+
 api_gateway_stack = ApiGatewayStack(
     app,
     f"{env.PROJECT_NAME}-ApiGatewayStack",
     storage=s3_stack,
     roles=role_stack,
     bedrock=bedrock_stack,
+    database=dynamodb_stack,
+    websocket=websocket_stack,
     env=cdk_env,
 )
 
 # Dependencies
 role_stack.add_dependency(s3_stack)
+role_stack.add_dependency(dynamodb_stack)
 
 bedrock_stack.add_dependency(s3_stack)
 bedrock_stack.add_dependency(role_stack)
 
+websocket_stack.add_dependency(layer_stack)
+websocket_stack.add_dependency(role_stack)
+
 api_gateway_stack.add_dependency(layer_stack)
+api_gateway_stack.add_dependency(websocket_stack)
 api_gateway_stack.add_dependency(bedrock_stack)
 
 # Frontend is handled by frontend_app.py
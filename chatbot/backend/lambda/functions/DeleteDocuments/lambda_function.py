@@ -1,28 +1,90 @@
-import boto3
+# First, so INIT_PROFILE=true times every import below
+from chatbot_common import init_profile
+
+init_profile.start()
+
 import os
 import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from botocore.client import ClientError
+from urllib.parse import unquote
+from botocore.exceptions import ClientError
 from aws_lambda_powertools import Logger
+from chatbot_common.clients import lazy_client
+from chatbot_common.documents import is_metadata_key, metadata_key
+from chatbot_common.jobs import (
+    get_job_store,
+    JOB_STATUS_RUNNING,
+    JOB_STATUS_SUCCEEDED,
+    JOB_STATUS_FAILED,
+)
+from chatbot_common.metrics import count, instrument, new_metrics, timed
+from chatbot_common.priming import prime
+from chatbot_common.tracing import new_tracer, stage
 
 logger = Logger()
+metrics = new_metrics()
+tracer = new_tracer()
 
 KNOWLEDGE_BASE_ID = os.environ.get("KNOWLEDGE_BASE_ID")
 DATA_SOURCE_ID = os.environ.get("DATA_SOURCE_ID")
 KNOWLEDGE_BASE_BUCKET = os.environ.get("KNOWLEDGE_BASE_BUCKET")
+DELETE_JOBS_BUCKET = os.environ.get("DELETE_JOBS_BUCKET")
+
+# Requests with more documents than this are handed off to an async job
+ASYNC_DELETE_THRESHOLD = int(os.environ.get("ASYNC_DELETE_THRESHOLD", "1000"))
+S3_DELETE_BATCH_SIZE = 1000  # S3 DeleteObjects hard limit
+MAX_DELETE_WORKERS = 8
+
+# Documents in these states have vectors in the index that need a resync to remove
+RESYNC_REQUIRED_STATUSES = {
+    "INDEXED",
+    "PARTIALLY_INDEXED",
+    "METADATA_PARTIALLY_INDEXED",
+}
 
-S3_CLIENT = boto3.client("s3")
-BEDROCK_AGENT_CLIENT = boto3.client("bedrock-agent")
+DELETE_JOB_TYPE = "DELETE_DOCUMENTS"
+# Key lists of async delete jobs, kept out of the job record, which DynamoDB
+# caps at 400 KB
+DELETE_JOB_KEYS_PREFIX = "delete-jobs/"
+# Stands in for the bucket when there's none, as in local runs
+DELETE_JOB_KEYS = {}
 
+# Built on first use. Every delete checks index state through Bedrock, but job
+# status polls and async hand-offs build neither it nor S3.
+S3_CLIENT = lazy_client("s3")
+BEDROCK_AGENT_CLIENT = lazy_client("bedrock-agent")
+LAMBDA_CLIENT = lazy_client("lambda")
 
+
+@tracer.capture_lambda_handler
+@instrument(metrics)
 def lambda_handler(event, context):
     try:
+        # Async self-invocation carrying a delete job
+        if "jobId" in event and "httpMethod" not in event:
+            return run_delete_job(event["jobId"])
+
         request_body = json.loads(event.get("body"))
         if not request_body:
             raise Exception("body invalid")
 
+        if event.get("resource", "").endswith("/status"):
+            return get_delete_job_status(request_body["jobId"])
+
         docs_to_be_deleted = request_body.get("documents")
-        response = delete_s3_files(docs_to_be_deleted)
+        s3_keys = [extract_s3_key(doc) for doc in docs_to_be_deleted]
+
+        if len(s3_keys) > ASYNC_DELETE_THRESHOLD:
+            job = start_delete_job(s3_keys, context.function_name)
+            return create_response(
+                202,
+                "Accepted",
+                {"jobId": job["jobId"], "status": job["status"]},
+            )
+
+        response = delete_s3_files(s3_keys)
         formatted_response = format_response(response)
 
         return create_response(200, "Success", formatted_response)
@@ -49,28 +111,173 @@ def lambda_handler(event, context):
         )
 
 
-def delete_s3_files(docs):
-    sync_required = False
-    delete_objects = []
+def extract_s3_key(doc):
+    return doc["s3Key"].rsplit("/", 3)[-1]
+
 
-    for doc in docs:
-        if doc["status"] in ["INDEXED", "PARTIALLY_INDEXED"]:
-            sync_required = True
+def start_delete_job(s3_keys, function_name):
+    """Record a delete job and hand it to an async invocation of this function
 
-        s3_key = doc["s3Key"].rsplit("/", 3)[-1]
-        delete_object = {"Key": s3_key}
-        delete_objects.append(delete_object)
+    The key list is written to S3 and the job record only points at it, a
+    large delete's keys can exceed both the async invoke payload and the
+    DynamoDB item size limits.
+    """
+    s3_keys_key = f"{DELETE_JOB_KEYS_PREFIX}{uuid.uuid4()}.json"
+    save_delete_job_keys(s3_keys_key, s3_keys)
+
+    job = get_job_store().create(
+        DELETE_JOB_TYPE, {"documentCount": len(s3_keys), "s3KeysKey": s3_keys_key}
+    )
 
-    response = S3_CLIENT.delete_objects(
-        Bucket=KNOWLEDGE_BASE_BUCKET, Delete={"Objects": delete_objects}
+    LAMBDA_CLIENT.invoke(
+        FunctionName=function_name,
+        InvocationType="Event",
+        Payload=json.dumps({"jobId": job["jobId"]}),
     )
 
+    logger.info(f"Started delete job {job['jobId']} for {len(s3_keys)} documents")
+
+    return job
+
+
+def save_delete_job_keys(s3_keys_key, s3_keys):
+    if not DELETE_JOBS_BUCKET:
+        DELETE_JOB_KEYS[s3_keys_key] = list(s3_keys)
+        return
+
+    S3_CLIENT.put_object(
+        Bucket=DELETE_JOBS_BUCKET,
+        Key=s3_keys_key,
+        Body=json.dumps(s3_keys).encode("utf-8"),
+    )
+
+
+def load_delete_job_keys(s3_keys_key):
+    if not DELETE_JOBS_BUCKET:
+        return list(DELETE_JOB_KEYS[s3_keys_key])
+
+    response = S3_CLIENT.get_object(Bucket=DELETE_JOBS_BUCKET, Key=s3_keys_key)
+    return json.loads(response["Body"].read())
+
+
+def run_delete_job(job_id):
+    job_store = get_job_store()
+    job = job_store.get(job_id)
+
+    # Expired or never recorded, there's nothing to delete against
+    if not job:
+        logger.warning(f"Delete job {job_id} not found")
+        return None
+
+    job_store.update(job_id, status=JOB_STATUS_RUNNING)
+
+    # Failures are recorded instead of raised so Lambda doesn't retry the
+    # invocation and run the delete again
+    try:
+        s3_keys = load_delete_job_keys(job["payload"]["s3KeysKey"])
+        response = delete_s3_files(s3_keys)
+        result = format_response(response)
+        job_store.update(job_id, status=JOB_STATUS_SUCCEEDED, result=result)
+        return result
+
+    except ClientError as e:
+        logger.exception(f"Delete job {job_id} failed")
+        error = e.response["Error"]["Message"]
+
+    except Exception as e:
+        logger.exception(f"Delete job {job_id} failed")
+        error = str(e)
+
+    job_store.update(job_id, status=JOB_STATUS_FAILED, error=error)
+
+
+def get_delete_job_status(job_id):
+    job = get_job_store().get(job_id)
+
+    if not job or job["jobType"] != DELETE_JOB_TYPE:
+        return create_response(404, "Job not found", {"jobId": job_id})
+
+    payload = {"jobId": job_id, "status": job["status"]}
+    if job.get("result"):
+        payload.update(job["result"])
+    if job.get("error"):
+        payload["error"] = job["error"]
+
+    return create_response(200, "Success", payload)
+
+
+def delete_s3_files(s3_keys):
+    count(metrics, "DeleteDocumentCount", len(s3_keys))
+
+    # Check index state before the objects disappear from the bucket
+    with timed(metrics, "IndexCheck"), stage(tracer, "index_check"):
+        sync_required = is_sync_required(s3_keys)
+
+    # Metadata sidecars go with their documents
+    object_keys = [key for s3_key in s3_keys for key in (s3_key, metadata_key(s3_key))]
+
+    batches = [
+        object_keys[i : i + S3_DELETE_BATCH_SIZE]
+        for i in range(0, len(object_keys), S3_DELETE_BATCH_SIZE)
+    ]
+
+    with timed(metrics, "S3Delete"), stage(tracer, "s3_delete"), ThreadPoolExecutor(
+        max_workers=MAX_DELETE_WORKERS
+    ) as executor:
+        batch_responses = list(executor.map(delete_s3_batch, batches))
+    count(metrics, "S3DeleteBatches", len(batches))
+
+    response = {"Deleted": [], "Errors": []}
+    for batch_response in batch_responses:
+        response["Deleted"].extend(batch_response.get("Deleted", []))
+        response["Errors"].extend(batch_response.get("Errors", []))
+
+    count(metrics, "DeleteErrors", len(response["Errors"]))
+
     if sync_required:
+        count(metrics, "SyncsTriggered")
         sync_knowledge_base()
 
     return response
 
 
+def delete_s3_batch(s3_keys):
+    return S3_CLIENT.delete_objects(
+        Bucket=KNOWLEDGE_BASE_BUCKET,
+        Delete={"Objects": [{"Key": s3_key} for s3_key in s3_keys]},
+    )
+
+
+def is_sync_required(s3_keys):
+    """Check the knowledge base's own document status instead of trusting the client"""
+    pending = {f"s3://{KNOWLEDGE_BASE_BUCKET}/{s3_key}" for s3_key in s3_keys}
+
+    paginator = BEDROCK_AGENT_CLIENT.get_paginator("list_knowledge_base_documents")
+    pages = paginator.paginate(
+        knowledgeBaseId=KNOWLEDGE_BASE_ID,
+        dataSourceId=DATA_SOURCE_ID,
+        PaginationConfig={"PageSize": 1000},
+    )
+
+    for page in pages:
+        for document in page.get("documentDetails", []):
+            s3_uri = unquote(
+                document.get("identifier", {}).get("s3", {}).get("uri", "")
+            )
+            if s3_uri not in pending:
+                continue
+
+            if document.get("status") in RESYNC_REQUIRED_STATUSES:
+                return True
+
+            pending.discard(s3_uri)
+
+        if not pending:
+            break
+
+    return False
+
+
 def sync_knowledge_base():
     response = BEDROCK_AGENT_CLIENT.start_ingestion_job(
         knowledgeBaseId=KNOWLEDGE_BASE_ID,
@@ -80,9 +287,15 @@ def sync_knowledge_base():
 
 
 def format_response(resp):
-    deleted = [item["Key"] for item in resp.get("Deleted", [])]
+    deleted = [
+        item["Key"]
+        for item in resp.get("Deleted", [])
+        if not is_metadata_key(item["Key"])
+    ]
 
-    failed = [err["Key"] for err in resp.get("Errors", [])]
+    failed = [
+        err["Key"] for err in resp.get("Errors", []) if not is_metadata_key(err["Key"])
+    ]
 
     return {
         "success": len(failed) == 0,
@@ -107,3 +320,15 @@ def create_response(status_code, message, payload=None):
         },
         "body": json.dumps(response_body),
     }
+
+
+# Last, so everything the first request needs is defined
+PRIMING = prime(
+    {
+        S3_CLIENT: ["DeleteObjects", "GetObject", "PutObject"],
+        BEDROCK_AGENT_CLIENT: ["ListKnowledgeBaseDocuments", "StartIngestionJob"],
+        LAMBDA_CLIENT: ["Invoke"],
+    }
+)
+if PRIMING:
+    logger.info("Primed for the first request", extra=PRIMING)
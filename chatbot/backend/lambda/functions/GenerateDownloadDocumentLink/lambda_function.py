@@ -1,12 +1,25 @@
+# First, so INIT_PROFILE=true times every import below
+from chatbot_common import init_profile
+
+init_profile.start()
+
 import json
-import boto3
 from aws_lambda_powertools import Logger
-from botocore.client import Config, ClientError
-
-S3_CLIENT = boto3.client("s3", config=Config(signature_version="s3v4"))
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from chatbot_common.clients import lazy_client
+from chatbot_common.metrics import instrument, new_metrics, timed
+from chatbot_common.priming import prime
+from chatbot_common.tracing import new_tracer, stage
+
+S3_CLIENT = lazy_client("s3", config=Config(signature_version="s3v4"))
 logger = Logger()
+metrics = new_metrics()
+tracer = new_tracer()
 
 
+@tracer.capture_lambda_handler
+@instrument(metrics)
 def lambda_handler(event, context):
     try:
         request_body = json.loads(event["body"])
@@ -14,7 +27,8 @@ def lambda_handler(event, context):
         action = request_body.get("action", "download")  # "download" or "view"
 
         s3_key = s3_key.replace("%2F", "/")
-        presigned_url = generate_presigned_url(s3_key, action)
+        with timed(metrics, "Presign"), stage(tracer, "presign"):
+            presigned_url = generate_presigned_url(s3_key, action)
 
         formatted_response = format_response(presigned_url)
         logger.info(formatted_response)
@@ -91,3 +105,9 @@ def create_response(status_code, message, payload=None):
             {"statusCode": status_code, "message": message, **payload},
         ),
     }
+
+
+# Last, so everything the first request needs is defined
+PRIMING = prime({S3_CLIENT: ["GetObject"]})
+if PRIMING:
+    logger.info("Primed for the first request", extra=PRIMING)
@@ -1,14 +1,25 @@
-import boto3
+# First, so INIT_PROFILE=true times every import below
+from chatbot_common import init_profile
+
+init_profile.start()
+
 import os
 import json
-from botocore.client import Config
+from botocore.config import Config
 from aws_lambda_powertools import Logger
-from botocore.client import ClientError
+from botocore.exceptions import ClientError
 from datetime import datetime
 import uuid
+from chatbot_common.clients import lazy_client
+from chatbot_common.documents import is_metadata_key, write_metadata
+from chatbot_common.metrics import count, instrument, new_metrics, timed
+from chatbot_common.priming import prime
+from chatbot_common.tracing import new_tracer, stage
 
 KNOWLEDGE_BASE_BUCKET = os.environ.get("KNOWLEDGE_BASE_BUCKET")
-S3_CLIENT = boto3.client("s3", config=Config(signature_version="s3v4"))
+S3_CLIENT = lazy_client("s3", config=Config(signature_version="s3v4"))
+# Carries an upload's tags on the object itself, until its sidecar is written
+TAGS_METADATA_FIELD = "x-amz-meta-tags"
 
 UPLOAD_CONFIGS = {
     "document": {
@@ -21,12 +32,21 @@ UPLOAD_CONFIGS = {
 }
 
 logger = Logger()
+metrics = new_metrics()
+tracer = new_tracer()
 
 
+@tracer.capture_lambda_handler
+@instrument(metrics)
 def lambda_handler(event, context):
     try:
+        # Uploaded object arriving in the bucket, through EventBridge
+        if event.get("detail-type") == "Object Created":
+            return write_upload_metadata(event["detail"])
+
         request_body = json.loads(event["body"])
         files = request_body["files"]
+        count(metrics, "PresignBatchSize", len(files))
 
         results = []
 
@@ -52,19 +72,22 @@ def lambda_handler(event, context):
                 )
 
                 # Generate presigned POST
-                presigned_post = generate_presigned_post(
-                    configs["bucket"],
-                    key,
-                    configs["max_file_size"],
-                    configs["expiration"],
-                    file_type,
-                )
+                with timed(metrics, "Presign"), stage(tracer, "presign"):
+                    presigned_post = generate_presigned_post(
+                        configs["bucket"],
+                        key,
+                        configs["max_file_size"],
+                        configs["expiration"],
+                        file_type,
+                        file_info.get("tags", []),
+                    )
 
                 results.append(
                     {"fileName": file_name, "success": True, **presigned_post}
                 )
 
             except Exception as e:
+                count(metrics, "PresignFailures")
                 results.append(
                     {"fileName": file_name, "success": False, "error": str(e)}
                 )
@@ -104,7 +127,7 @@ def verify_file_extension(file_name, allowed_extensions):
 
 
 def generate_presigned_post(
-    bucket_name, object_name, max_file_size, expiration, content_type: None
+    bucket_name, object_name, max_file_size, expiration, content_type: None, tags=()
 ):
     conditions = [["content-length-range", 0, max_file_size]]
     fields = {}
@@ -113,6 +136,10 @@ def generate_presigned_post(
         conditions.append({"Content-Type": content_type})
         fields["Content-Type"] = content_type
 
+    if tags:
+        fields[TAGS_METADATA_FIELD] = json.dumps(sorted(set(tags)))
+        conditions.append({TAGS_METADATA_FIELD: fields[TAGS_METADATA_FIELD]})
+
     response = S3_CLIENT.generate_presigned_post(
         Bucket=bucket_name,
         Key=object_name,
@@ -124,6 +151,30 @@ def generate_presigned_post(
     return {"url": response["url"], "fields": response["fields"], "key": object_name}
 
 
+def write_upload_metadata(detail):
+    """Write the metadata sidecar of an uploaded document, picked up by the next
+    ingestion and used to scope chat retrieval
+
+    Written on arrival rather than when the link is issued, so abandoned
+    uploads leave nothing behind.
+    """
+    bucket = detail["bucket"]["name"]
+    key = detail["object"]["key"]
+
+    # Sidecar writes raise the same event
+    if is_metadata_key(key):
+        return None
+
+    with timed(metrics, "MetadataWrite"), stage(tracer, "metadata_write"):
+        head = S3_CLIENT.head_object(Bucket=bucket, Key=key)
+        tags = json.loads(head.get("Metadata", {}).get("tags", "[]"))
+        write_metadata(
+            S3_CLIENT, bucket, key, tags, uploaded_at=head["LastModified"].timestamp()
+        )
+
+    return {"key": key, "tags": tags}
+
+
 def create_response(status_code, message, payload=None):
     if not payload:
         payload = {}
@@ -140,3 +191,9 @@ def create_response(status_code, message, payload=None):
         },
         "body": json.dumps(response_body),
     }
+
+
+# Last, so everything the first request needs is defined
+PRIMING = prime({S3_CLIENT: ["HeadObject", "PutObject"]})
+if PRIMING:
+    logger.info("Primed for the first request", extra=PRIMING)
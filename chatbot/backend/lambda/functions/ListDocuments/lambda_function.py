@@ -1,21 +1,31 @@
+# First, so INIT_PROFILE=true times every import below
+from chatbot_common import init_profile
+
+init_profile.start()
+
 import os
-import boto3
 import json
-import uuid
 from botocore.exceptions import ClientError
 from aws_lambda_powertools import Logger
 from datetime import datetime
 from urllib.parse import unquote
+from chatbot_common.clients import lazy_client
+from chatbot_common.documents import document_id, is_metadata_key
+from chatbot_common.metrics import count, instrument, new_metrics, timed
+from chatbot_common.priming import prime
+from chatbot_common.tracing import new_tracer, stage
 
 
 KNOWLEDGE_BASE_ID = os.environ.get("KNOWLEDGE_BASE_ID")
 DATA_SOURCE_ID = os.environ.get("DATA_SOURCE_ID")
 KNOWLEDGE_BASE_BUCKET = os.environ.get("KNOWLEDGE_BASE_BUCKET")
 
-BEDROCK_AGENT_CLIENT = boto3.client("bedrock-agent")
-S3_CLIENT = boto3.client("s3")
+BEDROCK_AGENT_CLIENT = lazy_client("bedrock-agent")
+S3_CLIENT = lazy_client("s3")
 
 logger = Logger()
+metrics = new_metrics()
+tracer = new_tracer()
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -27,19 +37,28 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+@tracer.capture_lambda_handler
+@instrument(metrics)
 def lambda_handler(event, context):
 
     try:
 
-        s3_documents = list_s3_documents()
-        knowledge_base_documents = list_knowledge_base_documents(100)
-        merged_documents = merge_documents(s3_documents, knowledge_base_documents)
-
-        formatted_response = format_response(merged_documents)
-
-        return create_response(
-            200, "Successfully retrieved documents", formatted_response
-        )
+        with timed(metrics, "S3Listing"), stage(tracer, "s3_list"):
+            s3_documents = list_s3_documents()
+        with timed(metrics, "KnowledgeBaseListing"), stage(tracer, "kb_list"):
+            knowledge_base_documents = list_knowledge_base_documents(100)
+        with stage(tracer, "merge"):
+            merged_documents = merge_documents(s3_documents, knowledge_base_documents)
+        count(metrics, "DocumentCount", len(merged_documents))
+        tracer.put_annotation("DocumentCount", len(merged_documents))
+
+        with stage(tracer, "format"):
+            formatted_response = format_response(merged_documents)
+
+        with stage(tracer, "serialize"):
+            return create_response(
+                200, "Successfully retrieved documents", formatted_response
+            )
 
     except ClientError as e:
         http_status = e.response["ResponseMetadata"]["HTTPStatusCode"]
@@ -68,16 +87,18 @@ def list_s3_documents():
     paginator = S3_CLIENT.get_paginator("list_objects_v2")
 
     pages = paginator.paginate(Bucket=KNOWLEDGE_BASE_BUCKET)
+    page_count = 0
 
     for page in pages:
+        page_count += 1
         for obj in page.get("Contents", []):
-            if obj["Key"].endswith("/"):
+            if obj["Key"].endswith("/") or is_metadata_key(obj["Key"]):
                 continue
 
             display_name = obj["Key"].split("/")[-1]
             documents.append(
                 {
-                    "id": str(uuid.uuid4()),
+                    "id": document_id(f"s3://{KNOWLEDGE_BASE_BUCKET}/{obj['Key']}"),
                     "knowledgeBaseId": None,
                     "dataSourceId": None,
                     "status": "NOT_INDEXED",
@@ -88,6 +109,8 @@ def list_s3_documents():
                 }
             )
 
+    count(metrics, "S3ListingPages", page_count)
+    tracer.put_annotation("S3DocumentCount", len(documents))
     logger.info(documents)
 
     return documents
@@ -96,6 +119,7 @@ def list_s3_documents():
 def list_knowledge_base_documents(max_results):
     documents = []
     next_token = None
+    page_count = 0
 
     while True:
         params = {
@@ -108,13 +132,14 @@ def list_knowledge_base_documents(max_results):
             params["nextToken"] = next_token
 
         response = BEDROCK_AGENT_CLIENT.list_knowledge_base_documents(**params)
+        page_count += 1
 
         for document in response.get("documentDetails"):
             s3_uri = document.get("identifier", {}).get("s3", {}).get("uri", "")
             display_name = s3_uri.split("/")[-1]
 
             formatted_doc = {
-                "id": str(uuid.uuid4()),
+                "id": document_id(unquote(s3_uri)),
                 "knowledgeBaseId": document.get("knowledgeBaseId"),
                 "dataSourceId": document.get("dataSourceId"),
                 "status": document.get("status"),
@@ -129,6 +154,9 @@ def list_knowledge_base_documents(max_results):
         if not next_token or len(documents) >= max_results:
             break
 
+    count(metrics, "KnowledgeBaseListingPages", page_count)
+    tracer.put_annotation("KnowledgeBaseDocumentCount", len(documents))
+
     return documents
 
 
@@ -185,3 +213,14 @@ def create_response(status_code, message, payload=None):
             cls=DateTimeEncoder,
         ),
     }
+
+
+# Last, so everything the first request needs is defined
+PRIMING = prime(
+    {
+        S3_CLIENT: ["ListObjectsV2"],
+        BEDROCK_AGENT_CLIENT: ["ListKnowledgeBaseDocuments"],
+    }
+)
+if PRIMING:
+    logger.info("Primed for the first request", extra=PRIMING)
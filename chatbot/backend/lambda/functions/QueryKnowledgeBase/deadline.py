@@ -0,0 +1,30 @@
+import math
+import time
+
+# Time kept back for building and returning the response
+SAFETY_MARGIN_MS = 1500
+
+# API Gateway REST integrations give up after 29 seconds regardless of the function timeout
+API_GATEWAY_TIMEOUT_MS = 29000
+
+
+class Deadline:
+    """Wall clock budget for one invocation, used to size botocore timeouts"""
+
+    def __init__(self, budget_ms):
+        self._expires_at = time.monotonic() + max(budget_ms, 0) / 1000
+
+    @classmethod
+    def from_context(cls, context, limit_ms=None):
+        budget_ms = context.get_remaining_time_in_millis()
+        if limit_ms is not None:
+            budget_ms = min(budget_ms, limit_ms)
+
+        return cls(budget_ms - SAFETY_MARGIN_MS)
+
+    def remaining_seconds(self, reserve_seconds=0):
+        return max(self._expires_at - time.monotonic() - reserve_seconds, 0)
+
+    def timeout_seconds(self, reserve_seconds=0):
+        """Whole seconds available for one call, never below one"""
+        return max(math.floor(self.remaining_seconds(reserve_seconds)), 1)
@@ -0,0 +1,123 @@
+import os
+import time
+
+from chatbot_common.clients import boto3
+from chatbot_common.jobs import to_dynamodb, from_dynamodb, now
+
+FAQ_TOP_QUERIES = 50
+FAQ_LOOKBACK_DAYS = 7
+# Questions asked fewer times than this aren't worth a generation each ingestion
+FAQ_MIN_ASKS = 3
+QUERY_POLL_INTERVAL_SECONDS = 1
+INSIGHTS_FINISHED_STATUSES = {"Complete", "Failed", "Cancelled", "Timeout"}
+
+# QueryKnowledgeBase logs every standalone question it receives
+TOP_QUERIES_INSIGHTS = """filter message = "Standalone question" and ispresent(normalizedQuery)
+| stats count(*) as asks by normalizedQuery
+| filter asks >= {min_asks}
+| sort asks desc
+| limit {limit}"""
+
+
+def top_queries(
+    logs_client,
+    log_group,
+    limit=FAQ_TOP_QUERIES,
+    lookback_days=FAQ_LOOKBACK_DAYS,
+    min_asks=FAQ_MIN_ASKS,
+):
+    """Most frequently asked normalized questions with their counts, busiest first"""
+    end_time = int(time.time())
+    query_id = logs_client.start_query(
+        logGroupName=log_group,
+        startTime=end_time - lookback_days * 24 * 60 * 60,
+        endTime=end_time,
+        queryString=TOP_QUERIES_INSIGHTS.format(min_asks=min_asks, limit=limit),
+    )["queryId"]
+
+    while True:
+        response = logs_client.get_query_results(queryId=query_id)
+        if response["status"] in INSIGHTS_FINISHED_STATUSES:
+            break
+        time.sleep(QUERY_POLL_INTERVAL_SECONDS)
+
+    if response["status"] != "Complete":
+        raise RuntimeError(f"Logs Insights query {query_id} {response['status']}")
+
+    queries = []
+    for row in response["results"]:
+        fields = {field["field"]: field["value"] for field in row}
+        queries.append((fields["normalizedQuery"], int(fields["asks"])))
+
+    return queries
+
+
+class InMemoryFaqStore:
+    """FAQ answers kept in process memory, used locally and in tests"""
+
+    def __init__(self):
+        self._answers = {}
+
+    def get(self, query):
+        item = self._answers.get(query)
+        return dict(item) if item else None
+
+    def put(self, query, response, corpus_version):
+        self._answers[query] = new_answer(query, response, corpus_version)
+
+    def clear(self):
+        self._answers.clear()
+
+
+class DynamoDBFaqStore:
+    """FAQ answers in the FAQ DynamoDB table, keyed by normalized question"""
+
+    def __init__(self, table_name, resource=None):
+        resource = resource or boto3.resource("dynamodb")
+        self._table = resource.Table(table_name)
+
+    def get(self, query):
+        item = self._table.get_item(Key={"query": query}).get("Item")
+        return from_dynamodb(item) if item else None
+
+    def put(self, query, response, corpus_version):
+        self._table.put_item(
+            Item=to_dynamodb(new_answer(query, response, corpus_version))
+        )
+
+    def clear(self):
+        scan_kwargs = {
+            "ProjectionExpression": "#query",
+            "ExpressionAttributeNames": {"#query": "query"},
+        }
+        with self._table.batch_writer() as batch:
+            while True:
+                page = self._table.scan(**scan_kwargs)
+                for item in page.get("Items", []):
+                    batch.delete_item(Key={"query": item["query"]})
+                if "LastEvaluatedKey" not in page:
+                    break
+                scan_kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+
+def new_answer(query, response, corpus_version):
+    return {
+        "query": query,
+        "response": response,
+        "corpusVersion": corpus_version,
+        "createdAt": now(),
+    }
+
+
+_FAQ_STORE = None
+
+
+def get_faq_store():
+    """Return the DynamoDB store when FAQ_TABLE_NAME is set, in-memory otherwise"""
+    global _FAQ_STORE
+
+    if _FAQ_STORE is None:
+        table_name = os.environ.get("FAQ_TABLE_NAME")
+        _FAQ_STORE = DynamoDBFaqStore(table_name) if table_name else InMemoryFaqStore()
+
+    return _FAQ_STORE
@@ -1,19 +1,135 @@
+# First, so INIT_PROFILE=true times every import below
+from chatbot_common import init_profile
+
+init_profile.start()
+
 import uuid
-import boto3
 import json
 import os
 import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from aws_lambda_powertools import Logger
-from botocore.client import ClientError
+from aws_lambda_powertools.metrics import MetricUnit, single_metric
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
 from datetime import datetime, timezone
+from chatbot_common.clients import boto3, lazy_client
+from chatbot_common.jobs import (
+    get_job_store,
+    JOB_STATUS_RUNNING,
+    JOB_STATUS_SUCCEEDED,
+    JOB_STATUS_FAILED,
+)
+from chatbot_common.connections import get_connection_pusher
+from chatbot_common.keyword_index import (
+    get_keyword_index,
+    identifiers,
+    looks_like_identifier,
+)
+from chatbot_common.metrics import (
+    METRICS_NAMESPACE,
+    count,
+    instrument,
+    new_metrics,
+    timed,
+)
+from chatbot_common.tracing import new_tracer, stage
+from chatbot_common.priming import prime, prime_client
+from deadline import Deadline, API_GATEWAY_TIMEOUT_MS, SAFETY_MARGIN_MS
+from resilience import (
+    HedgedCaller,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+)
+from multiquery import split_query, reciprocal_rank_fusion, fan_out_retrieve
+from rerank import rerank
+from packing import estimate_tokens, pack_context
+from routing import ModelRouter, load_model_tiers
+from faq import get_faq_store, top_queries
+from working_set import (
+    get_working_set_store,
+    coverage,
+    merge_chunks,
+    MIN_COVERAGE,
+)
 
 
 logger = Logger()
+metrics = new_metrics()
+tracer = new_tracer()
 
 KNOWLEDGE_BASE_ID = os.environ.get("KNOWLEDGE_BASE_ID")
 MODEL_ARN = os.environ.get("MODEL_ARN")
+# Cheap lookups go to a small model, synthesis questions to a large one
+MODEL_ROUTER = ModelRouter(load_model_tiers(os.environ.get("MODEL_TIERS"), MODEL_ARN))
+
+CHAT_JOB_TYPE = "CHAT"
+
+NUMBER_OF_RESULTS = 10  # Increased for better citations
+# Searches scoped to pinned documents or tags need fewer chunks
+SCOPED_NUMBER_OF_RESULTS = 5
+# Multi-query mode retrieves per sub-query and generates from the fused top-k only
+MULTI_QUERY_MODE = os.environ.get("MULTI_QUERY_MODE", "false").lower() == "true"
+FUSED_NUMBER_OF_RESULTS = 6
+# Fused chunks handed to the reranker, the packer then fits them to the context budget
+RERANK_CANDIDATES = 20
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "2000"))
+KEYWORD_NUMBER_OF_RESULTS = 10
+GENERATION_MAX_TOKENS = 2048
+# Converse mode answers every turn, follow-ups included, from the message history
+CONVERSE_MODE = os.environ.get("CONVERSE_MODE", "false").lower() == "true"
+MAX_HISTORY_MESSAGES = 20
+CONNECT_TIMEOUT_SECONDS = 2
+# Time kept back from generation so a retrieve-only answer can still be returned
+FALLBACK_RESERVE_SECONDS = 4
+FALLBACK_MAX_PASSAGES = 3
+FALLBACK_SNIPPET_LENGTH = 300
+
+# Recent first-turn answers, served while the circuit breaker is open
+ANSWER_CACHE_SIZE = 128
+ANSWER_CACHE = OrderedDict()
+# Stop precomputing FAQ answers with this much of the invocation left
+FAQ_JOB_RESERVE_MS = 30000
+
+PROMPT_PREAMBLE = "You are a helpful AI assistant. Use ONLY the following context to answer the user's question accurately and helpfully."
+
+PROMPT_INSTRUCTIONS = """IMPORTANT INSTRUCTIONS:
+- Base your answer ONLY on the provided context
+- For every fact or piece of information you mention, reference the specific source document
+- If you cannot find the answer in the provided context, clearly state that the information is not available in the retrieved documents
+- Structure your response clearly with proper citations
+- Use markdown formatting for better readability
+
+Please provide a helpful and accurate response based on the retrieved context."""
+
+SEARCH_RESULTS_TEMPLATE = "Retrieved context: $search_results$"
+QUERY_TEMPLATE = "User question: $query$"
+CONTEXT_TEMPLATE = f"{SEARCH_RESULTS_TEMPLATE}\n\n{QUERY_TEMPLATE}"
 
-BEDROCK_AGENT_RUNTIME_CLIENT = boto3.client("bedrock-agent-runtime")
+PROMPT_TEMPLATE = f"{PROMPT_PREAMBLE}\n\n{CONTEXT_TEMPLATE}\n\n{PROMPT_INSTRUCTIONS}"
+
+# Converse sends the instructions then the retrieved context as the system
+# prompt, so follow-ups answered from the same working set share a cached prefix
+SYSTEM_PROMPT = f"{PROMPT_PREAMBLE}\n\n{PROMPT_INSTRUCTIONS}"
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+# Bedrock doesn't cache a prefix shorter than this
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+BEDROCK_CALLER = HedgedCaller(
+    breaker=CircuitBreaker(
+        throttle_threshold=int(os.environ.get("BREAKER_THROTTLE_THRESHOLD", "5")),
+        cooldown_seconds=int(os.environ.get("BREAKER_COOLDOWN_SECONDS", "30")),
+    ),
+    hedge_percentile=int(os.environ.get("HEDGE_PERCENTILE", "95")),
+)
+
+# Async chat jobs and the FAQ job only
+LAMBDA_CLIENT = lazy_client("lambda")
+LOGS_CLIENT = lazy_client("logs")
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -37,17 +153,42 @@ def clean_citation_markers(text):
     return cleaned_text
 
 
+@tracer.capture_lambda_handler
+@instrument(metrics)
 def lambda_handler(event, context):
 
     try:
 
-        request_body = json.loads(event["body"])
-        user_query, session_id = extract_details(request_body)
+        # Async self-invocation carrying a chat job
+        if "jobId" in event and "httpMethod" not in event:
+            return run_chat_job(
+                event["jobId"],
+                event["request"],
+                event.get("connectionId"),
+                Deadline.from_context(context),
+            )
 
-        bedrock_response = query_knowledge_base(user_query, session_id)
-        formatted_response = format_response(bedrock_response)
+        # Async invocation after an ingestion completes
+        if "precomputeAnswers" in event and "httpMethod" not in event:
+            return precompute_faq_answers(event["precomputeAnswers"], context)
+
+        with stage(tracer, "parse"):
+            request_body = json.loads(event["body"])
 
-        return create_response(200, "Success", formatted_response)
+        if event.get("resource", "").endswith("/status"):
+            return get_chat_job_status(request_body["jobId"])
+
+        if request_body.get("async"):
+            job = start_chat_job(request_body, context.function_name)
+            return create_response(
+                202, "Accepted", {"jobId": job["jobId"], "status": job["status"]}
+            )
+
+        deadline = Deadline.from_context(context, API_GATEWAY_TIMEOUT_MS)
+        formatted_response = run_chat(request_body, deadline)
+
+        with stage(tracer, "serialize"):
+            return create_response(200, "Success", formatted_response)
 
     except ClientError as e:
         http_status = e.response["ResponseMetadata"]["HTTPStatusCode"]
@@ -71,44 +212,478 @@ def lambda_handler(event, context):
         )
 
 
+def run_chat(request_body, deadline, on_delta=None):
+    """Answer a chat request, on_delta receives the answer text as it's generated
+
+    Cached, precomputed and fallback answers are returned whole.
+    """
+    user_query, session_id, scope = extract_details(request_body)
+
+    if is_standalone_question(request_body, session_id, scope):
+        # Mined by the FAQ job, see faq.top_queries
+        logger.info(
+            "Standalone question",
+            extra={"normalizedQuery": normalize_query(user_query)},
+        )
+        faq_response = get_faq_answer(user_query)
+        if faq_response:
+            return faq_response
+
+    try:
+        bedrock_response = generate_answer(
+            request_body, user_query, session_id, deadline, scope, on_delta
+        )
+
+    except (ConnectTimeoutError, ReadTimeoutError, DeadlineExceededError):
+        logger.warning("Generation timed out, answering with retrieved passages")
+        count(metrics, "FallbackAnswers")
+        retrieval_results = fallback_passages(user_query, deadline, scope)
+        return format_fallback_response(retrieval_results, session_id)
+
+    except CircuitOpenError:
+        logger.warning("Bedrock circuit breaker open", extra=BEDROCK_CALLER.stats())
+        cached_response = None if scope else get_cached_answer(user_query, session_id)
+        if cached_response:
+            return cached_response
+
+        count(metrics, "FallbackAnswers")
+        retrieval_results = fallback_passages(user_query, deadline, scope)
+        return format_fallback_response(retrieval_results, session_id)
+
+    remember_retrieved_chunks(bedrock_response, scope)
+
+    with stage(tracer, "format"):
+        formatted_response = format_response(bedrock_response)
+
+    if not session_id and not scope:
+        cache_answer(user_query, formatted_response)
+
+    logger.info("Bedrock caller stats", extra=BEDROCK_CALLER.stats())
+
+    return formatted_response
+
+
+def generate_answer(
+    request_body, user_query, session_id, deadline, scope, on_delta=None
+):
+    """Pick the cheapest retrieval path that suits the question"""
+    depth = session_depth(request_body)
+
+    if session_id:
+        working_set = lookup_working_set(session_id)
+        working_set_response = answer_from_working_set(
+            request_body, user_query, working_set, deadline, scope, depth, on_delta
+        )
+        if working_set_response:
+            return {**working_set_response, "sessionId": session_id}
+
+        if working_set and working_set.get("detached"):
+            # The Bedrock session never saw the turns answered from the working
+            # set, so the conversation carries on with its own history
+            bedrock_response = converse_knowledge_base(
+                request_body, deadline, scope, depth, on_delta
+            )
+            return {**bedrock_response, "sessionId": session_id}
+
+    if not session_id and looks_like_identifier(user_query):
+        # Exact codes and part numbers match lexically, skip the vector round trip.
+        # Only chunks naming the identifier count, otherwise retrieve as usual.
+        keyword_results = keyword_search(
+            user_query, scope, required_terms=identifiers(user_query)
+        )
+        if keyword_results:
+            with timed(metrics, "Rerank"), stage(tracer, "rerank"):
+                passages = rerank(
+                    user_query, keyword_results, max_results=FUSED_NUMBER_OF_RESULTS
+                )
+            logger.info(
+                "Answering from keyword index", extra={"keywordChunks": len(passages)}
+            )
+            return generate_from_passages(
+                user_query, passages, deadline, depth, on_delta=on_delta
+            )
+
+    if use_multi_query(request_body, session_id):
+        return multi_query_knowledge_base(user_query, deadline, scope, depth, on_delta)
+
+    if use_converse(request_body, session_id):
+        return converse_knowledge_base(request_body, deadline, scope, depth, on_delta)
+
+    return query_knowledge_base(
+        user_query, session_id, deadline, scope, depth, on_delta
+    )
+
+
+def lookup_working_set(session_id):
+    try:
+        with timed(metrics, "WorkingSetLookup"), stage(tracer, "working_set_lookup"):
+            return get_working_set_store().get(session_id)
+    except ClientError:
+        logger.exception("Working set lookup failed")
+        return None
+
+
+def answer_from_working_set(
+    request_body, user_query, working_set, deadline, scope, depth, on_delta=None
+):
+    """Answer a follow-up from the chunks its session already retrieved
+
+    Returns None when the working set is missing, was built under another
+    scope or doesn't cover the question, the caller then retrieves as usual.
+    The answer is generated with Converse, so the session is marked detached
+    and later turns stay off the Bedrock session.
+    """
+    if (
+        not working_set
+        or working_set["scope"] != scope
+        or coverage(user_query, working_set["chunks"]) < MIN_COVERAGE
+    ):
+        metrics.add_metric(name="WorkingSetMisses", unit=MetricUnit.Count, value=1)
+        tracer.put_annotation("WorkingSetHit", False)
+        return None
+
+    metrics.add_metric(name="WorkingSetHits", unit=MetricUnit.Count, value=1)
+    tracer.put_annotation("WorkingSetHit", True)
+    with timed(metrics, "Rerank"), stage(tracer, "rerank"):
+        passages = rerank(
+            user_query, working_set["chunks"], max_results=FUSED_NUMBER_OF_RESULTS
+        )
+    bedrock_response = generate_from_passages(
+        user_query,
+        passages,
+        deadline,
+        depth,
+        request_body["messages"][:-1],
+        on_delta,
+    )
+
+    if not working_set.get("detached"):
+        try:
+            get_working_set_store().put(
+                working_set["sessionId"], working_set["chunks"], scope, detached=True
+            )
+        except ClientError:
+            logger.exception("Working set update failed")
+
+    return bedrock_response
+
+
+def remember_retrieved_chunks(bedrock_response, scope):
+    """Put the chunks an answer cited at the front of its session's working set"""
+    session_id = bedrock_response.get("sessionId")
+    if not session_id:
+        return
+
+    chunks = [
+        reference
+        for citation in bedrock_response.get("citations", [])
+        for reference in citation.get("retrievedReferences", [])
+    ]
+    if not chunks:
+        return
+
+    working_set_store = get_working_set_store()
+    try:
+        working_set = working_set_store.get(session_id)
+        existing = (
+            working_set["chunks"]
+            if working_set and working_set["scope"] == scope
+            else []
+        )
+        working_set_store.put(
+            session_id,
+            merge_chunks(chunks, existing),
+            scope,
+            detached=bool(working_set and working_set.get("detached")),
+        )
+    except ClientError:
+        logger.exception("Working set update failed")
+
+
+def is_standalone_question(request_body, session_id, scope):
+    """First-turn, unscoped questions, the answer depends on the question alone"""
+    return not session_id and not scope and session_depth(request_body) == 0
+
+
+def session_depth(request_body):
+    """Earlier user turns in the conversation"""
+    return sum(
+        1 for message in request_body["messages"][:-1] if message["role"] == "USER"
+    )
+
+
+def normalize_query(user_query):
+    return " ".join(user_query.lower().split())
+
+
+def cache_answer(user_query, formatted_response):
+    key = normalize_query(user_query)
+    ANSWER_CACHE[key] = formatted_response
+    ANSWER_CACHE.move_to_end(key)
+
+    if len(ANSWER_CACHE) > ANSWER_CACHE_SIZE:
+        ANSWER_CACHE.popitem(last=False)
+
+
+def get_cached_answer(user_query, session_id):
+    """Cached answers are only reused outside a conversation, their context is the question alone"""
+    if session_id:
+        return None
+
+    cached_response = ANSWER_CACHE.get(normalize_query(user_query))
+    if not cached_response:
+        count(metrics, "AnswerCacheMisses")
+        tracer.put_annotation("AnswerCacheHit", False)
+        return None
+
+    count(metrics, "AnswerCacheHits")
+    tracer.put_annotation("AnswerCacheHit", True)
+    return restamp_answer(cached_response, cached=True)
+
+
+def get_faq_answer(user_query):
+    """Answer precomputed against the current corpus, None for questions that aren't FAQs"""
+    try:
+        with timed(metrics, "FaqLookup"), stage(tracer, "faq_lookup"):
+            item = get_faq_store().get(normalize_query(user_query))
+    except ClientError:
+        # The lookup is an optimisation, answer normally without it
+        logger.exception("FAQ lookup failed")
+        return None
+
+    if not item:
+        count(metrics, "FaqMisses")
+        tracer.put_annotation("FaqHit", False)
+        return None
+
+    count(metrics, "FaqHits")
+    tracer.put_annotation("FaqHit", True)
+    return restamp_answer(item["response"], precomputed=True)
+
+
+def restamp_answer(formatted_response, **flags):
+    """A stored answer as a new message, the stored Bedrock session belongs to whoever asked first"""
+    return {
+        "assistantMessage": {
+            **formatted_response["assistantMessage"],
+            "id": str(uuid.uuid4()),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "sessionId": None,
+        **flags,
+    }
+
+
+def precompute_faq_answers(job, context):
+    """Re-answer the most asked standalone questions against the freshly ingested corpus
+
+    job carries the corpusVersion (the ingestion job id) and optionally an
+    explicit list of queries, otherwise they are mined from this function's logs.
+    """
+    if job.get("queries"):
+        queries = [normalize_query(query) for query in job["queries"]]
+    else:
+        log_group = os.environ["AWS_LAMBDA_LOG_GROUP_NAME"]
+        queries = [query for query, asks in top_queries(LOGS_CLIENT, log_group)]
+
+    faq_store = get_faq_store()
+    # Answers from the previous corpus must not be served while new ones are generated
+    faq_store.clear()
+
+    answered = 0
+    for query in queries:
+        if context.get_remaining_time_in_millis() < FAQ_JOB_RESERVE_MS:
+            logger.warning("FAQ precompute ran out of time")
+            break
+
+        request_body = {"messages": [{"role": "USER", "content": query}]}
+        deadline = Deadline.from_context(context, API_GATEWAY_TIMEOUT_MS)
+        try:
+            bedrock_response = generate_answer(
+                request_body, query, None, deadline, None
+            )
+        except Exception:
+            logger.exception(f"Could not precompute an answer for {query!r}")
+            continue
+
+        faq_store.put(query, format_response(bedrock_response), job["corpusVersion"])
+        answered += 1
+
+    result = {
+        "corpusVersion": job["corpusVersion"],
+        "candidates": len(queries),
+        "answered": answered,
+    }
+    logger.info("Precomputed FAQ answers", extra=result)
+
+    return result
+
+
+@lru_cache(maxsize=32)
+def get_runtime_client(read_timeout):
+    """Bedrock runtime client whose timeouts fit the caller's deadline, cached per second"""
+    return boto3.client(
+        "bedrock-agent-runtime",
+        config=Config(
+            connect_timeout=min(CONNECT_TIMEOUT_SECONDS, read_timeout),
+            read_timeout=read_timeout,
+            # A retry would not fit in the deadline, the fallback answer covers it
+            retries={"max_attempts": 1, "mode": "standard"},
+        ),
+    )
+
+
+@lru_cache(maxsize=32)
+def get_generation_client(read_timeout):
+    """Bedrock model runtime client for generating from already retrieved passages"""
+    return boto3.client(
+        "bedrock-runtime",
+        config=Config(
+            connect_timeout=min(CONNECT_TIMEOUT_SECONDS, read_timeout),
+            read_timeout=read_timeout,
+            retries={"max_attempts": 1, "mode": "standard"},
+        ),
+    )
+
+
+def start_chat_job(request_body, function_name):
+    """Record a chat job and hand it to an async invocation of this function"""
+    job = get_job_store().create(CHAT_JOB_TYPE)
+
+    LAMBDA_CLIENT.invoke(
+        FunctionName=function_name,
+        InvocationType="Event",
+        Payload=json.dumps({"jobId": job["jobId"], "request": request_body}),
+    )
+
+    logger.info(f"Started chat job {job['jobId']}")
+
+    return job
+
+
+def run_chat_job(job_id, request_body, connection_id, deadline):
+    job_store = get_job_store()
+    job_store.update(job_id, status=JOB_STATUS_RUNNING)
+
+    pusher = get_connection_pusher() if connection_id else None
+
+    # Failures are recorded instead of raised so Lambda doesn't retry the
+    # invocation and pay for generation again
+    try:
+        if pusher:
+            result = run_chat_streaming(
+                request_body, job_id, connection_id, pusher, deadline
+            )
+        else:
+            result = run_chat(request_body, deadline)
+
+        job_store.update(job_id, status=JOB_STATUS_SUCCEEDED, result=result)
+
+        if pusher:
+            pusher.send(
+                connection_id, {"type": "chat.completed", "jobId": job_id, **result}
+            )
+        return result
+
+    except ClientError as e:
+        logger.exception(f"Chat job {job_id} failed")
+        error = e.response["Error"]["Message"]
+
+    except Exception as e:
+        logger.exception(f"Chat job {job_id} failed")
+        error = str(e)
+
+    job_store.update(job_id, status=JOB_STATUS_FAILED, error=error)
+
+    if pusher:
+        pusher.send(
+            connection_id, {"type": "chat.failed", "jobId": job_id, "error": error}
+        )
+
+
+def run_chat_streaming(request_body, job_id, connection_id, pusher, deadline):
+    """Run the chat pipeline, pushing answer chunks to the WebSocket as they arrive"""
+
+    def push_delta(text):
+        pusher.send(
+            connection_id, {"type": "chat.delta", "jobId": job_id, "text": text}
+        )
+
+    return run_chat(request_body, deadline, on_delta=push_delta)
+
+
+def get_chat_job_status(job_id):
+    job = get_job_store().get(job_id)
+
+    if not job or job["jobType"] != CHAT_JOB_TYPE:
+        return create_response(404, "Job not found", {"jobId": job_id})
+
+    payload = {"jobId": job_id, "status": job["status"]}
+    if job.get("result"):
+        payload.update(job["result"])
+    if job.get("error"):
+        payload["error"] = job["error"]
+
+    return create_response(200, "Success", payload)
+
+
 def extract_details(request_body):
     user_query = request_body["messages"][-1]["content"]
     session_id = request_body.get("sessionId", None)
+    scope = request_body.get("scope") or None
+
+    return user_query, session_id, scope
+
+
+def build_retrieval_filter(scope):
+    """Metadata filter limiting retrieval to pinned documents and/or tags"""
+    conditions = []
+
+    document_ids = scope.get("documentIds") or []
+    if document_ids:
+        conditions.append({"in": {"key": "documentId", "value": document_ids}})
+
+    tag_conditions = [
+        {"listContains": {"key": "tags", "value": tag}}
+        for tag in scope.get("tags") or []
+    ]
+    if len(tag_conditions) > 1:
+        conditions.append({"orAll": tag_conditions})
+    else:
+        conditions.extend(tag_conditions)
+
+    if len(conditions) > 1:
+        return {"andAll": conditions}
+    return conditions[0] if conditions else None
+
 
-    return user_query, session_id
+def build_retrieval_configuration(scope=None):
+    vector_search_configuration = {
+        "numberOfResults": NUMBER_OF_RESULTS,
+        "overrideSearchType": "SEMANTIC",
+    }
+
+    retrieval_filter = build_retrieval_filter(scope) if scope else None
+    if retrieval_filter:
+        vector_search_configuration["filter"] = retrieval_filter
+        vector_search_configuration["numberOfResults"] = SCOPED_NUMBER_OF_RESULTS
+
+    return {"vectorSearchConfiguration": vector_search_configuration}
 
 
-def query_knowledge_base(user_query, session_id=None):
+def build_retrieve_request(
+    user_query, session_id=None, scope=None, model_arn=MODEL_ARN
+):
     retrieve_request = {
         "input": {"text": user_query},
         "retrieveAndGenerateConfiguration": {
             "type": "KNOWLEDGE_BASE",
             "knowledgeBaseConfiguration": {
                 "knowledgeBaseId": KNOWLEDGE_BASE_ID,
-                "modelArn": MODEL_ARN,
-                "retrievalConfiguration": {
-                    "vectorSearchConfiguration": {
-                        "numberOfResults": 10,  # Increased for better citations
-                        "overrideSearchType": "SEMANTIC",
-                    }
-                },
+                "modelArn": model_arn,
+                "retrievalConfiguration": build_retrieval_configuration(scope),
                 "generationConfiguration": {
-                    "promptTemplate": {
-                        "textPromptTemplate": """You are a helpful AI assistant. Use ONLY the following context to answer the user's question accurately and helpfully.
-
-Retrieved context: $search_results$
-
-User question: $query$
-
-IMPORTANT INSTRUCTIONS:
-- Base your answer ONLY on the provided context
-- For every fact or piece of information you mention, reference the specific source document
-- If you cannot find the answer in the provided context, clearly state that the information is not available in the retrieved documents
-- Structure your response clearly with proper citations
-- Use markdown formatting for better readability
-
-Please provide a helpful and accurate response based on the retrieved context."""
-                    }
+                    "promptTemplate": {"textPromptTemplate": PROMPT_TEMPLATE}
                 },
             },
         },
@@ -117,15 +692,443 @@ Please provide a helpful and accurate response based on the retrieved context.""
     if session_id:
         retrieve_request["sessionId"] = session_id
 
-    bedrock_response = BEDROCK_AGENT_RUNTIME_CLIENT.retrieve_and_generate(
-        **retrieve_request
-    )
+    return retrieve_request
+
+
+def query_knowledge_base(
+    user_query, session_id, deadline, scope=None, depth=0, on_delta=None
+):
+    """retrieve_and_generate, streamed to on_delta when given"""
+    tier, model_arn = MODEL_ROUTER.route(user_query, depth)
+    retrieve_request = build_retrieve_request(user_query, session_id, scope, model_arn)
+
+    read_timeout = deadline.timeout_seconds(FALLBACK_RESERVE_SECONDS)
+    runtime_client = get_runtime_client(read_timeout)
+    started = time.monotonic()
+    # Hedging a follow-up would write the turn to the session twice, and a
+    # hedged stream would push the answer twice
+    operation = "retrieve_and_generate_stream" if on_delta else "retrieve_and_generate"
+    with stage(tracer, "retrieve_and_generate"):
+        bedrock_response = BEDROCK_CALLER.call(
+            getattr(runtime_client, operation),
+            hedge=session_id is None and not on_delta,
+            deadline=deadline,
+            reserve_seconds=FALLBACK_RESERVE_SECONDS,
+            with_timeout=lambda timeout: getattr(
+                get_runtime_client(timeout), operation
+            ),
+            **retrieve_request,
+        )
+        if on_delta:
+            bedrock_response = read_retrieve_and_generate_stream(
+                bedrock_response, on_delta
+            )
+    # retrieve_and_generate doesn't report token usage
+    record_generation_metrics(tier, time.monotonic() - started)
 
     logger.info(bedrock_response)
 
     return bedrock_response
 
 
+def read_retrieve_and_generate_stream(stream_response, on_delta):
+    """Push a retrieve_and_generate_stream's text, returns the unstreamed response shape"""
+    text_parts = []
+    citations = []
+
+    for stream_event in stream_response["stream"]:
+        if "output" in stream_event:
+            text = stream_event["output"]["text"]
+            text_parts.append(text)
+            on_delta(text)
+
+        elif "citation" in stream_event:
+            citation = stream_event["citation"]
+            references = citation.get("retrievedReferences") or citation.get(
+                "citation", {}
+            ).get("retrievedReferences", [])
+            citations.append({"retrievedReferences": references})
+
+    return {
+        "sessionId": stream_response["sessionId"],
+        "output": {"text": "".join(text_parts)},
+        "citations": citations,
+    }
+
+
+def read_converse_stream(stream_response, on_delta):
+    """Push a converse_stream's text, returns the unstreamed response shape"""
+    text_parts = []
+    usage = None
+
+    for stream_event in stream_response["stream"]:
+        if "contentBlockDelta" in stream_event:
+            text = stream_event["contentBlockDelta"]["delta"].get("text", "")
+            if text:
+                text_parts.append(text)
+                on_delta(text)
+
+        elif "metadata" in stream_event:
+            usage = stream_event["metadata"].get("usage")
+
+    response = {
+        "output": {
+            "message": {
+                "role": "assistant",
+                "content": [{"text": "".join(text_parts)}],
+            }
+        }
+    }
+    if usage:
+        response["usage"] = usage
+    return response
+
+
+def retrieve_passages(user_query, deadline, scope=None):
+    runtime_client = get_runtime_client(deadline.timeout_seconds())
+
+    with timed(metrics, "Retrieve"), stage(tracer, "retrieve"):
+        response = runtime_client.retrieve(
+            knowledgeBaseId=KNOWLEDGE_BASE_ID,
+            retrievalQuery={"text": user_query},
+            retrievalConfiguration=build_retrieval_configuration(scope),
+        )
+    count(metrics, "RetrievedChunks", len(response["retrievalResults"]))
+    tracer.put_annotation("RetrievedChunks", len(response["retrievalResults"]))
+
+    return response["retrievalResults"]
+
+
+def use_multi_query(request_body, session_id):
+    """Multi-query generation has no Bedrock session, so follow-ups keep the session path"""
+    if session_id:
+        return False
+    return request_body.get("multiQuery", MULTI_QUERY_MODE)
+
+
+def use_converse(request_body, session_id):
+    """Conversations started on a Bedrock session stay on it"""
+    if session_id:
+        return False
+    return request_body.get("converse", CONVERSE_MODE)
+
+
+def converse_knowledge_base(request_body, deadline, scope=None, depth=0, on_delta=None):
+    """Retrieve, rerank and generate with Converse, carrying the turn history ourselves"""
+    user_query = request_body["messages"][-1]["content"]
+    history = request_body["messages"][:-1]
+
+    # Follow-ups like "and for gift cards?" only make sense next to the last question
+    previous_questions = [m["content"] for m in history if m["role"] == "USER"]
+    retrieval_query = " ".join(previous_questions[-1:] + [user_query])
+
+    retrieval_results = retrieve_passages(retrieval_query, deadline, scope)
+    with timed(metrics, "Rerank"), stage(tracer, "rerank"):
+        passages = rerank(
+            user_query, retrieval_results, max_results=FUSED_NUMBER_OF_RESULTS
+        )
+
+    return generate_from_passages(
+        user_query, passages, deadline, depth, history, on_delta
+    )
+
+
+def build_converse_system(search_results):
+    """Instructions then retrieved context, cached when the two are long enough"""
+    system = [{"text": SYSTEM_PROMPT}, {"text": search_results}]
+    if count_prompt_tokens(system) >= PROMPT_CACHE_MIN_TOKENS:
+        system.append(CACHE_POINT)
+
+    return system
+
+
+def build_converse_messages(history, prompt, prefix_tokens=0):
+    """Alternating user/assistant turns ending in the prompt, cached up to the last
+    history turn when that prefix, with the prefix_tokens before it, is long enough
+    """
+    messages = []
+    for message in history[-MAX_HISTORY_MESSAGES:]:
+        role = "assistant" if message["role"] == "ASSISTANT" else "user"
+        if not messages and role == "assistant":
+            continue
+        if messages and messages[-1]["role"] == role:
+            messages[-1]["content"].append({"text": message["content"]})
+        else:
+            messages.append({"role": role, "content": [{"text": message["content"]}]})
+
+    if messages and messages[-1]["role"] == "user":
+        messages.append({"role": "assistant", "content": [{"text": "Understood."}]})
+
+    history_tokens = sum(
+        count_prompt_tokens(message["content"]) for message in messages
+    )
+    if messages and prefix_tokens + history_tokens >= PROMPT_CACHE_MIN_TOKENS:
+        # Earlier turns don't change, the next request reads them from cache
+        messages[-1]["content"].append(CACHE_POINT)
+
+    messages.append({"role": "user", "content": [{"text": prompt}]})
+
+    return messages
+
+
+def count_prompt_tokens(blocks):
+    return sum(estimate_tokens(block["text"]) for block in blocks if "text" in block)
+
+
+def multi_query_knowledge_base(
+    user_query, deadline, scope=None, depth=0, on_delta=None
+):
+    """Retrieve for each sub-query in parallel, fuse with RRF, rerank and generate from the top-k"""
+    sub_queries = split_query(user_query)
+
+    runtime_client = get_runtime_client(deadline.timeout_seconds())
+    retrieval_configuration = build_retrieval_configuration(scope)
+
+    def retrieve(sub_query):
+        response = runtime_client.retrieve(
+            knowledgeBaseId=KNOWLEDGE_BASE_ID,
+            retrievalQuery={"text": sub_query},
+            retrievalConfiguration=retrieval_configuration,
+        )
+        return response["retrievalResults"]
+
+    with timed(metrics, "Retrieve"), stage(tracer, "retrieve"):
+        result_lists = fan_out_retrieve(retrieve, sub_queries)
+    keyword_results = keyword_search(user_query, scope)
+    if keyword_results:
+        result_lists.append(keyword_results)
+    candidates = reciprocal_rank_fusion(result_lists, RERANK_CANDIDATES)
+    with timed(metrics, "Rerank"), stage(tracer, "rerank"):
+        passages = rerank(user_query, candidates, max_results=FUSED_NUMBER_OF_RESULTS)
+    count(metrics, "RetrievedChunks", sum(len(results) for results in result_lists))
+    tracer.put_annotation(
+        "RetrievedChunks", sum(len(results) for results in result_lists)
+    )
+
+    logger.info(
+        "Multi-query retrieval",
+        extra={
+            "subQueries": len(sub_queries),
+            "retrievedChunks": sum(len(results) for results in result_lists),
+            "fusedChunks": len(candidates),
+            "rerankedChunks": len(passages),
+        },
+    )
+
+    return generate_from_passages(
+        user_query, passages, deadline, depth, on_delta=on_delta
+    )
+
+
+def format_search_results(passages):
+    return "\n\n".join(
+        f"[{index}] {passage['content']['text']}"
+        for index, passage in enumerate(passages, 1)
+    )
+
+
+def generate_from_passages(
+    user_query, passages, deadline, depth=0, history=(), on_delta=None
+):
+    """Generate with the knowledge base prompt over our own passages, shaped like retrieve_and_generate
+
+    Generated with converse_stream when on_delta is given, which then
+    receives the text as it arrives.
+    """
+    passages, packing_stats = pack_context(passages, CONTEXT_TOKEN_BUDGET)
+    record_packing_metrics(packing_stats)
+
+    source_count = len({format_reference(passage)["file"] for passage in passages})
+    tier, model_arn = MODEL_ROUTER.route(user_query, depth, source_count)
+
+    system = build_converse_system(
+        SEARCH_RESULTS_TEMPLATE.replace(
+            "$search_results$", format_search_results(passages)
+        )
+    )
+    prompt = QUERY_TEMPLATE.replace("$query$", user_query)
+    metrics.add_metric(
+        name="PromptSize",
+        unit=MetricUnit.Bytes,
+        value=len(system[1]["text"].encode()) + len(prompt.encode()),
+    )
+
+    read_timeout = deadline.timeout_seconds(FALLBACK_RESERVE_SECONDS)
+    generation_client = get_generation_client(read_timeout)
+    started = time.monotonic()
+    operation = "converse_stream" if on_delta else "converse"
+    with stage(tracer, "generate"):
+        converse_response = BEDROCK_CALLER.call(
+            getattr(generation_client, operation),
+            hedge=not on_delta,
+            deadline=deadline,
+            reserve_seconds=FALLBACK_RESERVE_SECONDS,
+            with_timeout=lambda timeout: getattr(
+                get_generation_client(timeout), operation
+            ),
+            modelId=model_arn,
+            system=system,
+            messages=build_converse_messages(
+                history, prompt, count_prompt_tokens(system)
+            ),
+            inferenceConfig={"maxTokens": GENERATION_MAX_TOKENS},
+        )
+        if on_delta:
+            converse_response = read_converse_stream(converse_response, on_delta)
+    record_generation_metrics(
+        tier, time.monotonic() - started, converse_response.get("usage")
+    )
+
+    text = "".join(
+        block.get("text", "")
+        for block in converse_response["output"]["message"]["content"]
+    )
+
+    # Passages are numbered in the prompt, so citation n is passage n
+    return {
+        "sessionId": None,
+        "output": {"text": text},
+        "citations": [{"retrievedReferences": passages}],
+    }
+
+
+def record_generation_metrics(tier, latency_seconds, usage=None):
+    """Per-tier latency and token counts, each with a ModelTier dimension"""
+    values = [("GenerationLatency", MetricUnit.Milliseconds, latency_seconds * 1000)]
+    if usage:
+        values.append(("InputTokens", MetricUnit.Count, usage.get("inputTokens", 0)))
+        values.append(("OutputTokens", MetricUnit.Count, usage.get("outputTokens", 0)))
+        values.append(
+            (
+                "CacheReadInputTokens",
+                MetricUnit.Count,
+                usage.get("cacheReadInputTokens", 0),
+            )
+        )
+        values.append(
+            (
+                "CacheWriteInputTokens",
+                MetricUnit.Count,
+                usage.get("cacheWriteInputTokens", 0),
+            )
+        )
+
+    for name, unit, value in values:
+        with single_metric(
+            name=name, unit=unit, value=value, namespace=METRICS_NAMESPACE
+        ) as metric:
+            metric.add_dimension(name="ModelTier", value=tier)
+
+    logger.info(
+        "Generation finished",
+        extra={"modelTier": tier, "latencySeconds": latency_seconds, **(usage or {})},
+    )
+
+
+def record_packing_metrics(packing_stats):
+    metrics.add_metric(
+        name="PackedContextTokens",
+        unit=MetricUnit.Count,
+        value=packing_stats["packedTokens"],
+    )
+    metrics.add_metric(
+        name="TruncatedChunks",
+        unit=MetricUnit.Count,
+        value=packing_stats["truncatedChunks"],
+    )
+    metrics.add_metric(
+        name="DroppedChunks",
+        unit=MetricUnit.Count,
+        value=packing_stats["droppedChunks"],
+    )
+
+    logger.info("Packed generation context", extra=packing_stats)
+
+
+def keyword_search(user_query, scope=None, required_terms=None):
+    """Lexical hits from the local keyword index, empty when no index is built"""
+    keyword_index = get_keyword_index()
+    if not keyword_index:
+        return []
+
+    scope = scope or {}
+    with timed(metrics, "KeywordSearch"), stage(tracer, "keyword_search"):
+        return keyword_index.search(
+            user_query,
+            KEYWORD_NUMBER_OF_RESULTS,
+            document_ids=scope.get("documentIds"),
+            tags=scope.get("tags"),
+            required_terms=required_terms,
+        )
+
+
+def fallback_passages(user_query, deadline, scope=None):
+    """Passages for a retrieve-only answer, keyword hits cover the vector index being unavailable"""
+    try:
+        vector_results = retrieve_passages(user_query, deadline, scope)
+    except ClientError:
+        logger.exception("Vector retrieval failed, using keyword index only")
+        vector_results = []
+
+    keyword_results = keyword_search(user_query, scope)
+    result_lists = [results for results in (vector_results, keyword_results) if results]
+    candidates = reciprocal_rank_fusion(result_lists, RERANK_CANDIDATES)
+
+    return rerank(user_query, candidates, CONTEXT_TOKEN_BUDGET)
+
+
+def format_fallback_response(retrieval_results, session_id):
+    """Answer with the top retrieved passages when generation could not finish in time"""
+    passages = []
+    citation_references = []
+
+    for index, result in enumerate(retrieval_results[:FALLBACK_MAX_PASSAGES], 1):
+        reference_obj = format_reference(result)
+        citation_references.append(reference_obj)
+
+        snippet = re.sub(r"\s+", " ", result["content"]["text"]).strip()
+        if len(snippet) > FALLBACK_SNIPPET_LENGTH:
+            snippet = snippet[:FALLBACK_SNIPPET_LENGTH].rsplit(" ", 1)[0] + "…"
+
+        passages.append(
+            f"{index}. **{reference_obj['file']}** (page {reference_obj['page']}): {snippet} [{index}]"
+        )
+
+    if passages:
+        content = (
+            "I couldn't generate a full answer in time. These passages from your "
+            "documents look most relevant:\n\n" + "\n\n".join(passages)
+        )
+    else:
+        content = "I couldn't generate an answer in time and found no matching passages in the retrieved documents."
+
+    return {
+        "assistantMessage": {
+            "id": str(uuid.uuid4()),
+            "role": "ASSISTANT",
+            "content": content,
+            "citation": citation_references,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "sessionId": session_id,
+        "fallback": True,
+    }
+
+
+def format_reference(reference):
+    page_number = "Unknown"
+    if (
+        "metadata" in reference
+        and "x-amz-bedrock-kb-document-page-number" in reference["metadata"]
+    ):
+        page_number = reference["metadata"]["x-amz-bedrock-kb-document-page-number"]
+
+    return {
+        "page": page_number,
+        "file": reference["location"]["s3Location"]["uri"].split("/")[-1],
+    }
+
+
 def format_response(bedrock_response):
     session_id = bedrock_response["sessionId"]
     response_text = bedrock_response["output"]["text"]
@@ -137,21 +1140,15 @@ def format_response(bedrock_response):
 
     for citation in citations:
         for reference in citation["retrievedReferences"]:
-            page_number = "Unknown"
-            if (
-                "metadata" in reference
-                and "x-amz-bedrock-kb-document-page-number" in reference["metadata"]
-            ):
-                page_number = reference["metadata"][
-                    "x-amz-bedrock-kb-document-page-number"
-                ]
-
-            reference_obj = {
-                "page": page_number,
-                "file": reference["location"]["s3Location"]["uri"].split("/")[-1],
-            }
+            citation_references.append(format_reference(reference))
 
-            citation_references.append(reference_obj)
+    count(metrics, "RetrievedReferences", len(citation_references))
+    tracer.put_annotation("RetrievedReferences", len(citation_references))
+    metrics.add_metric(
+        name="AnswerSize",
+        unit=MetricUnit.Bytes,
+        value=len(cleaned_response_text.encode()),
+    )
 
     message_obj = {
         "assistantMessage": {
@@ -192,3 +1189,42 @@ def create_response(status_code, message, payload=None):
             cls=DateTimeEncoder,
         ),
     }
+
+
+def warm_bedrock_clients():
+    """Build and connect the clients a sync chat with the full API Gateway budget uses"""
+    get_runtime_client.cache_clear()
+    get_generation_client.cache_clear()
+
+    deadline = Deadline(API_GATEWAY_TIMEOUT_MS - SAFETY_MARGIN_MS)
+    generation_timeout = deadline.timeout_seconds(FALLBACK_RESERVE_SECONDS)
+    prime_client(
+        get_runtime_client(generation_timeout), ["RetrieveAndGenerate", "Retrieve"]
+    )
+    prime_client(get_runtime_client(deadline.timeout_seconds()), ["Retrieve"])
+    prime_client(get_generation_client(generation_timeout), ["Converse"])
+
+
+def warm_retrieval():
+    """Open the stores, load the keyword index and run the reranker once"""
+    get_faq_store()
+    get_working_set_store()
+    get_keyword_index()
+    rerank(
+        "warm up",
+        [
+            {
+                "content": {"text": "warm up passage"},
+                "location": {"s3Location": {"uri": ""}},
+            }
+        ],
+        max_results=1,
+    )
+
+
+# Last, so everything the first request needs is defined
+PRIMING = prime(
+    {LAMBDA_CLIENT: ["Invoke"]}, warm=[warm_retrieval, warm_bedrock_clients]
+)
+if PRIMING:
+    logger.info("Primed for the first request", extra=PRIMING)
@@ -0,0 +1,66 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAX_SUB_QUERIES = 4
+# Clauses shorter than this are usually fragments ("and why?") not questions
+MIN_SUB_QUERY_WORDS = 3
+# Standard RRF damping constant, keeps one list's top hit from dominating
+RRF_K = 60
+
+CLAUSE_SEPARATORS = re.compile(
+    r"\?\s+|;\s*|,?\s+(?:and also|as well as|and then|plus)\s+|,\s+and\s+",
+    re.IGNORECASE,
+)
+
+
+def split_query(user_query, max_sub_queries=MAX_SUB_QUERIES):
+    """Original question first, followed by the clauses of a compound question"""
+    user_query = user_query.strip()
+
+    clauses = []
+    for clause in CLAUSE_SEPARATORS.split(user_query):
+        clause = clause.strip(" ,.?")
+        if len(clause.split()) >= MIN_SUB_QUERY_WORDS and clause not in clauses:
+            clauses.append(clause)
+
+    # A single clause is just the original question again
+    if len(clauses) < 2:
+        return [user_query]
+
+    return [user_query] + clauses[: max_sub_queries - 1]
+
+
+def chunk_key(result):
+    """Identity of a retrieved chunk, the same chunk comes back for overlapping sub-queries"""
+    chunk_id = result.get("metadata", {}).get("x-amz-bedrock-kb-chunk-id")
+    if chunk_id:
+        return chunk_id
+
+    uri = result.get("location", {}).get("s3Location", {}).get("uri")
+    return uri, result["content"]["text"]
+
+
+def reciprocal_rank_fusion(result_lists, top_k, k=RRF_K):
+    """Merge ranked retrieval lists, scoring each chunk by the sum of 1 / (k + rank)"""
+    scores = {}
+    chunks = {}
+
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            key = chunk_key(result)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(key, result)
+
+    ranked_keys = sorted(scores, key=scores.get, reverse=True)
+
+    return [{**chunks[key], "fusedScore": scores[key]} for key in ranked_keys[:top_k]]
+
+
+def fan_out_retrieve(retrieve, sub_queries, max_workers=MAX_SUB_QUERIES):
+    """Run retrieve for every sub-query concurrently, results keep sub-query order"""
+    if len(sub_queries) == 1:
+        return [retrieve(sub_queries[0])]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(sub_queries))) as executor:
+        return list(executor.map(retrieve, sub_queries))
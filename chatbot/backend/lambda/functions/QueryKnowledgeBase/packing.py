@@ -0,0 +1,86 @@
+import re
+
+# BPE vocabularies split long words into pieces of about four characters and
+# give punctuation its own token, this tracks real counts within ~10%
+TOKEN_PIECE_CHARS = 4
+TOKEN_PIECES = re.compile(rf"\w{{1,{TOKEN_PIECE_CHARS}}}|[^\w\s]")
+# Below this a truncated chunk is too short to be worth citing
+MIN_CHUNK_TOKENS = 40
+# Every source gets at least this much of its best chunk before any chunk is extended
+SOURCE_RESERVE_TOKENS = 120
+TRUNCATION_MARKER = " …"
+
+
+def estimate_tokens(text):
+    return len(TOKEN_PIECES.findall(text))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut the tail of text so it fits max_tokens, keeping whole words"""
+    pieces = list(TOKEN_PIECES.finditer(text))
+    if len(pieces) <= max_tokens:
+        return text
+
+    cut = pieces[max_tokens - 1].end()
+    head = text[:cut]
+    if cut < len(text) and not text[cut].isspace():
+        head = head.rsplit(None, 1)[0] if " " in head else head
+
+    return head.rstrip() + TRUNCATION_MARKER
+
+
+def source_of(passage):
+    return passage.get("location", {}).get("s3Location", {}).get("uri")
+
+
+def pack_context(passages, token_budget):
+    """Fit ranked passages into token_budget, truncating tails rather than dropping sources
+
+    Each distinct source first gets up to SOURCE_RESERVE_TOKENS of its best
+    passage, then remaining budget extends passages in rank order. Returns the
+    packed passages in rank order and the packing stats.
+    """
+    tokens = [estimate_tokens(passage["content"]["text"]) for passage in passages]
+    allotted = [0] * len(passages)
+    remaining = token_budget
+
+    best_per_source = {}
+    for index, passage in enumerate(passages):
+        best_per_source.setdefault(source_of(passage), index)
+
+    if best_per_source:
+        reserve = min(SOURCE_RESERVE_TOKENS, token_budget // len(best_per_source))
+        for index in best_per_source.values():
+            allotted[index] = min(tokens[index], reserve, remaining)
+            remaining -= allotted[index]
+
+    for index in range(len(passages)):
+        extra = min(tokens[index] - allotted[index], remaining)
+        # Short chunks that fit whole are kept, only a cut one needs the minimum
+        truncating = extra < tokens[index] - allotted[index]
+        if allotted[index] == 0 and truncating and extra < MIN_CHUNK_TOKENS:
+            continue
+        allotted[index] += extra
+        remaining -= extra
+
+    packed = []
+    truncated = 0
+    for index, passage in enumerate(passages):
+        if allotted[index] == 0:
+            continue
+
+        text = passage["content"]["text"]
+        if allotted[index] < tokens[index]:
+            text = truncate_to_tokens(text, allotted[index])
+            truncated += 1
+
+        packed.append({**passage, "content": {**passage["content"], "text": text}})
+
+    stats = {
+        "packedTokens": token_budget - remaining,
+        "packedChunks": len(packed),
+        "truncatedChunks": truncated,
+        "droppedChunks": len(passages) - len(packed),
+    }
+
+    return packed, stats
@@ -0,0 +1,124 @@
+import re
+
+import numpy as np
+
+from packing import TOKEN_PIECE_CHARS, estimate_tokens
+
+
+# BM25 saturation and length normalisation, the usual Okapi defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Share of the final score taken by the lexical score, the rest keeps retrieval order
+LEXICAL_WEIGHT = 0.5
+SHINGLE_SIZE = 4
+# Chunks sharing this much of their shingles with a better chunk are dropped
+DUPLICATE_THRESHOLD = 0.8
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def estimate_term_tokens(terms):
+    """packing.estimate_tokens from already tokenized words, punctuation aside"""
+    return sum(-(-len(term) // TOKEN_PIECE_CHARS) for term in terms)
+
+
+def bm25_scores(query_terms, chunk_terms):
+    """BM25 of every chunk against the query, from sparse (chunk, term) counts"""
+    vocabulary = {term: index for index, term in enumerate(dict.fromkeys(query_terms))}
+    if not vocabulary or not chunk_terms:
+        return np.zeros(len(chunk_terms))
+
+    chunk_lengths = np.array([len(terms) for terms in chunk_terms], dtype=np.float64)
+
+    # Only query terms can score, so count those as coordinate pairs
+    rows = []
+    columns = []
+    for row, terms in enumerate(chunk_terms):
+        for term in terms:
+            column = vocabulary.get(term)
+            if column is not None:
+                rows.append(row)
+                columns.append(column)
+
+    term_frequencies = np.zeros((len(chunk_terms), len(vocabulary)))
+    np.add.at(
+        term_frequencies,
+        (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)),
+        1,
+    )
+
+    chunk_count = len(chunk_terms)
+    document_frequencies = np.count_nonzero(term_frequencies, axis=0)
+    idf = np.log1p(
+        (chunk_count - document_frequencies + 0.5) / (document_frequencies + 0.5)
+    )
+
+    average_length = max(chunk_lengths.mean(), 1.0)
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk_lengths / average_length)
+    saturated = (
+        term_frequencies * (BM25_K1 + 1) / (term_frequencies + length_norm[:, None])
+    )
+
+    return saturated @ idf
+
+
+def shingles(terms, size=SHINGLE_SIZE):
+    if len(terms) < size:
+        return {tuple(terms)}
+    return set(zip(*(terms[offset:] for offset in range(size))))
+
+
+def is_near_duplicate(candidate, kept, threshold=DUPLICATE_THRESHOLD):
+    for other in kept:
+        overlap = len(candidate & other) / min(len(candidate), len(other))
+        if overlap >= threshold:
+            return True
+    return False
+
+
+def rerank(query, results, token_budget=None, max_results=None):
+    """Reorder retrieved chunks lexically, drop near-duplicates and fit a token budget
+
+    Returns the kept chunks, best first, each with a rerankScore. Without a
+    budget whole chunks are kept for the context packer to trim.
+    """
+    if not results:
+        return []
+
+    chunk_terms = [tokenize(result["content"]["text"]) for result in results]
+    lexical = bm25_scores(tokenize(query), chunk_terms)
+    if lexical.max() > 0:
+        lexical = lexical / lexical.max()
+
+    # Retrieval order is the prior, the lexical score reorders within it
+    prior = 1.0 - np.arange(len(results)) / len(results)
+    scores = LEXICAL_WEIGHT * lexical + (1 - LEXICAL_WEIGHT) * prior
+
+    kept = []
+    kept_shingles = []
+    tokens_used = 0
+
+    for index in np.argsort(-scores, kind="stable"):
+        if token_budget:
+            tokens = estimate_term_tokens(chunk_terms[index])
+            if tokens_used + tokens > token_budget:
+                continue
+
+        # Shingles only for chunks that would fit, most never get this far
+        candidate_shingles = shingles(chunk_terms[index])
+        if is_near_duplicate(candidate_shingles, kept_shingles):
+            continue
+
+        kept.append({**results[index], "rerankScore": float(scores[index])})
+        kept_shingles.append(candidate_shingles)
+        if token_budget:
+            tokens_used += tokens
+
+        if max_results and len(kept) == max_results:
+            break
+
+    return kept
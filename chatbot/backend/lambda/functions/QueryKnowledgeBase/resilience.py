@@ -0,0 +1,238 @@
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from botocore.exceptions import ClientError
+
+THROTTLING_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException"}
+
+BREAKER_CLOSED = "CLOSED"
+BREAKER_OPEN = "OPEN"
+BREAKER_HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Bedrock while the breaker is open"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when no call has returned by the time the caller's deadline runs out"""
+
+
+class LatencyTracker:
+    """Rolling window of call latencies in seconds"""
+
+    def __init__(self, window_size=100):
+        self._samples = deque(maxlen=window_size)
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, percentile):
+        samples = sorted(self._samples)
+        index = min(int(len(samples) * percentile / 100), len(samples) - 1)
+        return samples[index]
+
+
+class CircuitBreaker:
+    """Opens after consecutive throttles, lets one trial call through after a cooldown"""
+
+    def __init__(self, throttle_threshold=5, cooldown_seconds=30, clock=time.monotonic):
+        self.throttle_threshold = throttle_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._consecutive_throttles = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return BREAKER_CLOSED
+        if self._clock() - self._opened_at >= self.cooldown_seconds:
+            return BREAKER_HALF_OPEN
+        return BREAKER_OPEN
+
+    def allow(self):
+        state = self.state
+        if state == BREAKER_CLOSED:
+            return True
+        if state == BREAKER_HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self._consecutive_throttles = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_throttle(self):
+        self._consecutive_throttles += 1
+        self._trial_in_flight = False
+
+        if (
+            self._opened_at is not None
+            or self._consecutive_throttles >= self.throttle_threshold
+        ):
+            self._opened_at = self._clock()
+
+    def record_failure(self):
+        """Errors other than throttling don't count towards tripping the breaker"""
+        self._trial_in_flight = False
+
+
+class HedgedCaller:
+    """Calls a Bedrock operation, firing a second identical request if the first is slow
+
+    The hedge delay is the configured percentile of recent latencies, so only the
+    slowest calls are duplicated. Throttling trips the circuit breaker, which then
+    rejects calls with CircuitOpenError until its cooldown has passed.
+
+    Given a deadline, the call gives up with DeadlineExceededError once less
+    than reserve_seconds is left. A hedge is fired while at least
+    min_hedge_budget_seconds are left, on the operation with_timeout returns
+    for a read timeout of what's left.
+    """
+
+    def __init__(
+        self,
+        breaker=None,
+        hedge_percentile=95,
+        default_hedge_delay_seconds=8,
+        min_hedge_delay_seconds=0.5,
+        min_samples=20,
+        max_workers=4,
+        min_hedge_budget_seconds=1,
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyTracker()
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay_seconds = default_hedge_delay_seconds
+        self.min_hedge_delay_seconds = min_hedge_delay_seconds
+        self.min_samples = min_samples
+        self.min_hedge_budget_seconds = min_hedge_budget_seconds
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.short_circuits = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def hedge_delay(self):
+        if len(self.latencies) < self.min_samples:
+            return self.default_hedge_delay_seconds
+
+        return max(
+            self.latencies.percentile(self.hedge_percentile),
+            self.min_hedge_delay_seconds,
+        )
+
+    def call(
+        self,
+        operation,
+        hedge=True,
+        deadline=None,
+        reserve_seconds=0,
+        with_timeout=None,
+        **kwargs,
+    ):
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            raise CircuitOpenError("Bedrock circuit breaker is open")
+
+        started = time.monotonic()
+        try:
+            if hedge or deadline:
+                result = self._call_hedged(
+                    operation,
+                    kwargs,
+                    hedge,
+                    Budget(deadline, reserve_seconds),
+                    with_timeout,
+                )
+            else:
+                result = operation(**kwargs)
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] in THROTTLING_ERROR_CODES:
+                self.breaker.record_throttle()
+            else:
+                self.breaker.record_failure()
+            raise
+
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        self.latencies.record(time.monotonic() - started)
+        self.breaker.record_success()
+
+        return result
+
+    def _call_hedged(self, operation, kwargs, hedge, budget, with_timeout=None):
+        primary = self._executor.submit(operation, **kwargs)
+        pending = {primary}
+
+        if hedge:
+            done, _ = wait(pending, timeout=budget.wait_seconds(self.hedge_delay()))
+            if done:
+                return primary.result()
+
+            # A hedge with next to no time left only adds load
+            if budget.allows(self.min_hedge_budget_seconds):
+                self.hedges_fired += 1
+                hedge_operation = operation
+                if with_timeout and budget.deadline:
+                    hedge_operation = with_timeout(budget.timeout_seconds())
+                pending.add(self._executor.submit(hedge_operation, **kwargs))
+
+        error = None
+        while pending:
+            done, pending = wait(
+                pending, timeout=budget.wait_seconds(), return_when=FIRST_COMPLETED
+            )
+            if not done:
+                raise DeadlineExceededError("Bedrock call did not return in time")
+
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self.hedges_won += 1
+                    return future.result()
+                error = future.exception()
+
+        raise error
+
+    def stats(self):
+        return {
+            "hedgesFired": self.hedges_fired,
+            "hedgesWon": self.hedges_won,
+            "shortCircuits": self.short_circuits,
+            "breakerState": self.breaker.state,
+        }
+
+
+class Budget:
+    """Time a call may wait, from the caller's deadline less a reserve"""
+
+    def __init__(self, deadline=None, reserve_seconds=0):
+        self.deadline = deadline
+        self.reserve_seconds = reserve_seconds
+
+    def wait_seconds(self, limit=None):
+        """Seconds to wait for, at most limit, None for no limit"""
+        if self.deadline is None:
+            return limit
+        remaining = self.deadline.remaining_seconds(self.reserve_seconds)
+        return remaining if limit is None else min(limit, remaining)
+
+    def allows(self, min_seconds):
+        """Whether at least min_seconds are left"""
+        remaining = self.wait_seconds()
+        return remaining is None or remaining >= min_seconds
+
+    def timeout_seconds(self):
+        """Whole seconds left as a read timeout, never below one"""
+        return max(math.floor(self.wait_seconds()), 1)
@@ -0,0 +1,88 @@
+import json
+import re
+
+SIMPLE_TIER = "simple"
+STANDARD_TIER = "standard"
+COMPLEX_TIER = "complex"
+TIERS = (SIMPLE_TIER, STANDARD_TIER, COMPLEX_TIER)
+
+LONG_QUERY_WORDS = 25
+MANY_SOURCES = 3
+DEEP_SESSION_TURNS = 4
+
+LOOKUP_PATTERN = re.compile(
+    r"^\s*(what|when|where|who|which|is|are|does|do|can|how (many|much|long))\b",
+    re.IGNORECASE,
+)
+SYNTHESIS_PATTERN = re.compile(
+    r"\b(compare|comparison|differences?|versus|vs|why|explain|summari[sz]e|"
+    r"overview|pros and cons|trade-?offs?|impacts?|implications?|recommend\w*)\b",
+    re.IGNORECASE,
+)
+
+
+def extract_features(user_query, session_depth=0, source_count=None):
+    """Cheap local signals of how much reasoning a question needs"""
+    return {
+        "words": len(user_query.split()),
+        "questions": max(user_query.count("?"), 1),
+        "lookup": bool(LOOKUP_PATTERN.match(user_query)),
+        "synthesis": bool(SYNTHESIS_PATTERN.search(user_query)),
+        "sessionDepth": session_depth,
+        # Unknown when Bedrock retrieves inside retrieve_and_generate
+        "sourceCount": source_count,
+    }
+
+
+def classify(features):
+    """Score the features into a tier, lookups stay cheap unless other signals pile up"""
+    score = 0
+
+    if features["synthesis"]:
+        score += 2
+    if features["words"] > LONG_QUERY_WORDS:
+        score += 1
+    if features["questions"] > 1:
+        score += 1
+    if (features["sourceCount"] or 0) >= MANY_SOURCES:
+        score += 1
+    if features["sessionDepth"] >= DEEP_SESSION_TURNS:
+        score += 1
+    if features["lookup"] and not features["synthesis"]:
+        score -= 1
+
+    if score <= 0:
+        return SIMPLE_TIER
+    if score <= 2:
+        return STANDARD_TIER
+    return COMPLEX_TIER
+
+
+def load_model_tiers(raw_tiers, default_model_arn):
+    """Tier to model ARN map from the MODEL_TIERS JSON object
+
+    Unconfigured tiers use the next larger configured tier, then the default model.
+    """
+    configured = json.loads(raw_tiers) if raw_tiers else {}
+
+    model_tiers = {}
+    fallback = default_model_arn
+    for tier in reversed(TIERS):
+        fallback = configured.get(tier) or fallback
+        model_tiers[tier] = fallback
+
+    return {tier: model_tiers[tier] for tier in TIERS}
+
+
+class ModelRouter:
+    """Pick a generation model per question, classifier is swappable for tests"""
+
+    def __init__(self, model_tiers, classifier=classify):
+        self.model_tiers = model_tiers
+        self.classifier = classifier
+
+    def route(self, user_query, session_depth=0, source_count=None):
+        features = extract_features(user_query, session_depth, source_count)
+        tier = self.classifier(features)
+
+        return tier, self.model_tiers[tier]
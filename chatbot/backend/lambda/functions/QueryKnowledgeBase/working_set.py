@@ -0,0 +1,120 @@
+import os
+
+from chatbot_common.clients import boto3
+from chatbot_common.jobs import to_dynamodb, from_dynamodb, now
+
+from multiquery import chunk_key
+from rerank import tokenize
+
+WORKING_SET_SIZE = 20
+# Matches the idle timeout of a Bedrock retrieve_and_generate session
+WORKING_SET_TTL_SECONDS = 60 * 60
+# Share of a follow-up's content terms the working set must contain to skip retrieval
+MIN_COVERAGE = 0.6
+
+STOPWORDS = frozenset(
+    "about also and any are can did does for from has have how its more not one "
+    "our out should tell than that the their them then there these they this "
+    "what when where which who why will with would you your".split()
+)
+
+
+def content_terms(text):
+    return {term for term in tokenize(text) if len(term) > 2 and term not in STOPWORDS}
+
+
+def coverage(user_query, chunks):
+    """Share of the question's content terms that appear somewhere in chunks
+
+    Follow-ups with no content terms of their own ("why?", "tell me more") are
+    about the chunks already in hand and count as fully covered.
+    """
+    terms = content_terms(user_query)
+    if not terms:
+        return 1.0
+
+    covered = set()
+    for chunk in chunks:
+        covered |= terms & set(tokenize(chunk["content"]["text"]))
+        if covered == terms:
+            break
+
+    return len(covered) / len(terms)
+
+
+def merge_chunks(recent, existing, size=WORKING_SET_SIZE):
+    """Most recently used chunks first, without duplicates, at most size of them"""
+    merged = {}
+    for chunk in list(recent) + list(existing):
+        merged.setdefault(chunk_key(chunk), chunk)
+        if len(merged) == size:
+            break
+
+    return list(merged.values())
+
+
+class InMemoryWorkingSetStore:
+    """Working sets kept in process memory, used locally and in tests"""
+
+    def __init__(self):
+        self._working_sets = {}
+
+    def get(self, session_id):
+        item = self._working_sets.get(session_id)
+        if not item or item["expiresAt"] < now():
+            return None
+        return dict(item)
+
+    def put(self, session_id, chunks, scope=None, detached=False):
+        self._working_sets[session_id] = new_working_set(
+            session_id, chunks, scope, detached
+        )
+
+
+class DynamoDBWorkingSetStore:
+    """Working sets in the DynamoDB table, expired by TTL along with the session"""
+
+    def __init__(self, table_name, resource=None):
+        resource = resource or boto3.resource("dynamodb")
+        self._table = resource.Table(table_name)
+
+    def get(self, session_id):
+        item = self._table.get_item(Key={"sessionId": session_id}).get("Item")
+        # TTL deletion lags, an expired item is already gone as far as callers know
+        if not item or item["expiresAt"] < now():
+            return None
+        return from_dynamodb(item)
+
+    def put(self, session_id, chunks, scope=None, detached=False):
+        self._table.put_item(
+            Item=to_dynamodb(new_working_set(session_id, chunks, scope, detached))
+        )
+
+
+def new_working_set(session_id, chunks, scope=None, detached=False):
+    """detached marks sessions with a turn answered off the Bedrock session"""
+    return {
+        "sessionId": session_id,
+        "scope": scope,
+        "chunks": chunks,
+        "detached": detached,
+        "expiresAt": now() + WORKING_SET_TTL_SECONDS,
+    }
+
+
+_WORKING_SET_STORE = None
+
+
+def get_working_set_store():
+    """Return the DynamoDB store when WORKING_SET_TABLE_NAME is set, in-memory otherwise"""
+    global _WORKING_SET_STORE
+
+    if _WORKING_SET_STORE is None:
+        table_name = os.environ.get("WORKING_SET_TABLE_NAME")
+        _WORKING_SET_STORE = (
+            DynamoDBWorkingSetStore(table_name)
+            if table_name
+            else InMemoryWorkingSetStore()
+        )
+
+    return _WORKING_SET_STORE
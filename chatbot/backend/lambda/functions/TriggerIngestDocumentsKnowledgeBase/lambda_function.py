@@ -1,28 +1,79 @@
-import boto3
+# First, so INIT_PROFILE=true times every import below
+from chatbot_common import init_profile
+
+init_profile.start()
+
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from aws_lambda_powertools import Logger
+from aws_lambda_powertools.metrics import MetricUnit
 from datetime import datetime
-from botocore.client import ClientError
+from urllib.parse import unquote
+from botocore.exceptions import ClientError
+from chatbot_common.clients import lazy_client
+from chatbot_common.connections import get_connection_pusher, DOCUMENTS_TOPIC
+from chatbot_common.documents import is_metadata_key, metadata_key, write_metadata
+from chatbot_common.keyword_index import build_index, KeywordIndex, KEYWORD_INDEX_KEY
+from chatbot_common.metrics import count, instrument, new_metrics, timed
+from chatbot_common.priming import prime
+from chatbot_common.tracing import new_tracer, stage
 
 logger = Logger()
+metrics = new_metrics()
+tracer = new_tracer()
 
 KNOWLEDGE_BASE_ID = os.environ.get("KNOWLEDGE_BASE_ID")
 DATA_SOURCE_ID = os.environ.get("DATA_SOURCE_ID")
+KNOWLEDGE_BASE_BUCKET = os.environ.get("KNOWLEDGE_BASE_BUCKET")
+KEYWORD_INDEX_BUCKET = os.environ.get("KEYWORD_INDEX_BUCKET")
+VECTOR_BUCKET_NAME = os.environ.get("VECTOR_BUCKET_NAME")
+VECTOR_INDEX_NAME = os.environ.get("VECTOR_INDEX_NAME")
+# Re-answers the frequent questions once the new corpus is searchable
+QUERY_FUNCTION_NAME = os.environ.get("QUERY_FUNCTION_NAME")
+
+INGESTION_POLL_INTERVAL_SECONDS = 5
+# Hand the watch over to a fresh invocation before this one times out
+WATCH_TIME_RESERVE_MS = 15000
+INGESTION_FINISHED_STATUSES = {"COMPLETE", "FAILED", "STOPPED"}
+MAX_METADATA_WORKERS = 8
+LIST_VECTORS_PAGE_SIZE = 1000
+# Statuses the watch last pushed, per ingestion job, kept out of the re-invoke
+# payload, which can't carry a large knowledge base's listing
+DOCUMENT_STATUSES_PREFIX = "ingestion-watch/"
+# Stands in for the bucket when there's none, as in local runs
+DOCUMENT_STATUSES = {}
 
-BEDROCK_AGENT_CLIENT = boto3.client("bedrock-agent")
+S3_CLIENT = lazy_client("s3")
+S3_VECTORS_CLIENT = lazy_client("s3vectors")
 
+BEDROCK_AGENT_CLIENT = lazy_client("bedrock-agent")
+LAMBDA_CLIENT = lazy_client("lambda")
 
+
+@tracer.capture_lambda_handler
+@instrument(metrics)
 def lambda_handler(event, context):
     """Trigger Knowledge Base sync after file uploads"""
     try:
-        response = BEDROCK_AGENT_CLIENT.start_ingestion_job(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            dataSourceId=DATA_SOURCE_ID,
-            description=f"Sync triggered at {datetime.now().isoformat()}",
-        )
+        # Async self-invocation watching an ingestion job
+        if "ingestionJobId" in event and "httpMethod" not in event:
+            if event.get("prepare"):
+                prepare_ingestion_watch(event["ingestionJobId"])
+            return watch_ingestion_job(event["ingestionJobId"], context)
+
+        # Only the job start runs in the request, everything else is handed to
+        # the watch so the sync stays inside API Gateway's 29s limit
+        with timed(metrics, "StartIngestion"), stage(tracer, "start_ingestion"):
+            response = BEDROCK_AGENT_CLIENT.start_ingestion_job(
+                knowledgeBaseId=KNOWLEDGE_BASE_ID,
+                dataSourceId=DATA_SOURCE_ID,
+                description=f"Sync triggered at {datetime.now().isoformat()}",
+            )
 
         ingestion_job = response["ingestionJob"]
+        start_ingestion_watch(ingestion_job["ingestionJobId"], context, prepare=True)
 
         return create_response(
             200,
@@ -60,6 +111,268 @@ def lambda_handler(event, context):
         )
 
 
+def backfill_document_metadata():
+    """Write metadata sidecars for documents uploaded before they were generated"""
+    objects = {}
+    paginator = S3_CLIENT.get_paginator("list_objects_v2")
+
+    for page in paginator.paginate(Bucket=KNOWLEDGE_BASE_BUCKET):
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith("/"):
+                objects[obj["Key"]] = obj
+
+    missing = [
+        obj
+        for key, obj in objects.items()
+        if not is_metadata_key(key) and metadata_key(key) not in objects
+    ]
+
+    def write(obj):
+        write_metadata(
+            S3_CLIENT,
+            KNOWLEDGE_BASE_BUCKET,
+            obj["Key"],
+            uploaded_at=obj["LastModified"].timestamp(),
+        )
+
+    with ThreadPoolExecutor(max_workers=MAX_METADATA_WORKERS) as executor:
+        list(executor.map(write, missing))
+
+    count(metrics, "MetadataBackfilled", len(missing))
+    if missing:
+        logger.info(f"Backfilled metadata for {len(missing)} documents")
+
+
+def start_ingestion_watch(ingestion_job_id, context, prepare=False):
+    payload = {"ingestionJobId": ingestion_job_id}
+    if prepare:
+        payload["prepare"] = True
+
+    LAMBDA_CLIENT.invoke(
+        FunctionName=context.function_name,
+        InvocationType="Event",
+        Payload=json.dumps(payload),
+    )
+
+
+def prepare_ingestion_watch(ingestion_job_id):
+    """Work the sync request hands off: the statuses the watch pushes changes
+    against, and metadata sidecars for documents that have none
+    """
+    # Taken first, while the job is still starting, so the watch's first push
+    # only carries documents the ingestion actually changed
+    if get_connection_pusher():
+        save_document_statuses(ingestion_job_id, list_document_statuses()[0])
+
+    # Sidecars written here are picked up by the next sync
+    with timed(metrics, "MetadataBackfill"), stage(tracer, "metadata_backfill"):
+        backfill_document_metadata()
+
+
+def document_statuses_key(ingestion_job_id):
+    return f"{DOCUMENT_STATUSES_PREFIX}{ingestion_job_id}.json"
+
+
+def load_document_statuses(ingestion_job_id):
+    """Statuses the watch on this ingestion job last pushed, empty if none were kept"""
+    if not KEYWORD_INDEX_BUCKET:
+        return dict(DOCUMENT_STATUSES.get(ingestion_job_id, {}))
+
+    try:
+        response = S3_CLIENT.get_object(
+            Bucket=KEYWORD_INDEX_BUCKET, Key=document_statuses_key(ingestion_job_id)
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return {}
+        raise
+    return json.loads(response["Body"].read())
+
+
+def save_document_statuses(ingestion_job_id, document_statuses):
+    if not KEYWORD_INDEX_BUCKET:
+        DOCUMENT_STATUSES[ingestion_job_id] = dict(document_statuses)
+        return
+
+    S3_CLIENT.put_object(
+        Bucket=KEYWORD_INDEX_BUCKET,
+        Key=document_statuses_key(ingestion_job_id),
+        Body=json.dumps(document_statuses).encode("utf-8"),
+    )
+
+
+def watch_ingestion_job(ingestion_job_id, context):
+    """Follow an ingestion job until it ends, pushing per-document status transitions
+    to subscribed WebSocket clients and refreshing the keyword index and FAQ answers
+    once it completes
+    """
+    pusher = get_connection_pusher()
+    # Nothing to push or refresh
+    if not (pusher or KEYWORD_INDEX_BUCKET or QUERY_FUNCTION_NAME):
+        return {}
+
+    document_statuses = load_document_statuses(ingestion_job_id) if pusher else {}
+
+    def push():
+        nonlocal document_statuses
+        current_statuses = push_document_transitions(document_statuses, pusher)
+        if current_statuses != document_statuses:
+            save_document_statuses(ingestion_job_id, current_statuses)
+        document_statuses = current_statuses
+
+    while True:
+        if pusher:
+            push()
+
+        ingestion_job = BEDROCK_AGENT_CLIENT.get_ingestion_job(
+            knowledgeBaseId=KNOWLEDGE_BASE_ID,
+            dataSourceId=DATA_SOURCE_ID,
+            ingestionJobId=ingestion_job_id,
+        )["ingestionJob"]
+        count(metrics, "IngestionPolls")
+
+        if ingestion_job["status"] in INGESTION_FINISHED_STATUSES:
+            record_ingestion_duration(ingestion_job)
+            if pusher:
+                push()
+
+            if ingestion_job["status"] == "COMPLETE" and KEYWORD_INDEX_BUCKET:
+                with timed(metrics, "KeywordIndexBuild"), stage(
+                    tracer, "keyword_index_build"
+                ):
+                    build_keyword_index()
+
+            if ingestion_job["status"] == "COMPLETE" and QUERY_FUNCTION_NAME:
+                start_faq_precompute(ingestion_job_id)
+
+            if pusher:
+                pusher.broadcast(
+                    DOCUMENTS_TOPIC,
+                    {
+                        "type": "ingestion.finished",
+                        "ingestionJobId": ingestion_job_id,
+                        "status": ingestion_job["status"],
+                    },
+                )
+            return document_statuses
+
+        if context.get_remaining_time_in_millis() < WATCH_TIME_RESERVE_MS:
+            start_ingestion_watch(ingestion_job_id, context)
+            return document_statuses
+
+        time.sleep(INGESTION_POLL_INTERVAL_SECONDS)
+
+
+def record_ingestion_duration(ingestion_job):
+    if "startedAt" in ingestion_job and "updatedAt" in ingestion_job:
+        duration = ingestion_job["updatedAt"] - ingestion_job["startedAt"]
+        metrics.add_metric(
+            name="IngestionDuration",
+            unit=MetricUnit.Seconds,
+            value=duration.total_seconds(),
+        )
+
+
+def list_indexed_chunks():
+    """Chunk text and source of every vector, S3 Vectors keeps the text as metadata"""
+    paginator = S3_VECTORS_CLIENT.get_paginator("list_vectors")
+    pages = paginator.paginate(
+        vectorBucketName=VECTOR_BUCKET_NAME,
+        indexName=VECTOR_INDEX_NAME,
+        returnMetadata=True,
+        PaginationConfig={"PageSize": LIST_VECTORS_PAGE_SIZE},
+    )
+
+    for page in pages:
+        for vector in page.get("vectors", []):
+            metadata = vector.get("metadata", {})
+            text = metadata.get("AMAZON_BEDROCK_TEXT")
+            if not text:
+                continue
+
+            yield {
+                "text": text,
+                "uri": metadata.get("x-amz-bedrock-kb-source-uri", ""),
+                "page": metadata.get("x-amz-bedrock-kb-document-page-number"),
+                "chunkId": metadata.get("x-amz-bedrock-kb-chunk-id", vector["key"]),
+                "documentId": metadata.get("documentId"),
+                "tags": metadata.get("tags") or [],
+            }
+
+
+def build_keyword_index():
+    """Rebuild the keyword index QueryKnowledgeBase maps for exact-term lookups"""
+    # Streamed, the chunks are only held once, as the index being built
+    index_bytes = build_index(list_indexed_chunks())
+    chunk_count = KeywordIndex(index_bytes).chunk_count
+
+    S3_CLIENT.put_object(
+        Bucket=KEYWORD_INDEX_BUCKET, Key=KEYWORD_INDEX_KEY, Body=index_bytes
+    )
+    count(metrics, "KeywordIndexChunks", chunk_count)
+
+    logger.info(
+        f"Built keyword index over {chunk_count} chunks ({len(index_bytes)} bytes)"
+    )
+
+
+def start_faq_precompute(ingestion_job_id):
+    """Have QueryKnowledgeBase re-answer the frequent questions against the new corpus"""
+    LAMBDA_CLIENT.invoke(
+        FunctionName=QUERY_FUNCTION_NAME,
+        InvocationType="Event",
+        Payload=json.dumps({"precomputeAnswers": {"corpusVersion": ingestion_job_id}}),
+    )
+
+    logger.info(f"Started FAQ precompute for ingestion job {ingestion_job_id}")
+
+
+def list_document_statuses():
+    """Status of every document in the data source, and its listing entry, by S3 key"""
+    statuses = {}
+    documents = {}
+    paginator = BEDROCK_AGENT_CLIENT.get_paginator("list_knowledge_base_documents")
+    pages = paginator.paginate(
+        knowledgeBaseId=KNOWLEDGE_BASE_ID,
+        dataSourceId=DATA_SOURCE_ID,
+        PaginationConfig={"PageSize": 1000},
+    )
+
+    for page in pages:
+        for document in page.get("documentDetails", []):
+            s3_key = unquote(
+                document.get("identifier", {}).get("s3", {}).get("uri", "")
+            )
+            statuses[s3_key] = document.get("status")
+            documents[s3_key] = document
+
+    return statuses, documents
+
+
+def push_document_transitions(previous_statuses, pusher):
+    current_statuses, documents = list_document_statuses()
+    transitions = [
+        {
+            "type": "document.status",
+            "s3Key": s3_key,
+            "status": status,
+            "statusReason": documents[s3_key].get("statusReason", ""),
+            "updatedAt": (
+                documents[s3_key]["updatedAt"].isoformat()
+                if "updatedAt" in documents[s3_key]
+                else None
+            ),
+        }
+        for s3_key, status in current_statuses.items()
+        if previous_statuses.get(s3_key) != status
+    ]
+
+    if transitions:
+        pusher.broadcast(DOCUMENTS_TOPIC, *transitions)
+
+    return current_statuses
+
+
 def create_response(status_code, message, payload=None):
     if not payload:
         payload = {}
@@ -76,3 +389,20 @@ def create_response(status_code, message, payload=None):
         },
         "body": json.dumps(response_body),
     }
+
+
+# Last, so everything the first request needs is defined
+PRIMING = prime(
+    {
+        S3_CLIENT: ["ListObjectsV2", "PutObject"],
+        S3_VECTORS_CLIENT: ["ListVectors"],
+        BEDROCK_AGENT_CLIENT: [
+            "StartIngestionJob",
+            "GetIngestionJob",
+            "ListKnowledgeBaseDocuments",
+        ],
+        LAMBDA_CLIENT: ["Invoke"],
+    }
+)
+if PRIMING:
+    logger.info("Primed for the first request", extra=PRIMING)
@@ -0,0 +1,129 @@
+# First, so INIT_PROFILE=true times every import below
+from chatbot_common import init_profile
+
+init_profile.start()
+
+import os
+import json
+from botocore.exceptions import ClientError
+from aws_lambda_powertools import Logger
+from chatbot_common.clients import lazy_client
+from chatbot_common.jobs import get_job_store
+from chatbot_common.connections import (
+    get_connection_registry,
+    get_connection_pusher,
+    DOCUMENTS_TOPIC,
+)
+from chatbot_common.metrics import instrument, new_metrics
+from chatbot_common.priming import prime
+from chatbot_common.tracing import new_tracer
+
+logger = Logger()
+metrics = new_metrics()
+tracer = new_tracer()
+
+QUERY_KNOWLEDGE_BASE_FUNCTION_NAME = os.environ.get(
+    "QUERY_KNOWLEDGE_BASE_FUNCTION_NAME"
+)
+
+CHAT_JOB_TYPE = "CHAT"
+SUBSCRIBABLE_TOPICS = {DOCUMENTS_TOPIC}
+
+LAMBDA_CLIENT = lazy_client("lambda")
+
+
+@tracer.capture_lambda_handler
+@instrument(metrics)
+def lambda_handler(event, context):
+    """Handle $connect, $disconnect and client messages for the WebSocket API"""
+    route_key = event["requestContext"]["routeKey"]
+    connection_id = event["requestContext"]["connectionId"]
+
+    try:
+        if route_key == "$connect":
+            return connect_handler(connection_id)
+
+        if route_key == "$disconnect":
+            return disconnect_handler(connection_id)
+
+        message = json.loads(event.get("body") or "{}")
+        return message_handler(connection_id, message)
+
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+
+        logger.exception(f"AWS Error: {error_code} - {error_message}")
+
+        return create_response(500, error_message)
+
+    except Exception as e:
+        logger.exception(str(e))
+        return create_response(500, str(e))
+
+
+def connect_handler(connection_id):
+    get_connection_registry().add(connection_id)
+    return create_response(200, "Connected")
+
+
+def disconnect_handler(connection_id):
+    get_connection_registry().remove(connection_id)
+    return create_response(200, "Disconnected")
+
+
+def message_handler(connection_id, message):
+    action = message.get("action")
+
+    if action == "subscribe":
+        topics = set(message.get("topics", [])) & SUBSCRIBABLE_TOPICS
+        if topics:
+            get_connection_registry().subscribe(connection_id, topics)
+        return create_response(200, "Subscribed")
+
+    if action == "chat":
+        job = start_chat_job(connection_id, message)
+        get_connection_pusher().send(
+            connection_id,
+            {"type": "chat.accepted", "jobId": job["jobId"]},
+        )
+        return create_response(200, "Accepted")
+
+    return create_response(400, f"Unknown action '{action}'")
+
+
+def start_chat_job(connection_id, message):
+    """Hand the chat to QueryKnowledgeBase, which streams the answer back to the connection"""
+    job = get_job_store().create(CHAT_JOB_TYPE)
+
+    request_body = {"messages": message["messages"]}
+    if message.get("sessionId"):
+        request_body["sessionId"] = message["sessionId"]
+    if message.get("scope"):
+        request_body["scope"] = message["scope"]
+
+    LAMBDA_CLIENT.invoke(
+        FunctionName=QUERY_KNOWLEDGE_BASE_FUNCTION_NAME,
+        InvocationType="Event",
+        Payload=json.dumps(
+            {
+                "jobId": job["jobId"],
+                "request": request_body,
+                "connectionId": connection_id,
+            }
+        ),
+    )
+
+    logger.info(f"Started chat job {job['jobId']} for connection {connection_id}")
+
+    return job
+
+
+def create_response(status_code, message):
+    return {"statusCode": status_code, "body": message}
+
+
+# Last, so everything the first request needs is defined
+PRIMING = prime({LAMBDA_CLIENT: ["Invoke"]})
+if PRIMING:
+    logger.info("Primed for the first request", extra=PRIMING)
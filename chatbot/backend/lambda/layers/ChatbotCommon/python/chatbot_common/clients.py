@@ -0,0 +1,51 @@
+import threading
+
+from aws_lambda_powertools.shared.lazy_import import LazyLoader
+
+# boto3 and most of botocore load on the first client built, not at import
+boto3 = LazyLoader("boto3", globals(), "boto3")
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+class LazyClient:
+    """Stands in for boto3.client(service_name, ...), built on first use"""
+
+    def __init__(self, service_name, **client_kwargs):
+        self.service_name = service_name
+        self._client_kwargs = client_kwargs
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._client is not None
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = boto3.client(
+                        self.service_name, **self._client_kwargs
+                    )
+        return self._client
+
+    def reset(self):
+        """Drop the client, the next use builds a new one"""
+        with self._lock:
+            self._client = None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def lazy_client(service_name, config=None):
+    """Client for service_name, shared by every module that asks without a config"""
+    if config is not None:
+        return LazyClient(service_name, config=config)
+
+    with _CLIENTS_LOCK:
+        if service_name not in _CLIENTS:
+            _CLIENTS[service_name] = LazyClient(service_name)
+        return _CLIENTS[service_name]
@@ -0,0 +1,144 @@
+import json
+import os
+import time
+from botocore.exceptions import ClientError
+
+from chatbot_common.clients import boto3
+
+DOCUMENTS_TOPIC = "documents"
+
+CONNECTION_TTL_SECONDS = 2 * 60 * 60  # API Gateway closes WebSockets after 2 hours
+
+
+class InMemoryConnectionRegistry:
+    """Connection registry kept in process memory, used locally and in tests"""
+
+    def __init__(self):
+        self._connections = {}
+
+    def add(self, connection_id):
+        self._connections[connection_id] = new_connection(connection_id)
+
+    def remove(self, connection_id):
+        self._connections.pop(connection_id, None)
+
+    def subscribe(self, connection_id, topics):
+        connection = self._connections.setdefault(
+            connection_id, new_connection(connection_id)
+        )
+        connection["topics"] = connection.get("topics", set()) | set(topics)
+
+    def subscribers(self, topic):
+        return [
+            connection_id
+            for connection_id, connection in self._connections.items()
+            if topic in connection.get("topics", ())
+        ]
+
+
+class DynamoDBConnectionRegistry:
+    """Connection registry backed by the connections DynamoDB table"""
+
+    def __init__(self, table_name, resource=None):
+        resource = resource or boto3.resource("dynamodb")
+        self._table = resource.Table(table_name)
+
+    def add(self, connection_id):
+        self._table.put_item(Item=new_connection(connection_id))
+
+    def remove(self, connection_id):
+        self._table.delete_item(Key={"connectionId": connection_id})
+
+    def subscribe(self, connection_id, topics):
+        self._table.update_item(
+            Key={"connectionId": connection_id},
+            UpdateExpression="ADD topics :topics",
+            ExpressionAttributeValues={":topics": set(topics)},
+        )
+
+    def subscribers(self, topic):
+        connection_ids = []
+        params = {
+            "FilterExpression": "contains(topics, :topic)",
+            "ExpressionAttributeValues": {":topic": topic},
+            "ProjectionExpression": "connectionId",
+        }
+
+        while True:
+            response = self._table.scan(**params)
+            connection_ids.extend(item["connectionId"] for item in response["Items"])
+
+            if "LastEvaluatedKey" not in response:
+                return connection_ids
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def new_connection(connection_id):
+    # topics is left unset so DynamoDB can create it as a string set on first ADD
+    connected_at = int(time.time())
+    return {
+        "connectionId": connection_id,
+        "connectedAt": connected_at,
+        "expiresAt": connected_at + CONNECTION_TTL_SECONDS,
+    }
+
+
+class ConnectionPusher:
+    """Sends JSON messages to WebSocket clients through the API Gateway callback URL"""
+
+    def __init__(self, callback_url, registry, client=None):
+        self._client = client or boto3.client(
+            "apigatewaymanagementapi", endpoint_url=callback_url
+        )
+        self._registry = registry
+
+    def send(self, connection_id, message):
+        """Return False when the client has gone away"""
+        try:
+            self._client.post_to_connection(
+                ConnectionId=connection_id, Data=json.dumps(message).encode("utf-8")
+            )
+            return True
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "GoneException":
+                raise
+
+            self._registry.remove(connection_id)
+            return False
+
+    def broadcast(self, topic, *messages):
+        for connection_id in self._registry.subscribers(topic):
+            for message in messages:
+                if not self.send(connection_id, message):
+                    break
+
+
+_CONNECTION_REGISTRY = None
+_CONNECTION_PUSHER = None
+
+
+def get_connection_registry():
+    """Return the DynamoDB registry when CONNECTIONS_TABLE_NAME is set, in-memory otherwise"""
+    global _CONNECTION_REGISTRY
+
+    if _CONNECTION_REGISTRY is None:
+        table_name = os.environ.get("CONNECTIONS_TABLE_NAME")
+        _CONNECTION_REGISTRY = (
+            DynamoDBConnectionRegistry(table_name)
+            if table_name
+            else InMemoryConnectionRegistry()
+        )
+
+    return _CONNECTION_REGISTRY
+
+
+def get_connection_pusher():
+    """Return None when no WebSocket API is configured"""
+    global _CONNECTION_PUSHER
+
+    callback_url = os.environ.get("WEBSOCKET_CALLBACK_URL")
+    if _CONNECTION_PUSHER is None and callback_url:
+        _CONNECTION_PUSHER = ConnectionPusher(callback_url, get_connection_registry())
+
+    return _CONNECTION_PUSHER
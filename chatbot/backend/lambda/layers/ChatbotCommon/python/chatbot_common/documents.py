@@ -0,0 +1,39 @@
+import json
+import time
+import uuid
+
+# Bedrock knowledge bases read per-document metadata from "<key>.metadata.json"
+METADATA_SUFFIX = ".metadata.json"
+
+
+def document_id(s3_uri):
+    """Stable id for a document, derived from its unquoted S3 URI"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, s3_uri))
+
+
+def is_metadata_key(key):
+    return key.endswith(METADATA_SUFFIX)
+
+
+def metadata_key(key):
+    return f"{key}{METADATA_SUFFIX}"
+
+
+def build_metadata(bucket, key, tags=None, uploaded_at=None):
+    attributes = {
+        "documentId": document_id(f"s3://{bucket}/{key}"),
+        "uploadedAt": int(uploaded_at if uploaded_at is not None else time.time()),
+    }
+    if tags:
+        attributes["tags"] = sorted(set(tags))
+
+    return {"metadataAttributes": attributes}
+
+
+def write_metadata(s3_client, bucket, key, tags=None, uploaded_at=None):
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=metadata_key(key),
+        Body=json.dumps(build_metadata(bucket, key, tags, uploaded_at)),
+        ContentType="application/json",
+    )
@@ -0,0 +1,137 @@
+# Handler modules import this before anything else, keep it to the stdlib
+import builtins
+import importlib.util
+import os
+import sys
+import time
+
+INIT_PROFILE = os.environ.get("INIT_PROFILE", "false").lower() == "true"
+
+# Import time is grouped by top-level package, powertools by subsystem. Modules
+# outside these are charged to the tracked import that pulled them in.
+TRACKED_PACKAGES = (
+    "boto3",
+    "botocore",
+    "aws_lambda_powertools",
+    "aws_xray_sdk",
+    "chatbot_common",
+)
+OTHER_GROUP = "other"
+
+_profiler = None
+
+
+def import_group(module_name):
+    package, _, rest = module_name.partition(".")
+    if package not in TRACKED_PACKAGES:
+        return None
+    if package == "aws_lambda_powertools":
+        return f"powertools.{rest.split('.')[0]}" if rest else "powertools"
+    return package
+
+
+class InitProfiler:
+    """Times imports and boto3 client construction from start() until stop()
+
+    Imports are timed by wrapping builtins.__import__. Each import's own
+    time, less the nested imports it triggered, goes to its group. Client
+    construction is timed by wrapping boto3.Session.client once boto3 has
+    been imported, less any imports it triggered, so the import and client
+    totals don't overlap.
+    """
+
+    def __init__(self):
+        self.started = None
+        self.stopped = None
+        self.imports = {}
+        self.clients = []
+        self._stack = []
+        self._original_import = None
+        self._original_client = None
+        self._session_class = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+        builtins.__import__ = self._original_import
+        if self._session_class:
+            self._session_class.client = self._original_client
+        return self.report()
+
+    def report(self):
+        end = self.stopped or time.perf_counter()
+        imports = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "initMs": round((end - self.started) * 1000, 1),
+            "importMs": round(sum(self.imports.values()), 1),
+            "clientMs": round(sum(client["ms"] for client in self.clients), 1),
+            "imports": {group: round(ms, 1) for group, ms in imports},
+            "clients": self.clients,
+        }
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = name
+        if level:
+            package = (globals or {}).get("__package__") or ""
+            module_name = importlib.util.resolve_name("." * level + name, package)
+
+        group = import_group(module_name) or (
+            self._stack[-1][0] if self._stack else OTHER_GROUP
+        )
+        # [group, started, time spent in nested imports]
+        frame = [group, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._stack.pop()
+            elapsed = (time.perf_counter() - frame[1]) * 1000
+            self.imports[group] = self.imports.get(group, 0.0) + elapsed - frame[2]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+            if not self._session_class:
+                self._patch_client()
+
+    def _patch_client(self):
+        session_class = getattr(sys.modules.get("boto3.session"), "Session", None)
+        if session_class is None:
+            return
+        self._session_class = session_class
+        self._original_client = original_client = session_class.client
+        profiler = self
+
+        def client(session, service_name, *args, **kwargs):
+            # Imports botocore makes while building the client stay botocore's
+            frame = ["botocore", time.perf_counter(), 0.0]
+            profiler._stack.append(frame)
+            try:
+                return original_client(session, service_name, *args, **kwargs)
+            finally:
+                profiler._stack.remove(frame)
+                elapsed = (time.perf_counter() - frame[1]) * 1000
+                profiler.clients.append(
+                    {"service": service_name, "ms": round(elapsed - frame[2], 1)}
+                )
+                if profiler._stack:
+                    profiler._stack[-1][2] += elapsed
+
+        session_class.client = client
+
+
+def start():
+    """Profile the rest of module init when INIT_PROFILE is on"""
+    global _profiler
+    if INIT_PROFILE and _profiler is None:
+        _profiler = InitProfiler()
+        _profiler.start()
+
+
+def stop():
+    """The init report the first time it's called after start(), otherwise None"""
+    if _profiler is None or _profiler.stopped:
+        return None
+    return _profiler.stop()
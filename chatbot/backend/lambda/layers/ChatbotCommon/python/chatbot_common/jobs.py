@@ -0,0 +1,122 @@
+import os
+import time
+import uuid
+from decimal import Decimal
+
+from chatbot_common.clients import boto3
+
+JOB_STATUS_PENDING = "PENDING"
+JOB_STATUS_RUNNING = "RUNNING"
+JOB_STATUS_SUCCEEDED = "SUCCEEDED"
+JOB_STATUS_FAILED = "FAILED"
+
+JOB_TTL_SECONDS = 24 * 60 * 60  # Job records expire after a day
+
+
+class InMemoryJobStore:
+    """Job store kept in process memory, used locally and in tests"""
+
+    def __init__(self):
+        self._jobs = {}
+
+    def create(self, job_type, payload=None):
+        job = new_job(job_type, payload)
+        self._jobs[job["jobId"]] = job
+        return dict(job)
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def update(self, job_id, **fields):
+        job = self._jobs[job_id]
+        job.update(fields, updatedAt=now())
+        return dict(job)
+
+
+class DynamoDBJobStore:
+    """Job store backed by the jobs DynamoDB table"""
+
+    def __init__(self, table_name, resource=None):
+        resource = resource or boto3.resource("dynamodb")
+        self._table = resource.Table(table_name)
+
+    def create(self, job_type, payload=None):
+        job = new_job(job_type, payload)
+        self._table.put_item(Item=to_dynamodb(job))
+        return job
+
+    def get(self, job_id):
+        response = self._table.get_item(Key={"jobId": job_id}, ConsistentRead=True)
+        item = response.get("Item")
+        return from_dynamodb(item) if item else None
+
+    def update(self, job_id, **fields):
+        fields["updatedAt"] = now()
+        names = {f"#{key}": key for key in fields}
+        values = {f":{key}": to_dynamodb(value) for key, value in fields.items()}
+        expression = ", ".join(f"#{key} = :{key}" for key in fields)
+
+        response = self._table.update_item(
+            Key={"jobId": job_id},
+            UpdateExpression=f"SET {expression}",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW",
+        )
+        return from_dynamodb(response["Attributes"])
+
+
+def new_job(job_type, payload=None):
+    timestamp = now()
+    return {
+        "jobId": str(uuid.uuid4()),
+        "jobType": job_type,
+        "status": JOB_STATUS_PENDING,
+        "payload": payload or {},
+        "result": None,
+        "error": None,
+        "createdAt": timestamp,
+        "updatedAt": timestamp,
+        "expiresAt": timestamp + JOB_TTL_SECONDS,
+    }
+
+
+def to_dynamodb(value):
+    """DynamoDB rejects floats, so store them as Decimals"""
+    if isinstance(value, dict):
+        return {key: to_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_dynamodb(item) for item in value]
+    if isinstance(value, float):
+        return Decimal(str(value))
+    return value
+
+
+def from_dynamodb(value):
+    """Convert the Decimals boto3 returns back into plain JSON-serialisable numbers"""
+    if isinstance(value, dict):
+        return {key: from_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_dynamodb(item) for item in value]
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def now():
+    return int(time.time())
+
+
+_JOB_STORE = None
+
+
+def get_job_store():
+    """Return the DynamoDB store when JOBS_TABLE_NAME is set, in-memory otherwise"""
+    global _JOB_STORE
+
+    if _JOB_STORE is None:
+        table_name = os.environ.get("JOBS_TABLE_NAME")
+        _JOB_STORE = DynamoDBJobStore(table_name) if table_name else InMemoryJobStore()
+
+    return _JOB_STORE
@@ -0,0 +1,335 @@
+import array
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import time
+from collections import Counter
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+from chatbot_common.clients import boto3, lazy_client
+
+KEYWORD_INDEX_KEY = "keyword-index/index.bin"
+LOCAL_INDEX_PATH = "/tmp/keyword-index.bin"
+# How often a warm container checks S3 for a newer build
+INDEX_REFRESH_SECONDS = 300
+
+INDEX_MAGIC = b"KWX1"
+# magic, term count, chunk count, posting count, chunk store bytes
+HEADER = struct.Struct("<4sIIIQ")
+HEADER_SIZE = 32
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Identifiers keep their separators, "POL-2024-07" is one token as well as its parts
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_./:]")
+# Part numbers, policy codes, ticket ids: "AX4410", "AX-4410", "POL-2024-07"
+IDENTIFIER_PATTERN = re.compile(
+    r"\b(?=[\w-]*[A-Za-z])(?=[\w-]*\d{3})[A-Za-z0-9]+(?:[-_./:][A-Za-z0-9]+)*\b"
+    r"|\b(?=[\w./:-]*[A-Za-z])[A-Za-z0-9]+(?:[-_./:][A-Za-z0-9]+){2,}\b"
+)
+# Shaped like identifiers but not codes: "v1.2.3", "2.4.6-rc1", "2024-07-01T10:00"
+NOT_IDENTIFIER_PATTERN = re.compile(
+    r"v?\d+(?:\.\d+)+(?:[-+][a-z0-9.]+)?|\d{4}-\d{2}-\d{2}(?:t[\d:.]+z?)?"
+)
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = TOKEN_SEPARATORS.split(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def term_hash(term):
+    """Stable 64-bit term id, Python's hash() is salted per process"""
+    return int.from_bytes(
+        hashlib.blake2b(term.encode(), digest_size=8).digest(), "little"
+    )
+
+
+def identifiers(query):
+    """Codes and part numbers named in the query, as index terms"""
+    return [
+        match.lower()
+        for match in IDENTIFIER_PATTERN.findall(query)
+        if re.search(r"\d", match)
+        and not NOT_IDENTIFIER_PATTERN.fullmatch(match.lower())
+    ]
+
+
+def looks_like_identifier(query):
+    """Queries naming a code or part number are served from the keyword index alone"""
+    return bool(identifiers(query))
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def _section_offsets(term_count, chunk_count, posting_count):
+    """Byte offsets of each array in the file, every section starts 8-byte aligned"""
+    offsets = {}
+    offset = HEADER_SIZE
+    for name, size in (
+        ("term_hashes", 8 * term_count),
+        ("term_offsets", 8 * (term_count + 1)),
+        ("posting_chunks", 4 * posting_count),
+        ("posting_frequencies", 4 * posting_count),
+        ("chunk_lengths", 4 * chunk_count),
+        ("chunk_offsets", 8 * (chunk_count + 1)),
+        ("chunk_store", None),
+    ):
+        offsets[name] = offset
+        if size is not None:
+            offset = _aligned(offset + size)
+    return offsets
+
+
+def build_index(chunks):
+    """Serialise chunks into the single-file index
+
+    Each chunk is a dict with text, uri and optionally page, chunkId,
+    documentId and tags. chunks is read once and not kept, so a generator
+    streams them. Postings accumulate in typed arrays rather than lists of
+    ints to keep the build within a small function's memory.
+    """
+    hashes = array.array("Q")
+    chunk_ids = array.array("I")
+    frequencies = array.array("I")
+    chunk_lengths = array.array("I")
+    chunk_offsets = array.array("Q", [0])
+    chunk_store = bytearray()
+    hash_cache = {}
+
+    for chunk_index, chunk in enumerate(chunks):
+        tokens = tokenize(chunk["text"])
+        chunk_lengths.append(len(tokens))
+        chunk_store += json.dumps(chunk, separators=(",", ":")).encode()
+        chunk_offsets.append(len(chunk_store))
+
+        for term, count in Counter(tokens).items():
+            if term not in hash_cache:
+                hash_cache[term] = term_hash(term)
+            hashes.append(hash_cache[term])
+            chunk_ids.append(chunk_index)
+            frequencies.append(count)
+
+    chunk_count = len(chunk_lengths)
+    hashes = np.frombuffer(hashes, dtype=np.uint64)
+    chunk_ids = np.frombuffer(chunk_ids, dtype=np.uint32)
+    frequencies = np.frombuffer(frequencies, dtype=np.uint32)
+
+    # Postings grouped by term, chunk order within a term
+    order = np.lexsort((chunk_ids, hashes))
+    hashes, chunk_ids, frequencies = hashes[order], chunk_ids[order], frequencies[order]
+    term_hashes, term_starts = np.unique(hashes, return_index=True)
+    term_offsets = np.append(term_starts, len(hashes)).astype(np.uint64)
+
+    offsets = _section_offsets(len(term_hashes), chunk_count, len(hashes))
+    buffer = bytearray(offsets["chunk_store"] + len(chunk_store))
+    HEADER.pack_into(
+        buffer,
+        0,
+        INDEX_MAGIC,
+        len(term_hashes),
+        chunk_count,
+        len(hashes),
+        len(chunk_store),
+    )
+
+    for name, values in (
+        ("term_hashes", term_hashes.astype(np.uint64)),
+        ("term_offsets", term_offsets),
+        ("posting_chunks", chunk_ids),
+        ("posting_frequencies", frequencies),
+        ("chunk_lengths", np.frombuffer(chunk_lengths, dtype=np.uint32)),
+        ("chunk_offsets", np.frombuffer(chunk_offsets, dtype=np.uint64)),
+    ):
+        data = values.astype(values.dtype.newbyteorder("<")).tobytes()
+        buffer[offsets[name] : offsets[name] + len(data)] = data
+
+    buffer[offsets["chunk_store"] :] = chunk_store
+
+    return bytes(buffer)
+
+
+class KeywordIndex:
+    """Read-only view over an index file, arrays are mapped not loaded"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, term_count, chunk_count, posting_count, store_size = HEADER.unpack_from(
+            buffer, 0
+        )
+        if magic != INDEX_MAGIC:
+            raise ValueError("Not a keyword index file")
+
+        offsets = _section_offsets(term_count, chunk_count, posting_count)
+
+        def array(name, dtype, count):
+            return np.frombuffer(buffer, dtype=dtype, count=count, offset=offsets[name])
+
+        self.chunk_count = chunk_count
+        self.term_hashes = array("term_hashes", "<u8", term_count)
+        self.term_offsets = array("term_offsets", "<u8", term_count + 1)
+        self.posting_chunks = array("posting_chunks", "<u4", posting_count)
+        self.posting_frequencies = array("posting_frequencies", "<u4", posting_count)
+        self.chunk_lengths = array("chunk_lengths", "<u4", chunk_count)
+        self.chunk_offsets = array("chunk_offsets", "<u8", chunk_count + 1)
+        self._store_offset = offsets["chunk_store"]
+        self._average_length = (
+            max(float(self.chunk_lengths.mean()), 1.0) if chunk_count else 1.0
+        )
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as index_file:
+            return cls(mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def chunk(self, chunk_index):
+        start = self._store_offset + int(self.chunk_offsets[chunk_index])
+        end = self._store_offset + int(self.chunk_offsets[chunk_index + 1])
+        return json.loads(self._buffer[start:end])
+
+    def _postings(self, term):
+        """Start and end of the term's postings, None when no chunk has it"""
+        term_id = np.uint64(term_hash(term))
+        position = np.searchsorted(self.term_hashes, term_id)
+        if position == len(self.term_hashes) or self.term_hashes[position] != term_id:
+            return None
+        return int(self.term_offsets[position]), int(self.term_offsets[position + 1])
+
+    def scores(self, query):
+        """BM25 score of every chunk, zero for chunks sharing no term with the query"""
+        scores = np.zeros(self.chunk_count)
+
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if postings is None:
+                continue
+
+            start, end = postings
+            chunk_ids = self.posting_chunks[start:end]
+            frequencies = self.posting_frequencies[start:end].astype(np.float64)
+
+            idf = np.log1p(
+                (self.chunk_count - (end - start) + 0.5) / (end - start + 0.5)
+            )
+            length_norm = BM25_K1 * (
+                1
+                - BM25_B
+                + BM25_B * self.chunk_lengths[chunk_ids] / self._average_length
+            )
+            scores[chunk_ids] += (
+                idf * frequencies * (BM25_K1 + 1) / (frequencies + length_norm)
+            )
+
+        return scores
+
+    def search(self, query, top_k, document_ids=None, tags=None, required_terms=None):
+        """Best matching chunks shaped like bedrock-agent-runtime retrieval results
+
+        With required_terms, only chunks containing one of them match, so a
+        query sharing just its common words with a chunk doesn't.
+        """
+        scores = self.scores(query)
+        if required_terms is not None:
+            required = np.zeros(self.chunk_count, dtype=bool)
+            for term in set(required_terms):
+                postings = self._postings(term)
+                if postings is not None:
+                    required[self.posting_chunks[postings[0] : postings[1]]] = True
+            scores[~required] = 0
+
+        matching = np.flatnonzero(scores)
+        if not len(matching):
+            return []
+
+        ranked = matching[np.argsort(-scores[matching], kind="stable")]
+
+        results = []
+        for chunk_index in ranked:
+            chunk = self.chunk(int(chunk_index))
+            if document_ids and chunk.get("documentId") not in document_ids:
+                continue
+            if tags and not set(tags) & set(chunk.get("tags") or []):
+                continue
+
+            results.append(to_retrieval_result(chunk, float(scores[chunk_index])))
+            if len(results) == top_k:
+                break
+
+        return results
+
+
+def to_retrieval_result(chunk, score):
+    metadata = {
+        "x-amz-bedrock-kb-source-uri": chunk["uri"],
+        "documentId": chunk.get("documentId"),
+        "tags": chunk.get("tags") or [],
+    }
+    if chunk.get("page") is not None:
+        metadata["x-amz-bedrock-kb-document-page-number"] = chunk["page"]
+    if chunk.get("chunkId"):
+        metadata["x-amz-bedrock-kb-chunk-id"] = chunk["chunkId"]
+
+    return {
+        "content": {"text": chunk["text"]},
+        "location": {"type": "S3", "s3Location": {"uri": chunk["uri"]}},
+        "metadata": metadata,
+        "score": score,
+        "keywordMatch": True,
+    }
+
+
+_KEYWORD_INDEX = None
+_KEYWORD_INDEX_ETAG = None
+_KEYWORD_INDEX_CHECKED_AT = 0.0
+
+
+def get_keyword_index(s3_client=None):
+    """Return the mapped index, downloading a newer build at most every few minutes
+
+    Returns None when KEYWORD_INDEX_BUCKET is unset or no index has been built.
+    """
+    global _KEYWORD_INDEX, _KEYWORD_INDEX_ETAG, _KEYWORD_INDEX_CHECKED_AT
+
+    bucket = os.environ.get("KEYWORD_INDEX_BUCKET")
+    if not bucket:
+        return None
+
+    now = time.monotonic()
+    if (
+        _KEYWORD_INDEX_CHECKED_AT
+        and now - _KEYWORD_INDEX_CHECKED_AT < INDEX_REFRESH_SECONDS
+    ):
+        return _KEYWORD_INDEX
+    _KEYWORD_INDEX_CHECKED_AT = now
+
+    s3_client = s3_client or lazy_client("s3")
+
+    try:
+        etag = s3_client.head_object(Bucket=bucket, Key=KEYWORD_INDEX_KEY)["ETag"]
+        if etag != _KEYWORD_INDEX_ETAG:
+            # Replace rather than overwrite, an older mapping stays valid
+            download_path = f"{LOCAL_INDEX_PATH}.download"
+            s3_client.download_file(bucket, KEYWORD_INDEX_KEY, download_path)
+            os.replace(download_path, LOCAL_INDEX_PATH)
+            _KEYWORD_INDEX = KeywordIndex.open(LOCAL_INDEX_PATH)
+            _KEYWORD_INDEX_ETAG = etag
+
+    except ClientError:
+        # Not built yet or S3 unavailable, keep serving whatever is mapped
+        pass
+
+    return _KEYWORD_INDEX
@@ -0,0 +1,115 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+from aws_lambda_powertools import Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.metrics.provider.cloudwatch_emf.cloudwatch import (
+    AmazonCloudWatchEMFProvider,
+)
+
+from chatbot_common import init_profile
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "Chatbot")
+
+# Route dimension values, anything else is recorded as OTHER_ROUTE so
+# unknown paths can't add metric series
+ROUTES = {
+    "/chat",
+    "/chat/status",
+    "/documents/list",
+    "/documents/downloadpresignedurl",
+    "/documents/uploadpresignedurl",
+    "/documents/sync",
+    "/documents/delete",
+    "/documents/delete/status",
+    "$connect",
+    "$disconnect",
+    "$default",
+}
+ASYNC_ROUTE = "async"
+OTHER_ROUTE = "other"
+
+
+def new_metrics():
+    """Metrics with their own metric, dimension and metadata sets
+
+    Powertools shares one set across every Metrics instance in the process,
+    so handlers run side by side, as in tools/local_server, would otherwise
+    flush each other's metrics under each other's Route.
+    """
+    return Metrics(provider=AmazonCloudWatchEMFProvider(namespace=METRICS_NAMESPACE))
+
+
+def route_dimension(event):
+    """REST resource or WebSocket route key, "async" for direct invocations"""
+    if "httpMethod" in event:
+        route = event.get("resource")
+    elif "routeKey" in event.get("requestContext", {}):
+        route = event["requestContext"]["routeKey"]
+    else:
+        return ASYNC_ROUTE
+
+    return route if route in ROUTES else OTHER_ROUTE
+
+
+def instrument(metrics):
+    """log_metrics with a cold start metric, a Route dimension and RequestLatency
+
+    The first invocation also carries the init profile when INIT_PROFILE is on.
+    """
+
+    def decorator(handler):
+        @metrics.log_metrics(capture_cold_start_metric=True)
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            set_route(metrics, event)
+            init_report = init_profile.stop()
+            if init_report:
+                record_init_profile(metrics, init_report)
+            with timed(metrics, "Request"):
+                return handler(event, context)
+
+        return wrapper
+
+    return decorator
+
+
+def set_route(metrics, event):
+    """Start the invocation's dimensions over with its own Route"""
+    dimensions = metrics.provider.dimension_set
+    dimensions.clear()
+    dimensions.update(metrics.provider.default_dimensions)
+    dimensions["Route"] = route_dimension(event)
+
+
+@contextmanager
+def timed(metrics, stage):
+    """Record the block's duration as <stage>Latency in milliseconds"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_metric(
+            name=f"{stage}Latency",
+            unit=MetricUnit.Milliseconds,
+            value=(time.perf_counter() - started) * 1000,
+        )
+
+
+def count(metrics, name, value=1):
+    metrics.add_metric(name=name, unit=MetricUnit.Count, value=value)
+
+
+def record_init_profile(metrics, init_report):
+    """Init totals as metrics, the per-group breakdown as metadata on the same record"""
+    for name, key in (
+        ("InitLatency", "initMs"),
+        ("InitImportLatency", "importMs"),
+        ("InitClientLatency", "clientMs"),
+    ):
+        metrics.add_metric(
+            name=name, unit=MetricUnit.Milliseconds, value=init_report[key]
+        )
+    metrics.add_metadata(key="initProfile", value=init_report)
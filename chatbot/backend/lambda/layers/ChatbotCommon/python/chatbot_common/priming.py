@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+
+from chatbot_common.clients import LazyClient
+
+# Inits that run ahead of any request. An on-demand init is part of the first
+# request's cold start, priming there only moves work around.
+PRIMED_INITIALIZATION_TYPES = {"provisioned-concurrency", "snap-start"}
+
+
+def priming_enabled():
+    return (
+        os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE", "on-demand")
+        in PRIMED_INITIALIZATION_TYPES
+    )
+
+
+def prime_client(client, operations=()):
+    """Do a client's first-request work now, building it, loading its operation models and connecting"""
+    if isinstance(client, LazyClient):
+        client = client.get()
+
+    # Endpoint resolution and credentials happen while the client is built
+    service_model = client.meta.service_model
+    for operation in operations:
+        service_model.operation_model(operation)
+
+    # Leaves an open TLS connection in the pool the first request takes from
+    http_session = client._endpoint.http_session
+    pool = http_session._get_connection_manager(
+        client.meta.endpoint_url, None
+    ).connection_from_url(client.meta.endpoint_url)
+    connection = pool._get_conn()
+    connection.connect()
+    pool._put_conn(connection)
+
+
+def close_connections(client):
+    if isinstance(client, LazyClient):
+        if not client.built:
+            return
+        client = client.get()
+    client._endpoint.http_session.close()
+
+
+class Primer:
+    """Primes a function's clients during init, and again after a snapshot restore
+
+    clients maps each client, or lazy client, to the operations the function
+    calls on it. warm runs after the clients, for the function's own first-use
+    work, and must rebuild anything it caches.
+    """
+
+    def __init__(self, clients, warm=()):
+        self.clients = clients
+        self.warm = warm
+
+    def prime(self):
+        started = time.perf_counter()
+        summary = {"primed": [], "failed": {}}
+
+        for client, operations in self.clients.items():
+            name = (
+                getattr(client, "service_name", None)
+                or client.meta.service_model.service_name
+            )
+            try:
+                prime_client(client, operations)
+                summary["primed"].append(name)
+            except Exception as e:
+                # Priming is best effort, the first request does the work instead
+                summary["failed"][name] = str(e)
+
+        for warm in self.warm:
+            try:
+                warm()
+                summary["primed"].append(warm.__name__)
+            except Exception as e:
+                summary["failed"][warm.__name__] = str(e)
+
+        summary["primeMs"] = round((time.perf_counter() - started) * 1000, 1)
+        return summary
+
+    def before_snapshot(self):
+        # Sockets in a snapshot are dead by the time it's restored
+        for client in self.clients:
+            close_connections(client)
+
+    def after_restore(self):
+        # Credentials cached before the snapshot may have expired, start from a new session
+        boto3 = sys.modules.get("boto3")
+        if boto3:
+            boto3.DEFAULT_SESSION = None
+        for client in self.clients:
+            if isinstance(client, LazyClient):
+                client.reset()
+        return self.prime()
+
+
+def prime(clients, warm=()):
+    """Prime clients and run warm when this init runs ahead of requests
+
+    Returns a summary to log, or None for an on-demand init. Under SnapStart
+    the same priming runs again after every restore.
+    """
+    if not priming_enabled():
+        return None
+
+    primer = Primer(clients, warm)
+    register_snapshot_hooks(primer)
+    return primer.prime()
+
+
+def register_snapshot_hooks(primer):
+    try:
+        from snapshot_restore_py import register_after_restore, register_before_snapshot
+    except ImportError:
+        # Only provided by the Lambda runtime
+        return False
+
+    register_before_snapshot(primer.before_snapshot)
+    register_after_restore(primer.after_restore)
+    return True
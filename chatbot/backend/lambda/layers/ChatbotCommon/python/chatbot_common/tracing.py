@@ -0,0 +1,111 @@
+import importlib.util
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.tracing.base import BaseProvider, BaseSegment
+
+# Finished spans kept by InMemoryProvider, oldest dropped first
+MAX_SPANS = 1000
+
+
+class Span(BaseSegment):
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.annotations = {}
+        self.metadata = {}
+        self.exceptions = []
+        self.started = time.perf_counter()
+        self.duration_ms = None
+
+    def close(self, end_time=None):
+        self.duration_ms = (time.perf_counter() - self.started) * 1000
+
+    def add_subsegment(self, subsegment):
+        subsegment.parent = self
+
+    def remove_subsegment(self, subsegment):
+        subsegment.parent = None
+
+    def put_annotation(self, key, value):
+        self.annotations[key] = value
+
+    def put_metadata(self, key, value, namespace="default"):
+        self.metadata.setdefault(namespace, {})[key] = value
+
+    def add_exception(self, exception, stack, remote=False):
+        self.exceptions.append(exception)
+
+
+class InMemoryProvider(BaseProvider):
+    """Tracer provider that keeps finished spans in memory instead of sending them to X-Ray"""
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self._local = threading.local()
+
+    def _open_spans(self):
+        if not hasattr(self._local, "open_spans"):
+            self._local.open_spans = []
+        return self._local.open_spans
+
+    @contextmanager
+    def in_subsegment(self, name=None, **kwargs):
+        open_spans = self._open_spans()
+        span = Span(name, open_spans[-1] if open_spans else None)
+        open_spans.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.add_exception(e, None)
+            raise
+        finally:
+            open_spans.pop()
+            span.close()
+            self.spans.append(span)
+
+    @asynccontextmanager
+    async def in_subsegment_async(self, name=None, **kwargs):
+        with self.in_subsegment(name, **kwargs) as span:
+            yield span
+
+    def put_annotation(self, key, value):
+        open_spans = self._open_spans()
+        if open_spans:
+            open_spans[-1].put_annotation(key, value)
+
+    def put_metadata(self, key, value, namespace="default"):
+        open_spans = self._open_spans()
+        if open_spans:
+            open_spans[-1].put_metadata(key, value, namespace)
+
+    def patch(self, modules):
+        pass
+
+    def patch_all(self):
+        pass
+
+    def span_names(self):
+        return [span.name for span in self.spans]
+
+    def find(self, name):
+        """Most recent finished span called name"""
+        return next((span for span in reversed(self.spans) if span.name == name), None)
+
+    def clear(self):
+        self.spans.clear()
+
+
+def new_tracer():
+    """X-Ray tracer, or spans kept in memory where the X-Ray SDK isn't installed"""
+    if importlib.util.find_spec("aws_xray_sdk"):
+        return Tracer()
+    return Tracer(provider=InMemoryProvider(), disabled=False, auto_patch=False)
+
+
+def stage(tracer, name):
+    """Subsegment around one pipeline stage, named like capture_method's"""
+    return tracer.provider.in_subsegment(name=f"## {name}")
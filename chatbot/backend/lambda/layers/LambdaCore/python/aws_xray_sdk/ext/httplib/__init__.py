@@ -0,0 +1,3 @@
+from .patch import patch, unpatch, add_ignored, reset_ignored
+
+__all__ = ['patch', 'unpatch', 'add_ignored', 'reset_ignored']
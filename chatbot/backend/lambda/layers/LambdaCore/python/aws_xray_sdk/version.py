@@ -0,0 +1 @@
+VERSION = '2.15.0'
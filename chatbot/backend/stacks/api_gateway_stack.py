@@ -7,12 +7,17 @@ from aws_cdk import (
     aws_ssm as ssm,
     aws_logs as logs,
     aws_iam as iam,
+    aws_applicationautoscaling as appscaling,
+    aws_events as events,
+    aws_events_targets as events_targets,
     Duration,
     Tags,
     CfnOutput,
 )
 from datetime import datetime
+import json
 from .environment import *
+from .bundling import bundled_code
 from constructs import Construct
 
 
@@ -20,6 +25,10 @@ THROTTLE_RATE_LIMIT = 10
 THROTTLE_BURST_LIMIT = 20
 MONTHLY_QUOTA = 900_000  # Stay under 1M API Gateway requests
 LOG_RETENTION_DAYS = "ONE_WEEK"
+# With -c chat_provisioned_concurrency=N, QueryKnowledgeBase keeps N primed
+# environments from CHAT_WARM_SCHEDULE until CHAT_COOL_SCHEDULE (UTC)
+CHAT_WARM_SCHEDULE = {"minute": "0", "hour": "7", "week_day": "MON-FRI"}
+CHAT_COOL_SCHEDULE = {"minute": "0", "hour": "19", "week_day": "MON-FRI"}
 
 
 class ApiGatewayStack(Stack):
@@ -30,12 +39,22 @@ class ApiGatewayStack(Stack):
         storage: Stack,
         roles: Stack,
         bedrock: Stack,
+        database: Stack,
+        websocket: Stack,
         **kwargs,
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
         Tags.of(self).add(key="PROJECT", value=PROJECT_NAME)
 
         lambda_dir = "./lambda/functions/"
+        # -c init_profile=true publishes each cold start's init breakdown
+        init_profile = str(self.node.try_get_context("init_profile") or "false").lower()
+        # Each function ships its own dependency closure in place of the shared
+        # layers, -c bundle_functions=false mounts the layers instead
+        self.bundle_functions = (
+            str(self.node.try_get_context("bundle_functions") or "true").lower()
+            == "true"
+        )
 
         ############################################
 
@@ -51,6 +70,27 @@ class ApiGatewayStack(Stack):
             ).string_value,
         )
 
+        ChatbotCommonLayer = lambda_.LayerVersion.from_layer_version_arn(
+            self,
+            "ChatbotCommonLayer",
+            ssm.StringParameter.from_string_parameter_name(
+                self, "ChatbotCommonLayerArn", f"{PROJECT_NAME}-ChatbotCommonLayerArn"
+            ).string_value,
+        )
+
+        # QueryKnowledgeBase reranks and searches the keyword index with NumPy,
+        # TriggerIngestDocumentsKnowledgeBase builds that index. LambdaLayerStack
+        # publishes the NumPy-only layer, override with -c numpy_layer_arn
+        NumpyLayer = lambda_.LayerVersion.from_layer_version_arn(
+            self,
+            "NumpyLayer",
+            self.node.try_get_context("numpy_layer_arn")
+            or ssm.StringParameter.from_string_parameter_name(
+                self, "NumpyLayerArn", f"{PROJECT_NAME}-NumpyLayerArn"
+            ).string_value,
+        )
+        self.shared_layers = [LambdaCoreLayer, ChatbotCommonLayer]
+
         ############################################
 
         #                 LAMBDAS                  #
@@ -63,8 +103,8 @@ class ApiGatewayStack(Stack):
             function_name=f"{PROJECT_NAME}-ListDocument",
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
-            code=lambda_.Code.from_asset(lambda_dir + "ListDocuments"),
-            layers=[LambdaCoreLayer],
+            code=self.function_code(lambda_dir + "ListDocuments"),
+            layers=self.function_layers(),
             description="Function to fetch list of documents in knowledge base",
             role=roles.api_lambda_role,
             environment={
@@ -75,6 +115,9 @@ class ApiGatewayStack(Stack):
                     "dataSource.dataSourceId"
                 ),
                 "KNOWLEDGE_BASE_BUCKET": storage.knowledge_base_bucket.bucket_name,
+                "METRICS_NAMESPACE": PROJECT_NAME,
+                "POWERTOOLS_TRACER_CAPTURE_RESPONSE": "false",
+                "INIT_PROFILE": init_profile,
             },
             timeout=Duration.seconds(30),
             tracing=lambda_.Tracing.ACTIVE,
@@ -88,11 +131,15 @@ class ApiGatewayStack(Stack):
             function_name=f"{PROJECT_NAME}-GenerateDownloadDocumentLink",
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
-            code=lambda_.Code.from_asset(lambda_dir + "GenerateDownloadDocumentLink"),
-            layers=[LambdaCoreLayer],
+            code=self.function_code(lambda_dir + "GenerateDownloadDocumentLink"),
+            layers=self.function_layers(),
             description="Function to generate s3 download presigned url",
             role=roles.api_lambda_role,
-            environment={},
+            environment={
+                "METRICS_NAMESPACE": PROJECT_NAME,
+                "POWERTOOLS_TRACER_CAPTURE_RESPONSE": "false",
+                "INIT_PROFILE": init_profile,
+            },
             timeout=Duration.seconds(30),
             tracing=lambda_.Tracing.ACTIVE,
             memory_size=128,
@@ -105,12 +152,15 @@ class ApiGatewayStack(Stack):
             function_name=f"{PROJECT_NAME}-GenerateUploadDocumentLink",
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
-            code=lambda_.Code.from_asset(lambda_dir + "GenerateUploadDocumentLink"),
-            layers=[LambdaCoreLayer],
+            code=self.function_code(lambda_dir + "GenerateUploadDocumentLink"),
+            layers=self.function_layers(),
             description="Function to generate s3 upload presigned url",
             role=roles.api_lambda_role,
             environment={
-                "KNOWLEDGE_BASE_BUCKET": storage.knowledge_base_bucket.bucket_name
+                "KNOWLEDGE_BASE_BUCKET": storage.knowledge_base_bucket.bucket_name,
+                "METRICS_NAMESPACE": PROJECT_NAME,
+                "POWERTOOLS_TRACER_CAPTURE_RESPONSE": "false",
+                "INIT_PROFILE": init_profile,
             },
             timeout=Duration.seconds(30),
             tracing=lambda_.Tracing.ACTIVE,
@@ -118,16 +168,31 @@ class ApiGatewayStack(Stack):
             log_retention=logs.RetentionDays(LOG_RETENTION_DAYS),
         )
 
+        # Sidecars are written once an upload arrives, not when its link is issued
+        events.Rule(
+            self,
+            f"{PROJECT_NAME}-DocumentUploadedRule",
+            event_pattern=events.EventPattern(
+                source=["aws.s3"],
+                detail_type=["Object Created"],
+                detail={
+                    "bucket": {"name": [storage.knowledge_base_bucket.bucket_name]},
+                    "object": {
+                        "key": events.Match.anything_but_suffix(".metadata.json")
+                    },
+                },
+            ),
+            targets=[events_targets.LambdaFunction(GenerateUploadDocumentLink)],
+        )
+
         TriggerIngestDocumentsKnowledgeBase = lambda_.Function(
             self,
             id=f"{PROJECT_NAME}-TriggerIngestDocumentsKnowledgeBase",
             function_name=f"{PROJECT_NAME}-TriggerIngestDocumentsKnowledgeBase",
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
-            code=lambda_.Code.from_asset(
-                lambda_dir + "TriggerIngestDocumentsKnowledgeBase"
-            ),
-            layers=[LambdaCoreLayer],
+            code=self.function_code(lambda_dir + "TriggerIngestDocumentsKnowledgeBase"),
+            layers=self.function_layers(NumpyLayer),
             description="Function to trigger knowledge base sync after updating documents in s3 bucket",
             role=roles.api_lambda_role,
             environment={
@@ -137,10 +202,23 @@ class ApiGatewayStack(Stack):
                 "DATA_SOURCE_ID": bedrock.data_source.get_response_field(
                     "dataSource.dataSourceId"
                 ),
+                "KNOWLEDGE_BASE_BUCKET": storage.knowledge_base_bucket.bucket_name,
+                "KEYWORD_INDEX_BUCKET": storage.index_bucket.bucket_name,
+                "VECTOR_BUCKET_NAME": bedrock.vector_bucket_name,
+                "VECTOR_INDEX_NAME": bedrock.vector_index_name,
+                "QUERY_FUNCTION_NAME": f"{PROJECT_NAME}-QueryKnowledgeBase",
+                "CONNECTIONS_TABLE_NAME": database.connections_table.table_name,
+                "WEBSOCKET_CALLBACK_URL": websocket.callback_url,
+                "METRICS_NAMESPACE": PROJECT_NAME,
+                "POWERTOOLS_TRACER_CAPTURE_RESPONSE": "false",
+                "INIT_PROFILE": init_profile,
             },
-            timeout=Duration.seconds(30),
+            # API Gateway cuts requests off at 29s, the extra time is for watching ingestion jobs
+            timeout=Duration.minutes(5),
             tracing=lambda_.Tracing.ACTIVE,
-            memory_size=128,
+            # The keyword index is built in memory, its postings are sorted with a
+            # copy, ~235 MB peak for 20k chunks
+            memory_size=512,
             log_retention=logs.RetentionDays(LOG_RETENTION_DAYS),
         )
 
@@ -150,8 +228,8 @@ class ApiGatewayStack(Stack):
             function_name=f"{PROJECT_NAME}-DeleteDocuments",
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
-            code=lambda_.Code.from_asset(lambda_dir + "DeleteDocuments"),
-            layers=[LambdaCoreLayer],
+            code=self.function_code(lambda_dir + "DeleteDocuments"),
+            layers=self.function_layers(),
             description="Function to documents in s3 bucket",
             role=roles.api_lambda_role,
             environment={
@@ -162,8 +240,14 @@ class ApiGatewayStack(Stack):
                     "dataSource.dataSourceId"
                 ),
                 "KNOWLEDGE_BASE_BUCKET": storage.knowledge_base_bucket.bucket_name,
+                "DELETE_JOBS_BUCKET": storage.index_bucket.bucket_name,
+                "JOBS_TABLE_NAME": database.jobs_table.table_name,
+                "METRICS_NAMESPACE": PROJECT_NAME,
+                "POWERTOOLS_TRACER_CAPTURE_RESPONSE": "false",
+                "INIT_PROFILE": init_profile,
             },
-            timeout=Duration.seconds(30),
+            # API Gateway cuts requests off at 29s, the extra time is for async delete jobs
+            timeout=Duration.minutes(5),
             tracing=lambda_.Tracing.ACTIVE,
             memory_size=128,
             log_retention=logs.RetentionDays(LOG_RETENTION_DAYS),
@@ -175,8 +259,8 @@ class ApiGatewayStack(Stack):
             function_name=f"{PROJECT_NAME}-QueryKnowledgeBase",
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
-            code=lambda_.Code.from_asset(lambda_dir + "QueryKnowledgeBase"),
-            layers=[LambdaCoreLayer],
+            code=self.function_code(lambda_dir + "QueryKnowledgeBase"),
+            layers=self.function_layers(NumpyLayer),
             description="Function to query knowledge base for chat",
             role=roles.api_lambda_role,
             environment={
@@ -184,13 +268,65 @@ class ApiGatewayStack(Stack):
                     "knowledgeBase.knowledgeBaseId"
                 ),
                 "MODEL_ARN": "arn:aws:bedrock:us-east-1::foundation-model/amazon.nova-lite-v1:0",
+                "MODEL_TIERS": json.dumps(
+                    {
+                        "simple": "arn:aws:bedrock:us-east-1::foundation-model/amazon.nova-micro-v1:0",
+                        "standard": "arn:aws:bedrock:us-east-1::foundation-model/amazon.nova-lite-v1:0",
+                        "complex": "arn:aws:bedrock:us-east-1::foundation-model/amazon.nova-pro-v1:0",
+                    }
+                ),
+                "HEDGE_PERCENTILE": "95",
+                "BREAKER_THROTTLE_THRESHOLD": "5",
+                "BREAKER_COOLDOWN_SECONDS": "30",
+                "MULTI_QUERY_MODE": "false",
+                "CONVERSE_MODE": "false",
+                "CONTEXT_TOKEN_BUDGET": "2000",
+                "METRICS_NAMESPACE": PROJECT_NAME,
+                "POWERTOOLS_TRACER_CAPTURE_RESPONSE": "false",
+                "INIT_PROFILE": init_profile,
+                "KEYWORD_INDEX_BUCKET": storage.index_bucket.bucket_name,
+                "JOBS_TABLE_NAME": database.jobs_table.table_name,
+                "FAQ_TABLE_NAME": database.faq_table.table_name,
+                "WORKING_SET_TABLE_NAME": database.working_set_table.table_name,
+                "CONNECTIONS_TABLE_NAME": database.connections_table.table_name,
+                "WEBSOCKET_CALLBACK_URL": websocket.callback_url,
             },
-            timeout=Duration.seconds(30),
+            # API Gateway cuts requests off at 29s, the extra time is for async chat jobs
+            timeout=Duration.minutes(5),
             tracing=lambda_.Tracing.ACTIVE,
             memory_size=128,
             log_retention=logs.RetentionDays(LOG_RETENTION_DAYS),
         )
 
+        # Provisioned environments sit behind an alias, /chat calls it instead
+        ChatFunction = QueryKnowledgeBase
+        chat_provisioned_concurrency = int(
+            self.node.try_get_context("chat_provisioned_concurrency") or 0
+        )
+        if chat_provisioned_concurrency:
+            ChatFunction = lambda_.Alias(
+                self,
+                id=f"{PROJECT_NAME}-QueryKnowledgeBaseLive",
+                alias_name="live",
+                version=QueryKnowledgeBase.current_version,
+            )
+            ChatScaling = ChatFunction.add_auto_scaling(
+                min_capacity=0, max_capacity=chat_provisioned_concurrency
+            )
+            ChatScaling.scale_on_schedule(
+                "WarmChat",
+                schedule=appscaling.Schedule.cron(**CHAT_WARM_SCHEDULE),
+                min_capacity=chat_provisioned_concurrency,
+                max_capacity=chat_provisioned_concurrency,
+            )
+            # Max 0 as well, scheduled actions only scale in down to the max
+            ChatScaling.scale_on_schedule(
+                "CoolChat",
+                schedule=appscaling.Schedule.cron(**CHAT_COOL_SCHEDULE),
+                min_capacity=0,
+                max_capacity=0,
+            )
+
         ############################################
 
         #                API GATEWAY               #
@@ -221,12 +357,18 @@ class ApiGatewayStack(Stack):
         # POST /chat
         ChatApiResource = ApiGateWay.root.add_resource("chat")
         QueryKnowledgeBaseFunctionIntegration = apigateway.LambdaIntegration(
-            QueryKnowledgeBase
+            ChatFunction
         )
         QueryKnowledgeBasePostApiMethod = ChatApiResource.add_method(
             "POST", QueryKnowledgeBaseFunctionIntegration
         )
 
+        # POST /chat/status
+        ChatStatusApiResource = ChatApiResource.add_resource("status")
+        QueryKnowledgeBaseStatusPostApiMethod = ChatStatusApiResource.add_method(
+            "POST", QueryKnowledgeBaseFunctionIntegration
+        )
+
         # /documents
         DocumentApiResource = ApiGateWay.root.add_resource("documents")
 
@@ -283,6 +425,14 @@ class ApiGatewayStack(Stack):
             "POST", DeleteDocumentFunctionIntegration
         )
 
+        # POST /documents/delete/status
+        DeleteDocumentStatusApiResource = DeleteDocumentApiResource.add_resource(
+            "status"
+        )
+        DeleteDocumentStatusPostApiMethod = DeleteDocumentStatusApiResource.add_method(
+            "POST", DeleteDocumentFunctionIntegration
+        )
+
         ############################################
 
         #        LAMBDA INVOCATION RESTRICTIONS    #
@@ -305,7 +455,7 @@ class ApiGatewayStack(Stack):
             source_arn=source_arn,
         )
 
-        QueryKnowledgeBase.add_permission(
+        ChatFunction.add_permission(
             "AllowApiGatewayInvoke",
             principal=iam.ServicePrincipal("apigateway.amazonaws.com"),
             source_arn=source_arn,
@@ -364,3 +514,13 @@ class ApiGatewayStack(Stack):
             description="API Gateway URL",
             export_name=f"{PROJECT_NAME}-ApiUrl",
         )
+
+    def function_code(self, path):
+        if self.bundle_functions:
+            return bundled_code(path, lambda_.Runtime.PYTHON_3_12)
+        return lambda_.Code.from_asset(path)
+
+    def function_layers(self, *layers):
+        """Layers a function mounts, the shared ones only when it isn't bundled"""
+        shared_layers = [] if self.bundle_functions else self.shared_layers
+        return shared_layers + list(layers)
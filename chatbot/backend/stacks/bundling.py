@@ -0,0 +1,409 @@
+# bundling.py
+
+import ast
+import modulefinder
+import os
+import shutil
+import subprocess
+import sys
+
+import jsii
+from aws_cdk import (
+    AssetHashType,
+    BundlingOptions,
+    ILocalBundling,
+    aws_lambda as lambda_,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYERS_DIR = os.path.join(BACKEND_DIR, "lambda", "layers")
+# Where the shared layers' modules come from, in the order Lambda searches them
+SEARCH_PATH = [
+    os.path.join(LAYERS_DIR, "ChatbotCommon", "python"),
+    os.path.join(LAYERS_DIR, "LambdaCore", "python"),
+]
+# Imported by the functions but supplied at runtime, NumPy by the NumpyLayer
+# and snapshot_restore_py by the Lambda runtime
+EXTERNAL_MODULES = ("numpy", "snapshot_restore_py")
+# Packages that import their own modules by computed name, shipped whole.
+# aws_xray_sdk loads a patcher per supported library this way.
+WHOLE_PACKAGES = ("aws_xray_sdk",)
+# Calls that import their first argument when first used. lazy_call takes a
+# dotted path to a function rather than a module.
+LAZY_IMPORTS = {"LazyLoader": False, "import_module": False, "lazy_call": True}
+# Calls that build a boto3 client or resource from the service name they're given
+CLIENT_FACTORIES = ("client", "resource", "lazy_client", "LazyClient")
+# Clients packages build for themselves, aws_xray_sdk's for sampling rules
+PACKAGE_SERVICES = {"aws_xray_sdk": ("xray",)}
+# Model directories keyed by service name, only the services a function uses ship
+SERVICE_DATA_DIRS = (os.path.join("botocore", "data"), os.path.join("boto3", "data"))
+# Where Lambda extracts the function, so tracebacks name the deployed files
+TASK_ROOT = "/var/task"
+# Lambda's platform, layer wheels are chosen for it rather than the host
+LAYER_PLATFORM = "manylinux_2_28_x86_64"
+
+
+def call_name(node):
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def string_calls(source, names):
+    """(call name, first argument) for each call in names made with a string literal"""
+    for node in ast.walk(ast.parse(source)):
+        if not isinstance(node, ast.Call) or call_name(node) not in names:
+            continue
+        if node.args and isinstance(node.args[0], ast.Constant):
+            if isinstance(node.args[0].value, str):
+                yield call_name(node), node.args[0].value
+
+
+def read_source(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def find_modules(function_dir, search_path=SEARCH_PATH):
+    """Every module the function can import from its directory or search_path
+
+    Static, so imports made through LazyLoader, import_module and boto3's
+    lazy_call are followed by reading their string arguments. Returns the
+    ModuleFinder, whose modules are the closure.
+    """
+    finder = modulefinder.ModuleFinder(path=[function_dir, *search_path])
+    finder.load_file(os.path.join(function_dir, "lambda_function.py"))
+
+    scanned = set()
+    while True:
+        pending = [
+            module
+            for name, module in list(finder.modules.items())
+            if name not in scanned and module.__file__
+        ]
+        if not pending:
+            return finder
+
+        for module in pending:
+            scanned.add(module.__name__)
+            for call, target in string_calls(
+                read_source(module.__file__), LAZY_IMPORTS
+            ):
+                if LAZY_IMPORTS[call]:
+                    target = target.rpartition(".")[0]
+                if target and target not in finder.modules:
+                    try:
+                        finder.import_hook(target)
+                    except ImportError:
+                        finder.badmodules.setdefault(target, {})[module.__name__] = 1
+
+
+def is_under(path, directories):
+    path = os.path.abspath(path)
+    return any(path.startswith(os.path.abspath(d) + os.sep) for d in directories)
+
+
+def bundled_modules(finder, function_dir, search_path=SEARCH_PATH):
+    """Modules found in search_path, the ones the asset has to carry"""
+    return {
+        name: module
+        for name, module in finder.modules.items()
+        if module.__file__
+        and is_under(module.__file__, search_path)
+        and not is_under(module.__file__, [function_dir])
+    }
+
+
+def check_missing(finder, function_dir, search_path=SEARCH_PATH):
+    """Fail on third-party imports the project's own code makes that nothing provides"""
+    own_code = {
+        name
+        for name, module in finder.modules.items()
+        if module.__file__ and is_under(module.__file__, [function_dir, search_path[0]])
+    }
+    missing = sorted(
+        name
+        for name, importers in finder.badmodules.items()
+        if own_code.intersection(importers)
+        and name.split(".")[0] not in sys.stdlib_module_names
+        and name.split(".")[0] not in EXTERNAL_MODULES
+        and name.split(".")[0] not in finder.modules
+    )
+    if missing:
+        raise ImportError(
+            f"{os.path.basename(function_dir)} imports {', '.join(missing)}, "
+            "which neither the function nor the layer directories provide"
+        )
+
+
+def find_services(finder, function_dir, search_path=SEARCH_PATH):
+    """Service names the project's own code, and the packages it uses, build clients for"""
+    services = set()
+    for module in finder.modules.values():
+        if module.__file__ and is_under(
+            module.__file__, [function_dir, search_path[0]]
+        ):
+            source = read_source(module.__file__)
+            services.update(
+                target for _, target in string_calls(source, CLIENT_FACTORIES)
+            )
+        if module.__name__ in PACKAGE_SERVICES:
+            services.update(PACKAGE_SERVICES[module.__name__])
+    return services
+
+
+def copy_data(source_dir, target_dir, services):
+    """Copy a package directory's data files, and any data directories below it
+
+    Subpackages are left to their own modules. Model directories only keep
+    the files every client loads and the given services.
+    """
+    for entry in os.scandir(source_dir):
+        source = entry.path
+        target = os.path.join(target_dir, entry.name)
+        if entry.is_dir():
+            if entry.name == "__pycache__" or os.path.exists(
+                os.path.join(source, "__init__.py")
+            ):
+                continue
+            if any(source.endswith(os.sep + d) for d in SERVICE_DATA_DIRS):
+                copy_service_data(source, target, services)
+            else:
+                shutil.copytree(
+                    source,
+                    target,
+                    ignore=shutil.ignore_patterns("__pycache__"),
+                    dirs_exist_ok=True,
+                )
+        elif not entry.name.endswith((".py", ".pyc")):
+            os.makedirs(target_dir, exist_ok=True)
+            shutil.copy2(source, target)
+
+
+def copy_service_data(source_dir, target_dir, services):
+    os.makedirs(target_dir, exist_ok=True)
+    for entry in os.scandir(source_dir):
+        if entry.is_file():
+            shutil.copy2(entry.path, os.path.join(target_dir, entry.name))
+        elif entry.name in services:
+            shutil.copytree(
+                entry.path, os.path.join(target_dir, entry.name), dirs_exist_ok=True
+            )
+
+
+def relative_to_root(path, search_path):
+    path = os.path.abspath(path)
+    for root in search_path:
+        root = os.path.abspath(root)
+        if path.startswith(root + os.sep):
+            return root, os.path.relpath(path, root)
+    raise ValueError(f"{path} is outside {search_path}")
+
+
+def copy_modules(modules, output_dir, services, search_path=SEARCH_PATH):
+    """Copy each module with its package's data files, whole packages whole"""
+    whole = set()
+    package_dirs = set()
+
+    for name, module in modules.items():
+        top_level = name.split(".")[0]
+        root, relative = relative_to_root(module.__file__, search_path)
+        if top_level in WHOLE_PACKAGES:
+            whole.add((root, top_level))
+            continue
+
+        target = os.path.join(output_dir, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(module.__file__, target)
+        if os.path.basename(module.__file__) == "__init__.py":
+            package_dirs.add(
+                (os.path.dirname(module.__file__), os.path.dirname(target))
+            )
+
+    for package_dir, target_dir in package_dirs:
+        copy_data(package_dir, target_dir, services)
+
+    for root, top_level in whole:
+        shutil.copytree(
+            os.path.join(root, top_level),
+            os.path.join(output_dir, top_level),
+            ignore=shutil.ignore_patterns("__pycache__"),
+            dirs_exist_ok=True,
+        )
+
+
+def byte_compile(output_dir, interpreter):
+    """Compile the asset with the runtime's interpreter, False when it isn't installed
+
+    Unchecked hash .pyc files are reproducible, so unchanged code keeps its
+    asset hash, and are used without checking the source.
+    """
+    try:
+        subprocess.run([interpreter, "-c", ""], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+    subprocess.run(
+        [
+            interpreter,
+            "-m",
+            "compileall",
+            "-q",
+            "-j",
+            "0",
+            "--invalidation-mode",
+            "unchecked-hash",
+            "-s",
+            output_dir,
+            "-p",
+            TASK_ROOT,
+            output_dir,
+        ],
+        check=True,
+    )
+    return True
+
+
+def directory_size(directory):
+    files = 0
+    size = 0
+    for dir_path, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            files += 1
+            size += os.path.getsize(os.path.join(dir_path, file_name))
+    return files, size
+
+
+def bundle_function(function_dir, output_dir, interpreter, search_path=SEARCH_PATH):
+    """Build a function's asset in output_dir from its dependency closure
+
+    The function's own directory is copied as is, alongside every module
+    it can import from search_path. Returns a size report.
+    """
+    finder = find_modules(function_dir, search_path)
+    check_missing(finder, function_dir, search_path)
+    services = find_services(finder, function_dir, search_path)
+    modules = bundled_modules(finder, function_dir, search_path)
+
+    shutil.copytree(
+        function_dir,
+        output_dir,
+        ignore=shutil.ignore_patterns("__pycache__"),
+        dirs_exist_ok=True,
+    )
+    copy_modules(modules, output_dir, services, search_path)
+    byte_compiled = byte_compile(output_dir, interpreter)
+
+    packages = {}
+    for entry in os.scandir(output_dir):
+        if entry.is_dir():
+            packages[entry.name] = directory_size(entry.path)[1]
+    files, size = directory_size(output_dir)
+    return {
+        "function": os.path.basename(os.path.normpath(function_dir)),
+        "modules": len(modules),
+        "services": sorted(services),
+        "files": files,
+        "bytes": size,
+        "byteCompiled": byte_compiled,
+        "packages": dict(sorted(packages.items(), key=lambda item: -item[1])),
+    }
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def format_report(report):
+    compiled = "byte-compiled" if report["byteCompiled"] else "not byte-compiled"
+    lines = [
+        f"{report['function']}: {format_size(report['bytes'])} in {report['files']} files, "
+        f"{report['modules']} modules, {compiled}, "
+        f"services {', '.join(report['services']) or 'none'}"
+    ]
+    for package, size in report["packages"].items():
+        lines.append(f"  {package:<28} {format_size(size):>10}")
+    return "\n".join(lines)
+
+
+@jsii.implements(ILocalBundling)
+class ClosureBundling:
+    """Local bundling that builds a function's asset with bundle_function"""
+
+    def __init__(self, function_dir, interpreter):
+        self.function_dir = function_dir
+        self.interpreter = interpreter
+
+    def try_bundle(self, output_dir, options):
+        report = bundle_function(self.function_dir, output_dir, self.interpreter)
+        print(format_report(report), file=sys.stderr)
+        return True
+
+
+def bundled_code(function_dir, runtime):
+    """Asset for lambda/functions/<name> carrying its own dependency closure
+
+    Hashed on the bundle, so a change to a shared module redeploys exactly
+    the functions that import it.
+    """
+    function_dir = os.path.abspath(function_dir)
+    return lambda_.Code.from_asset(
+        function_dir,
+        asset_hash_type=AssetHashType.OUTPUT,
+        bundling=BundlingOptions(
+            image=runtime.bundling_image,
+            local=ClosureBundling(function_dir, runtime.name),
+        ),
+    )
+
+
+@jsii.implements(ILocalBundling)
+class WheelBundling:
+    """Local bundling that installs a layer's requirements as the runtime's wheels"""
+
+    def __init__(self, layer_dir, runtime):
+        self.layer_dir = layer_dir
+        self.python_version = runtime.name.removeprefix("python")
+
+    def try_bundle(self, output_dir, options):
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "pip",
+                "install",
+                "-r",
+                os.path.join(self.layer_dir, "requirements.txt"),
+                "-t",
+                os.path.join(output_dir, "python"),
+                "--platform",
+                LAYER_PLATFORM,
+                "--implementation",
+                "cp",
+                "--python-version",
+                self.python_version,
+                "--only-binary=:all:",
+                "--quiet",
+            ],
+            check=True,
+        )
+        return True
+
+
+def layer_code(layer_dir, runtime):
+    """Asset for lambda/layers/<name> installed from its pinned requirements.txt"""
+    layer_dir = os.path.abspath(layer_dir)
+    return lambda_.Code.from_asset(
+        layer_dir,
+        bundling=BundlingOptions(
+            image=runtime.bundling_image,
+            command=[
+                "bash",
+                "-c",
+                "pip install -r requirements.txt -t /asset-output/python",
+            ],
+            local=WheelBundling(layer_dir, runtime),
+        ),
+    )
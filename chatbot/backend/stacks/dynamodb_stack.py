@@ -0,0 +1,79 @@
+# dynamodb_stack.py
+
+from aws_cdk import Stack, aws_dynamodb as dynamodb, RemovalPolicy, Tags
+from constructs import Construct
+from .environment import *
+
+
+class DynamoDBStack(Stack):
+    def __init__(self, scope: Construct, construct_id: str, **kwargs):
+        super().__init__(scope, construct_id, **kwargs)
+        Tags.of(self).add(key="PROJECT", value=PROJECT_NAME)
+
+        self.jobs_table = self._create_jobs_table()
+        self.connections_table = self._create_connections_table()
+        self.faq_table = self._create_faq_table()
+        self.working_set_table = self._create_working_set_table()
+
+    def _create_jobs_table(self) -> dynamodb.Table:
+        """Status records for long running jobs handed off from the API"""
+        table = dynamodb.Table(
+            self,
+            "JobsTable",
+            table_name=f"{PROJECT_NAME}-jobs",
+            partition_key=dynamodb.Attribute(
+                name="jobId", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expiresAt",
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        return table
+
+    def _create_connections_table(self) -> dynamodb.Table:
+        """Registry of open WebSocket connections and their topic subscriptions"""
+        table = dynamodb.Table(
+            self,
+            "ConnectionsTable",
+            table_name=f"{PROJECT_NAME}-connections",
+            partition_key=dynamodb.Attribute(
+                name="connectionId", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expiresAt",
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        return table
+
+    def _create_faq_table(self) -> dynamodb.Table:
+        """Precomputed answers to the most asked questions, rebuilt after each ingestion"""
+        table = dynamodb.Table(
+            self,
+            "FaqAnswersTable",
+            table_name=f"{PROJECT_NAME}-faq-answers",
+            partition_key=dynamodb.Attribute(
+                name="query", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        return table
+
+    def _create_working_set_table(self) -> dynamodb.Table:
+        """Chunks each chat session has retrieved, reused to answer its follow-ups"""
+        table = dynamodb.Table(
+            self,
+            "WorkingSetTable",
+            table_name=f"{PROJECT_NAME}-session-working-sets",
+            partition_key=dynamodb.Attribute(
+                name="sessionId", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expiresAt",
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        return table
@@ -25,6 +25,7 @@ class FrontendStack(Stack):
         Tags.of(self).add(key="PROJECT", value=PROJECT_NAME)
 
         api_url = self.node.try_get_context("api_url")
+        websocket_url = self.node.try_get_context("websocket_url")
 
         # Correct path calculation
         frontend_path = os.path.abspath(
@@ -34,6 +35,8 @@ class FrontendStack(Stack):
         # Create the .env.production file
         env_file_path = os.path.join(frontend_path, ".env.production")
         env_content = f"VITE_API_URL={api_url}"
+        if websocket_url:
+            env_content += f"\nVITE_WEBSOCKET_URL={websocket_url}"
 
         with open(env_file_path, "w") as f:
             f.write(env_content)
@@ -11,6 +11,7 @@ class RolesStack(Stack):
         scope: Construct,
         construct_id: str,
         storage: Stack,
+        database: Stack,
         **kwargs,
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
@@ -18,6 +19,11 @@ class RolesStack(Stack):
         Tags.of(self).add(key="PROJECT", value=PROJECT_NAME)
 
         self.knowledge_base_bucket = storage.knowledge_base_bucket
+        self.index_bucket = storage.index_bucket
+        self.jobs_table = database.jobs_table
+        self.connections_table = database.connections_table
+        self.faq_table = database.faq_table
+        self.working_set_table = database.working_set_table
 
         self.api_lambda_role = self._create_api_lambda_role()
         self.knowledge_base_role = self._create_knowledge_base_role()
@@ -62,6 +68,31 @@ class RolesStack(Stack):
             )
         )
 
+        # Keyword index built after ingestion and mapped by QueryKnowledgeBase
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="S3KeywordIndex",
+                effect=iam.Effect.ALLOW,
+                actions=["s3:ListBucket", "s3:GetObject", "s3:PutObject"],
+                resources=[
+                    self.index_bucket.bucket_arn,
+                    f"{self.index_bucket.bucket_arn}/*",
+                ],
+            )
+        )
+
+        # Chunk text for the keyword index is read back from the vector index
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="S3VectorsReadChunks",
+                effect=iam.Effect.ALLOW,
+                actions=["s3vectors:ListVectors", "s3vectors:GetVectors"],
+                resources=[
+                    "*"
+                ],  # S3 Vectors doesn't support resource-level permissions yet
+            )
+        )
+
         # Bedrock Agent permissions for knowledge base operations
         role.add_to_policy(
             iam.PolicyStatement(
@@ -70,6 +101,8 @@ class RolesStack(Stack):
                 actions=[
                     "bedrock:StartIngestionJob",
                     "bedrock:ListKnowledgeBaseDocuments",
+                    "bedrock:GetKnowledgeBaseDocuments",
+                    "bedrock:GetIngestionJob",
                     "bedrock:Retrieve",
                 ],
                 resources=[
@@ -86,6 +119,7 @@ class RolesStack(Stack):
                 actions=[
                     "bedrock:RetrieveAndGenerate",
                     "bedrock:InvokeModel",
+                    "bedrock:InvokeModelWithResponseStream",
                     "bedrock:Retrieve",
                 ],
                 resources=[
@@ -95,6 +129,105 @@ class RolesStack(Stack):
             )
         )
 
+        # Job status records for work handed off to async invocations
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="DynamoDBJobs",
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "dynamodb:GetItem",
+                    "dynamodb:PutItem",
+                    "dynamodb:UpdateItem",
+                ],
+                resources=[self.jobs_table.table_arn],
+            )
+        )
+
+        # Precomputed FAQ answers, cleared and refilled after each ingestion
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="DynamoDBFaqAnswers",
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "dynamodb:GetItem",
+                    "dynamodb:PutItem",
+                    "dynamodb:DeleteItem",
+                    "dynamodb:BatchWriteItem",
+                    "dynamodb:Scan",
+                ],
+                resources=[self.faq_table.table_arn],
+            )
+        )
+
+        # Chunks retrieved per chat session
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="DynamoDBWorkingSets",
+                effect=iam.Effect.ALLOW,
+                actions=["dynamodb:GetItem", "dynamodb:PutItem"],
+                resources=[self.working_set_table.table_arn],
+            )
+        )
+
+        # Mine the most asked questions from the chat function's logs
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="LogsInsightsChatQueries",
+                effect=iam.Effect.ALLOW,
+                actions=["logs:StartQuery"],
+                resources=[
+                    f"arn:aws:logs:{self.region}:{self.account}:log-group:/aws/lambda/{PROJECT_NAME}-QueryKnowledgeBase:*"
+                ],
+            )
+        )
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="LogsInsightsResults",
+                effect=iam.Effect.ALLOW,
+                actions=["logs:GetQueryResults"],
+                resources=["*"],
+            )
+        )
+
+        # WebSocket connection registry
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="DynamoDBConnections",
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "dynamodb:PutItem",
+                    "dynamodb:UpdateItem",
+                    "dynamodb:DeleteItem",
+                    "dynamodb:Scan",
+                ],
+                resources=[self.connections_table.table_arn],
+            )
+        )
+
+        # Push messages to WebSocket clients, the API is created after this role
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="WebSocketManageConnections",
+                effect=iam.Effect.ALLOW,
+                actions=["execute-api:ManageConnections"],
+                resources=[
+                    f"arn:aws:execute-api:{self.region}:{self.account}:*/*/POST/@connections/*"
+                ],
+            )
+        )
+
+        # Async self-invocation for long running jobs
+        role.add_to_policy(
+            iam.PolicyStatement(
+                sid="LambdaAsyncInvoke",
+                effect=iam.Effect.ALLOW,
+                actions=["lambda:InvokeFunction"],
+                resources=[
+                    f"arn:aws:lambda:{self.region}:{self.account}:function:{PROJECT_NAME}-*"
+                ],
+            )
+        )
+
         return role
 
     def _create_knowledge_base_role(self) -> iam.Role:
@@ -3,6 +3,7 @@ import subprocess
 from aws_cdk import Stack, RemovalPolicy, aws_lambda as lambda_, Tags, aws_ssm as ssm
 from constructs import Construct
 from .environment import *
+from .bundling import layer_code
 
 
 class LambdaLayerStack(Stack):
@@ -29,6 +30,43 @@ class LambdaLayerStack(Stack):
             parameter_name=f"{PROJECT_NAME}-LambdaCoreLayerArn",
         )
 
+        ChatbotCommonLayer = lambda_.LayerVersion(
+            self,
+            "ChatbotCommonLayer",
+            layer_version_name=f"{PROJECT_NAME}-ChatbotCommonLayer",
+            code=self.create_dependencies_layer("./lambda/layers/ChatbotCommon"),
+            description="Lambda Layer with code shared between the chatbot functions",
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        ssm.StringParameter(
+            self,
+            "ChatbotCommonLayerArn",
+            string_value=ChatbotCommonLayer.layer_version_arn,
+            type=ssm.ParameterType.STRING,
+            description="ARN for ChatbotCommonLayer",
+            parameter_name=f"{PROJECT_NAME}-ChatbotCommonLayerArn",
+        )
+
+        NumpyLayer = lambda_.LayerVersion(
+            self,
+            "NumpyLayer",
+            layer_version_name=f"{PROJECT_NAME}-NumpyLayer",
+            code=layer_code("./lambda/layers/Numpy", lambda_.Runtime.PYTHON_3_12),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
+            description="Lambda Layer with NumPy, pinned to the version tested against",
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        ssm.StringParameter(
+            self,
+            "NumpyLayerArn",
+            string_value=NumpyLayer.layer_version_arn,
+            type=ssm.ParameterType.STRING,
+            description="ARN for NumpyLayer",
+            parameter_name=f"{PROJECT_NAME}-NumpyLayerArn",
+        )
+
     def create_dependencies_layer(self, localPath):
         main_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         while localPath[0] == "." or localPath[0] == "/":
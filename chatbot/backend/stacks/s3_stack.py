@@ -1,6 +1,6 @@
 # s3_stack.py
 
-from aws_cdk import Stack, aws_s3 as s3, RemovalPolicy, Tags
+from aws_cdk import Stack, aws_s3 as s3, Duration, RemovalPolicy, Tags
 from constructs import Construct
 from .environment import *
 
@@ -11,6 +11,7 @@ class S3Stack(Stack):
         Tags.of(self).add(key="PROJECT", value=PROJECT_NAME)
 
         self.knowledge_base_bucket = self._create_knowledge_base_bucket()
+        self.index_bucket = self._create_index_bucket()
 
     def _create_knowledge_base_bucket(self) -> s3.Bucket:
         bucket = s3.Bucket(
@@ -21,6 +22,8 @@ class S3Stack(Stack):
             removal_policy=RemovalPolicy.DESTROY,
             auto_delete_objects=True,
             enforce_ssl=True,
+            # Upload arrivals trigger the metadata sidecar write
+            event_bridge_enabled=True,
             cors=[
                 s3.CorsRule(
                     allowed_methods=[
@@ -35,3 +38,25 @@ class S3Stack(Stack):
         )
 
         return bucket
+
+    def _create_index_bucket(self) -> s3.Bucket:
+        """Build artifacts such as the keyword index, kept out of the ingested bucket"""
+        bucket = s3.Bucket(
+            self,
+            "KnowledgeBaseIndexBucket",
+            bucket_name=f"{PROJECT_NAME}-index-bucket-{self.account}",
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            removal_policy=RemovalPolicy.DESTROY,
+            auto_delete_objects=True,
+            enforce_ssl=True,
+            # Document statuses the ingestion watch keeps between invocations, and
+            # the key lists of async delete jobs
+            lifecycle_rules=[
+                s3.LifecycleRule(
+                    prefix="ingestion-watch/", expiration=Duration.days(7)
+                ),
+                s3.LifecycleRule(prefix="delete-jobs/", expiration=Duration.days(7)),
+            ],
+        )
+
+        return bucket
@@ -0,0 +1,142 @@
+# websocket_stack.py
+
+from aws_cdk import (
+    Stack,
+    aws_lambda as lambda_,
+    aws_apigatewayv2 as apigatewayv2,
+    aws_apigatewayv2_integrations as integrations,
+    aws_ssm as ssm,
+    aws_logs as logs,
+    Duration,
+    Tags,
+    CfnOutput,
+)
+from .environment import *
+from constructs import Construct
+
+
+THROTTLE_RATE_LIMIT = 10
+THROTTLE_BURST_LIMIT = 20
+LOG_RETENTION_DAYS = "ONE_WEEK"
+
+
+class WebSocketStack(Stack):
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        roles: Stack,
+        database: Stack,
+        **kwargs,
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+        Tags.of(self).add(key="PROJECT", value=PROJECT_NAME)
+
+        lambda_dir = "./lambda/functions/"
+        # -c init_profile=true publishes each cold start's init breakdown
+        init_profile = str(self.node.try_get_context("init_profile") or "false").lower()
+
+        ############################################
+
+        #                  LAYERS                  #
+
+        ############################################
+
+        LambdaCoreLayer = lambda_.LayerVersion.from_layer_version_arn(
+            self,
+            "LambdaCoreLayer",
+            ssm.StringParameter.from_string_parameter_name(
+                self, "LambdaCoreLayerArn", f"{PROJECT_NAME}-LambdaCoreLayerArn"
+            ).string_value,
+        )
+
+        ChatbotCommonLayer = lambda_.LayerVersion.from_layer_version_arn(
+            self,
+            "ChatbotCommonLayer",
+            ssm.StringParameter.from_string_parameter_name(
+                self, "ChatbotCommonLayerArn", f"{PROJECT_NAME}-ChatbotCommonLayerArn"
+            ).string_value,
+        )
+
+        ############################################
+
+        #                 LAMBDAS                  #
+
+        ############################################
+
+        WebSocketConnections = lambda_.Function(
+            self,
+            id=f"{PROJECT_NAME}-WebSocketConnections",
+            function_name=f"{PROJECT_NAME}-WebSocketConnections",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="lambda_function.lambda_handler",
+            code=lambda_.Code.from_asset(lambda_dir + "WebSocketConnections"),
+            layers=[LambdaCoreLayer, ChatbotCommonLayer],
+            description="Function to handle WebSocket connections and client messages",
+            role=roles.api_lambda_role,
+            environment={
+                "CONNECTIONS_TABLE_NAME": database.connections_table.table_name,
+                "JOBS_TABLE_NAME": database.jobs_table.table_name,
+                "QUERY_KNOWLEDGE_BASE_FUNCTION_NAME": f"{PROJECT_NAME}-QueryKnowledgeBase",
+                "METRICS_NAMESPACE": PROJECT_NAME,
+                "POWERTOOLS_TRACER_CAPTURE_RESPONSE": "false",
+                "INIT_PROFILE": init_profile,
+            },
+            timeout=Duration.seconds(30),
+            tracing=lambda_.Tracing.ACTIVE,
+            memory_size=128,
+            log_retention=logs.RetentionDays(LOG_RETENTION_DAYS),
+        )
+
+        ############################################
+
+        #              WEBSOCKET API               #
+
+        ############################################
+
+        WebSocketConnectionsIntegration = integrations.WebSocketLambdaIntegration(
+            "WebSocketConnectionsIntegration", WebSocketConnections
+        )
+
+        WebSocketApi = apigatewayv2.WebSocketApi(
+            self,
+            id=f"{PROJECT_NAME}-WebSocketApi",
+            api_name=f"{PROJECT_NAME}-WebSocketApi",
+            description=f"{PROJECT_NAME} WebSocket API for chat and document status push",
+            connect_route_options=apigatewayv2.WebSocketRouteOptions(
+                integration=WebSocketConnectionsIntegration
+            ),
+            disconnect_route_options=apigatewayv2.WebSocketRouteOptions(
+                integration=WebSocketConnectionsIntegration
+            ),
+            default_route_options=apigatewayv2.WebSocketRouteOptions(
+                integration=WebSocketConnectionsIntegration
+            ),
+        )
+
+        WebSocketStage = apigatewayv2.WebSocketStage(
+            self,
+            id=f"{PROJECT_NAME}-WebSocketStage",
+            web_socket_api=WebSocketApi,
+            stage_name="chatbot",
+            auto_deploy=True,
+            throttle=apigatewayv2.ThrottleSettings(
+                rate_limit=THROTTLE_RATE_LIMIT,
+                burst_limit=THROTTLE_BURST_LIMIT,
+            ),
+        )
+
+        WebSocketConnections.add_environment(
+            "WEBSOCKET_CALLBACK_URL", WebSocketStage.callback_url
+        )
+
+        self.callback_url = WebSocketStage.callback_url
+        self.websocket_url = WebSocketStage.url
+
+        CfnOutput(
+            self,
+            "WebSocketUrl",
+            value=self.websocket_url,
+            description="WebSocket API URL",
+            export_name=f"{PROJECT_NAME}-WebSocketUrl",
+        )
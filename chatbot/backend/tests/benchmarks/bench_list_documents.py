@@ -0,0 +1,52 @@
+"""Time ListDocuments over its recorded S3 and knowledge base responses
+
+The handler runs against the cassette its unit test replays, so botocore
+parses the recorded payloads and the handler merges and serializes them
+without any network time. Pass a latency scale to add the recorded
+timings back in.
+
+Run from chatbot/backend: python -m tests.benchmarks.bench_list_documents [latency scale]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+from tests.unit.conftest import CASSETTE_DIR, LambdaContext, load_function
+from tests.unit.test_list_documents import CASSETTE_RESOURCES
+from tools.cassette import Cassette
+
+CASSETTE = os.path.join(
+    CASSETTE_DIR, "test_merges_bucket_and_knowledge_base_listings.json"
+)
+RUNS = 100
+TARGET_MS = 40
+
+
+def main():
+    latency_scale = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0
+    os.environ.update(CASSETTE_RESOURCES)
+    # The handler logs every document at INFO, time the work rather than the logging
+    os.environ["POWERTOOLS_LOG_LEVEL"] = "WARNING"
+    list_documents = load_function("ListDocuments")
+    event = {"httpMethod": "POST", "body": "{}"}
+
+    timings = []
+    for _ in range(RUNS + 1):
+        with Cassette(CASSETTE, latency_scale=latency_scale):
+            started = time.perf_counter()
+            list_documents.lambda_handler(event, LambdaContext())
+            timings.append((time.perf_counter() - started) * 1000)
+
+    timings = sorted(timings[1:])  # the first run warms up
+    p50 = statistics.median(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+
+    print(f"list documents: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    if not latency_scale:
+        print("OK" if p99 < TARGET_MS else f"SLOW: p99 above {TARGET_MS} ms target")
+
+
+if __name__ == "__main__":
+    main()
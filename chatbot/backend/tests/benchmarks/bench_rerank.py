@@ -0,0 +1,53 @@
+"""Time the QueryKnowledgeBase reranker over a realistic retrieval result
+
+Run from chatbot/backend: python -m tests.benchmarks.bench_rerank
+"""
+
+import random
+import statistics
+import time
+
+from tests.unit.conftest import load_function
+
+CHUNK_COUNT = 50
+CHUNK_WORDS = 250  # ~300 token chunks, the knowledge base default
+RUNS = 200
+TARGET_MS = 10
+
+
+def make_chunks(rng, vocabulary):
+    return [
+        {
+            "content": {"text": " ".join(rng.choices(vocabulary, k=CHUNK_WORDS))},
+            "location": {"s3Location": {"uri": f"s3://kb/doc-{i}.pdf"}},
+        }
+        for i in range(CHUNK_COUNT)
+    ]
+
+
+def main():
+    rerank = load_function("QueryKnowledgeBase", "rerank")
+
+    rng = random.Random(7)
+    vocabulary = [f"term{i}" for i in range(3000)]
+    chunks = make_chunks(rng, vocabulary)
+    query = " ".join(rng.choices(vocabulary, k=12))
+
+    rerank.rerank(query, chunks, token_budget=2000)  # warm up
+
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        rerank.rerank(query, chunks, token_budget=2000)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+
+    print(f"rerank {CHUNK_COUNT} chunks: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    print("OK" if p99 < TARGET_MS else f"SLOW: p99 above {TARGET_MS} ms target")
+
+
+if __name__ == "__main__":
+    main()
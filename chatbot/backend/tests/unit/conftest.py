@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+# The functions build boto3 clients at import time
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+from tools import load_function  # noqa: E402
+from tools.cassette import Cassette  # noqa: E402
+
+CASSETTE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes")
+
+
+@pytest.fixture
+def job_store(monkeypatch):
+    from chatbot_common import jobs
+
+    store = jobs.InMemoryJobStore()
+    monkeypatch.setattr(jobs, "_JOB_STORE", store)
+    return store
+
+
+class FakeConnectionPusher:
+    """Records pushed WebSocket messages instead of calling API Gateway"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.sent = []
+
+    def send(self, connection_id, message):
+        self.sent.append((connection_id, message))
+        return True
+
+    def broadcast(self, topic, *messages):
+        for connection_id in self.registry.subscribers(topic):
+            for message in messages:
+                self.send(connection_id, message)
+
+
+@pytest.fixture
+def connection_registry(monkeypatch):
+    from chatbot_common import connections
+
+    registry = connections.InMemoryConnectionRegistry()
+    monkeypatch.setattr(connections, "_CONNECTION_REGISTRY", registry)
+    return registry
+
+
+@pytest.fixture
+def connection_pusher(monkeypatch, connection_registry):
+    from chatbot_common import connections
+
+    pusher = FakeConnectionPusher(connection_registry)
+    monkeypatch.setattr(connections, "_CONNECTION_PUSHER", pusher)
+    return pusher
+
+
+class LambdaContext:
+    function_name = "chatbot-test"
+    memory_limit_in_mb = 128
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:chatbot-test"
+    aws_request_id = "test-request"
+
+    def __init__(self, remaining_time_in_millis=30000):
+        self.remaining_time_in_millis = remaining_time_in_millis
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_time_in_millis
+
+
+@pytest.fixture
+def lambda_context():
+    return LambdaContext()
+
+
+@pytest.fixture
+def trace(monkeypatch):
+    """Point a loaded function's tracer at an in-memory provider and return the provider"""
+    from chatbot_common.tracing import InMemoryProvider
+
+    def attach(module):
+        provider = InMemoryProvider()
+        monkeypatch.setattr(module.tracer, "provider", provider)
+        monkeypatch.setattr(module.tracer, "disabled", False)
+        return provider
+
+    return attach
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "cassette(name): replay another test's cassette")
+
+
+@pytest.fixture
+def cassette(request):
+    """Replay the test's recorded AWS traffic from cassettes/<test name>.json
+
+    CASSETTE_MODE=record re-records it against the account in the environment,
+    CASSETTE_LATENCY_SCALE replays with the recorded timings.
+    """
+    marker = request.node.get_closest_marker("cassette")
+    name = marker.args[0] if marker else request.node.name
+    path = os.path.join(CASSETTE_DIR, f"{name}.json")
+    with Cassette(
+        path,
+        record=os.environ.get("CASSETTE_MODE") == "record",
+        latency_scale=float(os.environ.get("CASSETTE_LATENCY_SCALE", "0")),
+    ) as recorded:
+        yield recorded
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from tools import ask_batch
+
+
+def test_read_questions_accepts_text_and_json_lines():
+    lines = ["How long do refunds take?\n", "\n", '{"question": "Opening hours?"}\n']
+
+    assert ask_batch.read_questions(lines) == [
+        "How long do refunds take?",
+        "Opening hours?",
+    ]
+
+
+def test_run_batch_bounds_concurrency_and_records_errors():
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def answer(question):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        if question == "bad":
+            raise RuntimeError("throttled")
+        return {"assistantMessage": {"content": question.upper()}}
+
+    questions = ["a", "b", "bad", "c", "d", "e"]
+    records = list(ask_batch.run_batch(questions, answer, concurrency=2))
+
+    assert peak == 2
+    assert sorted(record["index"] for record in records) == list(range(6))
+    failed = [record for record in records if "error" in record]
+    assert failed == [
+        {
+            "index": 2,
+            "question": "bad",
+            "error": "throttled",
+            "latencyMs": failed[0]["latencyMs"],
+        }
+    ]
+    assert all(record["latencyMs"] >= 10 for record in records)
+
+    summary = ask_batch.summarize(records)
+    assert summary["questions"] == 6
+    assert summary["errors"] == 1
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+from stacks import bundling
+from tools import FUNCTIONS_DIR
+
+
+@pytest.fixture(scope="module")
+def download_bundle(tmp_path_factory):
+    output_dir = str(tmp_path_factory.mktemp("bundle"))
+    report = bundling.bundle_function(
+        os.path.join(FUNCTIONS_DIR, "GenerateDownloadDocumentLink"),
+        output_dir,
+        sys.executable,
+    )
+    return output_dir, report
+
+
+def test_bundle_carries_only_what_the_function_imports(download_bundle):
+    output_dir, report = download_bundle
+
+    assert os.path.exists(os.path.join(output_dir, "lambda_function.py"))
+    assert os.path.exists(os.path.join(output_dir, "chatbot_common", "clients.py"))
+    # boto3 is only imported through clients' LazyLoader
+    assert os.path.exists(os.path.join(output_dir, "boto3", "__init__.py"))
+    assert not os.path.exists(os.path.join(output_dir, "chatbot_common", "jobs.py"))
+    assert not os.path.exists(
+        os.path.join(output_dir, "aws_lambda_powertools", "utilities", "kafka")
+    )
+
+    services = sorted(
+        entry.name
+        for entry in os.scandir(os.path.join(output_dir, "botocore", "data"))
+        if entry.is_dir()
+    )
+    assert services == ["s3", "xray"] == report["services"]
+    assert os.path.exists(
+        os.path.join(output_dir, "botocore", "data", "endpoints.json")
+    )
+
+
+def test_bundle_is_byte_compiled_and_reported(download_bundle):
+    output_dir, report = download_bundle
+
+    assert report["byteCompiled"]
+    assert os.listdir(os.path.join(output_dir, "__pycache__"))
+    assert report["function"] == "GenerateDownloadDocumentLink"
+    assert report["bytes"] == sum(
+        os.path.getsize(os.path.join(dir_path, name))
+        for dir_path, _, names in os.walk(output_dir)
+        for name in names
+    )
+    assert "botocore" in bundling.format_report(report)
+
+
+def test_unresolvable_imports_fail_the_bundle(tmp_path):
+    function_dir = tmp_path / "Broken"
+    function_dir.mkdir()
+    (function_dir / "lambda_function.py").write_text("import json\nimport requests\n")
+
+    with pytest.raises(ImportError, match="requests"):
+        bundling.bundle_function(str(function_dir), str(tmp_path / "out"), "python3")
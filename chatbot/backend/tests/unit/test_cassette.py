@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+import pytest
+
+from tools.cassette import Cassette, CassetteMiss
+
+LISTING = (
+    b'<?xml version="1.0" encoding="UTF-8"?>\n'
+    b'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+    b"<Name>bucket</Name><KeyCount>1</KeyCount><IsTruncated>false</IsTruncated>"
+    b"<Contents><Key>arn:aws:iam::123456789012:role/report.pdf</Key>"
+    b"<LastModified>2026-10-01T08:00:00.000Z</LastModified><Size>42</Size>"
+    b"</Contents></ListBucketResult>"
+)
+SERVER_DELAY_SECONDS = 0.2
+
+
+class S3Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(SERVER_DELAY_SECONDS)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(LISTING)))
+        self.end_headers()
+        self.wfile.write(LISTING)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def s3_endpoint():
+    server = ThreadingHTTPServer(("localhost", 0), S3Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://localhost:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def s3_client(endpoint_url):
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id="AKIASECRETKEYID",
+        aws_secret_access_key="secret",
+        aws_session_token="session-token",
+    )
+
+
+def test_records_redacted_and_replays_offline(s3_endpoint, tmp_path):
+    path = tmp_path / "listing.json"
+
+    with Cassette(path, record=True):
+        recorded = s3_client(s3_endpoint).list_objects_v2(Bucket="bucket")
+
+    saved = path.read_text()
+    assert "AKIASECRETKEYID" not in saved
+    assert "session-token" not in saved
+    assert "123456789012" not in saved
+    assert json.loads(saved)["interactions"][0]["elapsedMs"] >= 200
+
+    # Nothing is listening on the port any more
+    with Cassette(path):
+        replayed = s3_client(s3_endpoint).list_objects_v2(Bucket="bucket")
+
+    assert replayed["Contents"][0]["Key"] == "arn:aws:iam::000000000000:role/report.pdf"
+    assert replayed["Contents"][0]["Size"] == recorded["Contents"][0]["Size"]
+
+
+def test_replay_emulates_recorded_latency(s3_endpoint, tmp_path):
+    path = tmp_path / "listing.json"
+    with Cassette(path, record=True):
+        s3_client(s3_endpoint).list_objects_v2(Bucket="bucket")
+
+    started = time.perf_counter()
+    with Cassette(path, latency_scale=0.5):
+        s3_client(s3_endpoint).list_objects_v2(Bucket="bucket")
+
+    assert time.perf_counter() - started >= SERVER_DELAY_SECONDS * 0.5
+
+
+def test_unrecorded_request_is_a_miss(s3_endpoint, tmp_path):
+    path = tmp_path / "listing.json"
+    with Cassette(path, record=True):
+        s3_client(s3_endpoint).list_objects_v2(Bucket="bucket")
+
+    with Cassette(path):
+        client = s3_client(s3_endpoint)
+        client.list_objects_v2(Bucket="bucket")
+        with pytest.raises(CassetteMiss):
+            client.list_objects_v2(Bucket="bucket")
@@ -0,0 +1,37 @@
+from chatbot_common import clients
+
+
+class FakeBoto3:
+    def __init__(self):
+        self.built = []
+
+    def client(self, service_name, **kwargs):
+        self.built.append(service_name)
+        return type(
+            "Client", (), {"service": service_name, "ping": lambda self: "pong"}
+        )()
+
+
+def test_client_is_built_once_on_first_use(monkeypatch):
+    boto3 = FakeBoto3()
+    monkeypatch.setattr(clients, "boto3", boto3)
+    monkeypatch.setattr(clients, "_CLIENTS", {})
+
+    s3 = clients.lazy_client("s3")
+    assert boto3.built == []
+    assert not s3.built
+
+    assert s3.ping() == "pong"
+    assert s3.service == "s3"
+    assert boto3.built == ["s3"]
+    assert clients.lazy_client("s3") is s3
+
+
+def test_clients_with_a_config_are_not_shared(monkeypatch):
+    monkeypatch.setattr(clients, "_CLIENTS", {})
+    config = object()
+
+    assert clients.lazy_client("s3", config=config) is not clients.lazy_client(
+        "s3", config=config
+    )
+    assert clients.lazy_client("s3") is not clients.lazy_client("s3", config=config)
@@ -0,0 +1,230 @@
+import io
+import json
+import threading
+
+import pytest
+
+from .conftest import load_function
+
+
+class FakeS3Client:
+    def __init__(self, failing_keys=()):
+        self.failing_keys = set(failing_keys)
+        self.batches = []
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        with self._lock:
+            self.batches.append(keys)
+        return {
+            "Deleted": [{"Key": key} for key in keys if key not in self.failing_keys],
+            "Errors": [
+                {"Key": key, "Code": "AccessDenied"}
+                for key in keys
+                if key in self.failing_keys
+            ],
+        }
+
+
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+
+class FakeBedrockAgentClient:
+    def __init__(self, documents):
+        self.documents = documents
+        self.ingestion_jobs = 0
+
+    def get_paginator(self, name):
+        return FakePaginator([{"documentDetails": self.documents}])
+
+    def start_ingestion_job(self, **kwargs):
+        self.ingestion_jobs += 1
+        return {"ingestionJob": {"ingestionJobId": "job", "status": "STARTING"}}
+
+
+class FakeLambdaClient:
+    def __init__(self):
+        self.invocations = []
+
+    def invoke(self, **kwargs):
+        self.invocations.append(kwargs)
+        return {"StatusCode": 202}
+
+
+def kb_document(module, key, status):
+    return {
+        "identifier": {"s3": {"uri": f"s3://{module.KNOWLEDGE_BASE_BUCKET}/{key}"}},
+        "status": status,
+    }
+
+
+def delete_event(keys, resource="/documents/delete"):
+    documents = [{"s3Key": f"s3://bucket/{key}", "status": "INDEXED"} for key in keys]
+    return {
+        "httpMethod": "POST",
+        "resource": resource,
+        "body": json.dumps({"documents": documents}),
+    }
+
+
+@pytest.fixture
+def delete_documents(monkeypatch, job_store):
+    monkeypatch.setenv("KNOWLEDGE_BASE_BUCKET", "kb-bucket")
+    monkeypatch.setenv("ASYNC_DELETE_THRESHOLD", "5000")
+    module = load_function("DeleteDocuments")
+    monkeypatch.setattr(module, "S3_CLIENT", FakeS3Client())
+    monkeypatch.setattr(module, "BEDROCK_AGENT_CLIENT", FakeBedrockAgentClient([]))
+    monkeypatch.setattr(module, "LAMBDA_CLIENT", FakeLambdaClient())
+    return module
+
+
+def test_large_delete_is_split_into_s3_sized_batches(delete_documents, lambda_context):
+    keys = [f"doc-{i}.pdf" for i in range(2500)]
+
+    response = delete_documents.lambda_handler(delete_event(keys), lambda_context)
+    body = json.loads(response["body"])
+
+    # Each document is deleted together with its metadata sidecar
+    batches = delete_documents.S3_CLIENT.batches
+    assert sorted(len(batch) for batch in batches) == [1000] * 5
+    assert "doc-7.pdf.metadata.json" in sum(batches, [])
+    assert response["statusCode"] == 200
+    assert body["success"] is True
+    assert body["deletedCount"] == 2500
+    assert body["failedIds"] == []
+
+
+def test_failed_keys_are_aggregated_across_batches(
+    delete_documents, lambda_context, monkeypatch
+):
+    keys = [f"doc-{i}.pdf" for i in range(1500)]
+    s3_client = FakeS3Client(
+        failing_keys={"doc-3.pdf", "doc-1200.pdf", "doc-9.pdf.metadata.json"}
+    )
+    monkeypatch.setattr(delete_documents, "S3_CLIENT", s3_client)
+
+    response = delete_documents.lambda_handler(delete_event(keys), lambda_context)
+    body = json.loads(response["body"])
+
+    assert body["success"] is False
+    assert body["deletedCount"] == 1498
+    assert sorted(body["failedIds"]) == ["doc-1200.pdf", "doc-3.pdf"]
+
+
+def test_resync_uses_server_side_status(delete_documents, lambda_context, monkeypatch):
+    # Client claims INDEXED but the knowledge base never indexed the document
+    agent = FakeBedrockAgentClient([kb_document(delete_documents, "a.pdf", "FAILED")])
+    monkeypatch.setattr(delete_documents, "BEDROCK_AGENT_CLIENT", agent)
+
+    delete_documents.lambda_handler(delete_event(["a.pdf"]), lambda_context)
+    assert agent.ingestion_jobs == 0
+
+    agent.documents = [kb_document(delete_documents, "a.pdf", "INDEXED")]
+    delete_documents.lambda_handler(delete_event(["a.pdf"]), lambda_context)
+    assert agent.ingestion_jobs == 1
+
+
+def test_large_delete_runs_as_async_job(
+    delete_documents, lambda_context, monkeypatch, job_store
+):
+    monkeypatch.setattr(delete_documents, "ASYNC_DELETE_THRESHOLD", 2)
+    keys = ["a.pdf", "b.pdf", "c.pdf"]
+
+    response = delete_documents.lambda_handler(delete_event(keys), lambda_context)
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 202
+    assert delete_documents.S3_CLIENT.batches == []
+
+    invocation = delete_documents.LAMBDA_CLIENT.invocations[0]
+    assert invocation["InvocationType"] == "Event"
+    assert invocation["FunctionName"] == lambda_context.function_name
+    # Only the job id travels, the keys are read back through the job record
+    assert json.loads(invocation["Payload"]) == {"jobId": body["jobId"]}
+
+    status_event = {
+        "httpMethod": "POST",
+        "resource": "/documents/delete/status",
+        "body": json.dumps({"jobId": body["jobId"]}),
+    }
+    status = json.loads(
+        delete_documents.lambda_handler(status_event, lambda_context)["body"]
+    )
+    assert status["status"] == "PENDING"
+
+    delete_documents.lambda_handler(json.loads(invocation["Payload"]), lambda_context)
+
+    status = json.loads(
+        delete_documents.lambda_handler(status_event, lambda_context)["body"]
+    )
+    assert status["status"] == "SUCCEEDED"
+    assert status["deletedCount"] == 3
+
+
+def test_unknown_job_status_is_not_found(delete_documents, lambda_context):
+    status_event = {
+        "httpMethod": "POST",
+        "resource": "/documents/delete/status",
+        "body": json.dumps({"jobId": "missing"}),
+    }
+    response = delete_documents.lambda_handler(status_event, lambda_context)
+    assert response["statusCode"] == 404
+
+
+def test_async_job_keeps_its_keys_out_of_the_job_record(
+    delete_documents, lambda_context, monkeypatch, job_store
+):
+    monkeypatch.setattr(delete_documents, "ASYNC_DELETE_THRESHOLD", 2)
+    monkeypatch.setattr(delete_documents, "DELETE_JOBS_BUCKET", "index-bucket")
+    keys = ["a.pdf", "b.pdf", "c.pdf"]
+
+    response = delete_documents.lambda_handler(delete_event(keys), lambda_context)
+    job_id = json.loads(response["body"])["jobId"]
+
+    # The record only points at the key list written to the bucket
+    payload = job_store.get(job_id)["payload"]
+    assert payload["documentCount"] == 3
+    assert "s3Keys" not in payload
+    stored = delete_documents.S3_CLIENT.objects[("index-bucket", payload["s3KeysKey"])]
+    assert json.loads(stored) == keys
+
+    delete_documents.lambda_handler({"jobId": job_id}, lambda_context)
+    assert job_store.get(job_id)["result"]["deletedCount"] == 3
+
+
+def test_failed_async_job_is_recorded_without_raising(
+    delete_documents, lambda_context, monkeypatch, job_store
+):
+    monkeypatch.setattr(delete_documents, "ASYNC_DELETE_THRESHOLD", 2)
+    response = delete_documents.lambda_handler(
+        delete_event(["a.pdf", "b.pdf", "c.pdf"]), lambda_context
+    )
+    job_id = json.loads(response["body"])["jobId"]
+
+    def fail(s3_keys):
+        raise RuntimeError("index check failed")
+
+    monkeypatch.setattr(delete_documents, "delete_s3_files", fail)
+
+    # Returning normally keeps Lambda from retrying the delete
+    assert delete_documents.run_delete_job(job_id) is None
+    job = job_store.get(job_id)
+    assert job["status"] == "FAILED"
+    assert job["error"] == "index check failed"
+
+
+def test_missing_async_job_is_a_no_op(delete_documents, lambda_context):
+    assert delete_documents.run_delete_job("missing") is None
+    assert delete_documents.S3_CLIENT.batches == []
@@ -0,0 +1,67 @@
+import pytest
+
+from tools import evaluate
+
+DOCUMENTS = [
+    {
+        "uri": "s3://kb/refund-policy.pdf",
+        "page": 1,
+        "text": "Refunds are issued within 5 business days of the return arriving.",
+    },
+    {
+        "uri": "s3://kb/shipping-guide.pdf",
+        "page": 1,
+        "text": "Express delivery arrives the next business day and costs 12 dollars.",
+    },
+    {
+        "uri": "s3://kb/store-hours.pdf",
+        "page": 1,
+        "text": "Stores open 10 am to 5 pm on Sunday.",
+    },
+]
+GOLDEN = [
+    {
+        "question": "How many business days do refunds take?",
+        "expectedSources": ["refund-policy.pdf"],
+    },
+    {
+        "question": "What does express delivery cost?",
+        "expectedSources": ["shipping-guide.pdf"],
+    },
+]
+
+
+def test_recall_at_k_counts_expected_sources_in_first_k_citations():
+    cited = ["a.pdf", "b.pdf", "c.pdf"]
+
+    assert evaluate.recall_at_k(["b.pdf", "c.pdf"], cited, k=2) == 0.5
+    assert evaluate.recall_at_k(["d.pdf"], cited, k=3) == 0.0
+
+
+def test_configurations_are_compared_on_the_same_golden_set():
+    rows = [
+        evaluate.evaluate(configuration, DOCUMENTS, GOLDEN, latency_scale=0, k=1)
+        for configuration in (
+            {"name": "baseline"},
+            {"name": "top-1", "settings": {"NUMBER_OF_RESULTS": 1}},
+            {"name": "converse", "request": {"converse": True}},
+        )
+    ]
+
+    assert [row["recall@1"] for row in rows] == [1.0, 1.0, 1.0]
+    assert [row["errors"] for row in rows] == [0, 0, 0]
+    # Fewer retrieved chunks, smaller prompt
+    assert rows[1]["promptTokens"] < rows[0]["promptTokens"]
+
+    table = evaluate.format_table(rows, k=1)
+    assert table.splitlines()[3].startswith("| top-1 | 1.00 |")
+
+
+def test_unknown_setting_is_rejected():
+    with pytest.raises(ValueError, match="NUMBER_OF_RESULT"):
+        evaluate.evaluate(
+            {"name": "typo", "settings": {"NUMBER_OF_RESULT": 3}},
+            DOCUMENTS,
+            GOLDEN,
+            latency_scale=0,
+        )
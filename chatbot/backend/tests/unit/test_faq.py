@@ -0,0 +1,60 @@
+import pytest
+
+from .conftest import load_function
+
+
+@pytest.fixture(scope="module")
+def faq():
+    return load_function("QueryKnowledgeBase", "faq")
+
+
+class FakeLogsClient:
+    """Logs Insights that finishes on the second poll"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.polls = 0
+
+    def start_query(self, **kwargs):
+        self.queries.append(kwargs)
+        return {"queryId": "query-1"}
+
+    def get_query_results(self, queryId):
+        self.polls += 1
+        if self.polls == 1:
+            return {"status": "Running", "results": []}
+        return {
+            "status": "Complete",
+            "results": [
+                [
+                    {"field": "normalizedQuery", "value": query},
+                    {"field": "asks", "value": str(asks)},
+                ]
+                for query, asks in self.rows
+            ],
+        }
+
+
+def test_top_queries_mines_logs_insights(faq, monkeypatch):
+    monkeypatch.setattr(faq, "QUERY_POLL_INTERVAL_SECONDS", 0)
+    logs_client = FakeLogsClient(
+        [("how long do refunds take?", 41), ("opening hours", 9)]
+    )
+
+    queries = faq.top_queries(logs_client, "/aws/lambda/chatbot-query", limit=2)
+
+    assert queries == [("how long do refunds take?", 41), ("opening hours", 9)]
+    (query,) = logs_client.queries
+    assert query["logGroupName"] == "/aws/lambda/chatbot-query"
+    assert "limit 2" in query["queryString"]
+    assert query["endTime"] - query["startTime"] == 7 * 24 * 60 * 60
+
+
+def test_store_clear_drops_previous_corpus(faq):
+    store = faq.InMemoryFaqStore()
+    store.put("opening hours", {"assistantMessage": {"content": "9-5"}}, "job-1")
+
+    store.clear()
+
+    assert store.get("opening hours") is None
@@ -0,0 +1,63 @@
+import builtins
+import json
+
+from boto3.session import Session
+
+from chatbot_common import init_profile, metrics
+from chatbot_common.init_profile import InitProfiler, import_group
+
+
+def test_import_groups_split_powertools_by_subsystem():
+    assert import_group("botocore.client") == "botocore"
+    assert import_group("aws_lambda_powertools") == "powertools"
+    assert (
+        import_group("aws_lambda_powertools.metrics.provider") == "powertools.metrics"
+    )
+    assert import_group("urllib3") is None
+
+
+def test_profiles_imports_and_client_construction(tmp_path, monkeypatch):
+    (tmp_path / "profiled_handler.py").write_text(
+        "import boto3\n"
+        "import colorsys\n"
+        "S3_CLIENT = boto3.client('s3', region_name='us-east-1')\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    original_import, original_client = builtins.__import__, Session.client
+
+    profiler = InitProfiler()
+    profiler.start()
+    __import__("profiled_handler")
+    report = profiler.stop()
+
+    assert builtins.__import__ is original_import
+    assert Session.client is original_client
+    assert [client["service"] for client in report["clients"]] == ["s3"]
+    assert "other" in report["imports"]
+    # Each figure is rounded to 0.1 ms on its own
+    assert report["importMs"] + report["clientMs"] <= report["initMs"] + 0.2
+
+
+def test_first_invocation_publishes_init_profile(monkeypatch, capsys, lambda_context):
+    profiler = InitProfiler()
+    profiler.start()
+    monkeypatch.setattr(init_profile, "_profiler", profiler)
+
+    @metrics.instrument(metrics.new_metrics())
+    def handler(event, context):
+        return {}
+
+    handler({"jobId": "job-1"}, lambda_context)
+    handler({"jobId": "job-2"}, lambda_context)
+
+    # The first handler run in the process also emits a separate ColdStart record
+    emf = [
+        record
+        for record in map(json.loads, capsys.readouterr().out.splitlines())
+        if "ColdStart" not in record
+    ]
+    assert emf[0]["InitLatency"] == [profiler.report()["initMs"]]
+    assert "InitImportLatency" in emf[0]
+    assert emf[0]["initProfile"]["initMs"] == profiler.report()["initMs"]
+    assert "InitLatency" not in emf[-1]
+    assert "initProfile" not in emf[-1]
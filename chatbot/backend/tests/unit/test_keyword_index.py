@@ -0,0 +1,146 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from chatbot_common import keyword_index
+
+CHUNKS = [
+    {
+        "text": "Policy POL-2024-07 covers refunds for damaged items.",
+        "uri": "s3://kb-bucket/refunds.pdf",
+        "page": 1.0,
+        "chunkId": "chunk-1",
+        "documentId": "doc-refunds",
+        "tags": ["policy"],
+    },
+    {
+        "text": "Replacement part AX-4410 ships within two days.",
+        "uri": "s3://kb-bucket/parts.pdf",
+        "page": 3.0,
+        "chunkId": "chunk-2",
+        "documentId": "doc-parts",
+        "tags": ["parts"],
+    },
+    {
+        "text": "Refunds are issued to the original payment method.",
+        "uri": "s3://kb-bucket/refunds.pdf",
+        "page": 2.0,
+        "chunkId": "chunk-3",
+        "documentId": "doc-refunds",
+        "tags": ["policy"],
+    },
+]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = tmp_path / "index.bin"
+    path.write_bytes(keyword_index.build_index(CHUNKS))
+    return str(path)
+
+
+def test_identifier_lookup_from_mapped_file(index_path):
+    index = keyword_index.KeywordIndex.open(index_path)
+
+    results = index.search("What does part ax-4410 cost?", top_k=5)
+
+    assert results[0]["content"]["text"].startswith("Replacement part AX-4410")
+    assert results[0]["metadata"]["x-amz-bedrock-kb-chunk-id"] == "chunk-2"
+    assert results[0]["location"]["s3Location"]["uri"] == "s3://kb-bucket/parts.pdf"
+    # Identifier parts are indexed too
+    assert index.search("2024", top_k=5)[0]["metadata"]["documentId"] == ("doc-refunds")
+
+
+def test_search_ranks_by_bm25_and_applies_scope(index_path):
+    index = keyword_index.KeywordIndex.open(index_path)
+
+    results = index.search("refunds payment", top_k=5)
+    assert [r["metadata"]["x-amz-bedrock-kb-chunk-id"] for r in results] == [
+        "chunk-3",
+        "chunk-1",
+    ]
+
+    assert index.search("refunds", top_k=5, document_ids=["doc-parts"]) == []
+    assert index.search("ships", top_k=5, tags=["policy"]) == []
+    assert index.search("unknownterm", top_k=5) == []
+
+
+def test_required_terms_filter_out_common_word_matches(index_path):
+    index = keyword_index.KeywordIndex.open(index_path)
+    query = "When does part AX-4410 ship?"
+
+    results = index.search(
+        query, top_k=5, required_terms=keyword_index.identifiers(query)
+    )
+    assert [r["metadata"]["x-amz-bedrock-kb-chunk-id"] for r in results] == ["chunk-2"]
+
+    query = "Which refunds cover ZZ-9999?"
+    assert index.search(query, top_k=5)
+    assert (
+        index.search(query, top_k=5, required_terms=keyword_index.identifiers(query))
+        == []
+    )
+
+
+def test_identifier_queries_are_detected():
+    assert keyword_index.looks_like_identifier("What is POL-2024-07?")
+    assert keyword_index.looks_like_identifier("status of part AX4410")
+    assert not keyword_index.looks_like_identifier("How long do refunds take?")
+    assert not keyword_index.looks_like_identifier("Is a 30-day return allowed")
+
+
+def test_dates_and_versions_are_not_identifiers():
+    assert keyword_index.identifiers("What changed on 2024-07-01?") == []
+    assert keyword_index.identifiers("Orders placed 2024-07-01T10:00Z") == []
+    assert keyword_index.identifiers("Release notes for v1.2.3") == []
+    assert keyword_index.identifiers("Is 2.4.6-rc1 supported?") == []
+    assert keyword_index.identifiers("Does v2.10.100 fix AX-4410?") == ["ax-4410"]
+
+
+class FakeS3Client:
+    def __init__(self, data):
+        self.data = data
+        self.downloads = 0
+
+    def head_object(self, Bucket, Key):
+        if self.data is None:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {"ETag": '"v1"'}
+
+    def download_file(self, bucket, key, path):
+        self.downloads += 1
+        with open(path, "wb") as index_file:
+            index_file.write(self.data)
+
+
+def test_index_is_loaded_lazily_and_rechecked(monkeypatch, tmp_path):
+    monkeypatch.setenv("KEYWORD_INDEX_BUCKET", "index-bucket")
+    monkeypatch.setattr(keyword_index, "LOCAL_INDEX_PATH", str(tmp_path / "kw.bin"))
+    monkeypatch.setattr(keyword_index, "_KEYWORD_INDEX", None)
+    monkeypatch.setattr(keyword_index, "_KEYWORD_INDEX_ETAG", None)
+    monkeypatch.setattr(keyword_index, "_KEYWORD_INDEX_CHECKED_AT", 0.0)
+
+    missing = FakeS3Client(None)
+    assert keyword_index.get_keyword_index(missing) is None
+
+    # Not rechecked until the refresh interval has passed
+    s3_client = FakeS3Client(keyword_index.build_index(CHUNKS))
+    assert keyword_index.get_keyword_index(s3_client) is None
+    monkeypatch.setattr(keyword_index, "_KEYWORD_INDEX_CHECKED_AT", 0.0)
+
+    index = keyword_index.get_keyword_index(s3_client)
+    assert index.chunk_count == 3
+
+    monkeypatch.setattr(keyword_index, "_KEYWORD_INDEX_CHECKED_AT", 0.0)
+    assert keyword_index.get_keyword_index(s3_client) is index
+    assert s3_client.downloads == 1
+
+
+def test_index_builds_from_a_one_pass_stream():
+    index = keyword_index.KeywordIndex(
+        keyword_index.build_index(chunk for chunk in CHUNKS)
+    )
+
+    assert index.chunk_count == len(CHUNKS)
+    assert index.chunk(2)["chunkId"] == "chunk-3"
+    (result,) = index.search("AX-4410", top_k=5)
+    assert result["metadata"]["x-amz-bedrock-kb-chunk-id"] == "chunk-2"
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from .conftest import load_function
+
+# Names the cassettes were recorded with, a recording run uses the environment's
+CASSETTE_RESOURCES = {
+    "KNOWLEDGE_BASE_ID": "CASSETTEKB",
+    "DATA_SOURCE_ID": "CASSETTEDS",
+    "KNOWLEDGE_BASE_BUCKET": "chatbot-cassette-knowledge-base",
+}
+
+
+@pytest.fixture
+def list_documents(monkeypatch):
+    for name, value in CASSETTE_RESOURCES.items():
+        monkeypatch.setenv(name, os.environ.get(name, value))
+    return load_function("ListDocuments")
+
+
+def test_merges_bucket_and_knowledge_base_listings(
+    list_documents, cassette, lambda_context
+):
+    response = list_documents.lambda_handler(
+        {"httpMethod": "POST", "body": "{}"}, lambda_context
+    )
+
+    assert response["statusCode"] == 200
+    documents = json.loads(response["body"])["documentDetails"]
+    # Sidecars are listed by S3 but never shown
+    assert not any(doc["s3Key"].endswith(".metadata.json") for doc in documents)
+    statuses = {doc["status"] for doc in documents}
+    assert "INDEXED" in statuses
+    assert "NOT_INDEXED" in statuses
+    updated = [doc["updatedAt"] for doc in documents]
+    assert updated == sorted(updated, reverse=True)
+
+
+def test_replays_recorded_errors(list_documents, cassette, lambda_context):
+    response = list_documents.lambda_handler(
+        {"httpMethod": "POST", "body": "{}"}, lambda_context
+    )
+
+    assert response["statusCode"] == 403
+    assert json.loads(response["body"])["code"] == "AccessDenied"
+
+
+@pytest.mark.cassette("test_merges_bucket_and_knowledge_base_listings")
+def test_publishes_listing_metrics_per_route(list_documents, cassette, capsys):
+    from .conftest import LambdaContext
+
+    list_documents.lambda_handler(
+        {"httpMethod": "POST", "resource": "/documents/list", "body": "{}"},
+        LambdaContext(),
+    )
+
+    emf = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if '"_aws"' in line
+    ]
+    request = next(blob for blob in emf if "RequestLatency" in blob)
+    assert request["Route"] == "/documents/list"
+    assert request["S3ListingPages"] == [1.0]
+    assert request["KnowledgeBaseListingPages"] == [1.0]
+    assert request["DocumentCount"] == [61.0]
+    assert "S3ListingLatency" in request
+    assert "KnowledgeBaseListingLatency" in request
+
+
+@pytest.mark.cassette("test_merges_bucket_and_knowledge_base_listings")
+def test_traces_listing_stages(list_documents, cassette, lambda_context, trace):
+    spans = trace(list_documents)
+
+    response = list_documents.lambda_handler(
+        {"httpMethod": "POST", "body": "{}"}, lambda_context
+    )
+
+    assert spans.span_names() == [
+        "## s3_list",
+        "## kb_list",
+        "## merge",
+        "## format",
+        "## serialize",
+        "## lambda_handler",
+    ]
+    handler = spans.find("## lambda_handler")
+    assert all(span.parent is handler for span in list(spans.spans)[:-1])
+    document_count = len(json.loads(response["body"])["documentDetails"])
+    assert handler.annotations["DocumentCount"] == document_count
+    assert spans.find("## s3_list").annotations["S3DocumentCount"] > 0
+    assert spans.find("## kb_list").annotations["KnowledgeBaseDocumentCount"] > 0
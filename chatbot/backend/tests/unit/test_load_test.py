@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+
+from tools import load_test, local_server
+
+
+@pytest.fixture
+def local_url(monkeypatch, job_store):
+    monkeypatch.setattr(load_test, "LIST_POLL_SECONDS", 0.1)
+    for name in ("KNOWLEDGE_BASE_ID", "DATA_SOURCE_ID", "KNOWLEDGE_BASE_BUCKET"):
+        monkeypatch.setenv(name, "unset")
+    monkeypatch.setenv("MODEL_ARN", "local-model")
+
+    api = local_server.LocalApi(latency_scale=0, ingestion_seconds=0)
+    server = local_server.make_server(api, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield api, f"http://localhost:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_replays_every_scenario_against_the_local_server(local_url):
+    api, base_url = local_url
+
+    summaries = asyncio.run(
+        load_test.run_load(base_url, rates=[40], duration=1.0, seed=3)
+    )
+
+    summary = summaries[0]
+    assert summary["requests"] > 0
+    assert summary["errorRate"] == 0
+    assert set(summary["routes"]) >= {
+        "/chat",
+        "/documents/list",
+        "/documents/uploadpresignedurl",
+        "/documents/delete",
+    }
+    assert sum(summary["histogram"].values()) == summary["requests"]
+    # Issuing upload links leaves nothing in the bucket
+    assert not [
+        key
+        for key in api.s3.buckets[local_server.KNOWLEDGE_BASE_BUCKET]
+        if key.startswith("loadtest-")
+    ]
+
+
+def test_summary_separates_throttles_from_errors():
+    samples = [(200, 40.0), (429, 5.0), (502, 900.0), (0, 35000.0)]
+
+    summary = load_test.summarize(samples)
+
+    assert summary["throttleRate"] == 0.25
+    assert summary["errorRate"] == 0.5
+    assert summary["histogram"]["<=50"] == 2
+    assert summary["histogram"][">30000"] == 1
+
+
+def test_parse_mix_rejects_unknown_scenarios():
+    assert load_test.parse_mix("chat=2,list") == {"chat": 2.0, "list": 1.0}
+    with pytest.raises(ValueError):
+        load_test.parse_mix("browse=1")
+
+
+def test_reports_stage_throttling(local_url):
+    api, _ = local_url
+    server = local_server.make_server(
+        api, port=0, throttle=local_server.TokenBucket(rate=2, burst=2)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        summary = asyncio.run(
+            load_test.run_load(
+                f"http://localhost:{server.server_address[1]}",
+                rates=[40],
+                duration=0.5,
+                mix={"list": 1},
+            )
+        )[0]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 0 < summary["throttleRate"] < 1
+    assert summary["errorRate"] == 0
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from tools import local_server
+
+
+@pytest.fixture
+def local_api(monkeypatch, job_store):
+    # LocalApi sets these for the handlers, restore them for the other tests
+    for name in ("KNOWLEDGE_BASE_ID", "DATA_SOURCE_ID", "KNOWLEDGE_BASE_BUCKET"):
+        monkeypatch.setenv(name, "unset")
+    monkeypatch.setenv("MODEL_ARN", "local-model")
+
+    return local_server.LocalApi(latency_scale=0, ingestion_seconds=0)
+
+
+def post(api, path, body):
+    status, _, response_body = api.handle("POST", path, json.dumps(body))
+    return status, json.loads(response_body)
+
+
+def test_seeded_documents_are_indexed(local_api):
+    status, body = post(local_api, "/documents/list", {})
+
+    assert status == 200
+    documents = body["payload"] if "payload" in body else body
+    text = json.dumps(documents)
+    assert "refund-policy.pdf" in text
+    assert "INDEXED" in text
+
+
+def test_chat_is_answered_with_citations(local_api):
+    status, body = post(
+        local_api,
+        "/chat",
+        {"messages": [{"role": "USER", "content": "How long do refunds take?"}]},
+    )
+
+    assert status == 200
+    assert "refund-policy.pdf" in json.dumps(body)
+
+
+def test_unknown_path_is_not_found(local_api):
+    status, _, _ = local_api.handle("POST", "/nowhere", "{}")
+
+    assert status == 404
+
+
+def test_upload_then_sync_indexes_the_new_document(local_api):
+    status, body = post(
+        local_api,
+        "/documents/uploadpresignedurl",
+        {
+            "files": [
+                {
+                    "fileName": "warranty.pdf",
+                    "fileType": "application/pdf",
+                    "tags": ["warranty"],
+                }
+            ]
+        },
+    )
+    assert status == 200
+    result = json.dumps(body)
+    assert "http://localhost:3001/s3/local-knowledge-base" in result
+    # The sidecar waits for the upload, an abandoned link leaves nothing behind
+    bucket = local_api.s3.buckets["local-knowledge-base"]
+    assert "warranty.pdf.metadata.json" not in bucket
+
+    boundary = "local-boundary"
+    form = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="key"\r\n\r\n'
+        "warranty.pdf\r\n"
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="x-amz-meta-tags"\r\n\r\n'
+        '["warranty"]\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="warranty.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+        "The warranty covers manufacturing defects for two years.\r\n"
+        f"--{boundary}--\r\n"
+    ).encode()
+    local_api.upload(
+        "local-knowledge-base", f"multipart/form-data; boundary={boundary}", form
+    )
+    sidecar = json.loads(bucket["warranty.pdf.metadata.json"]["Body"])
+    assert sidecar["metadataAttributes"]["tags"] == ["warranty"]
+
+    status, _ = post(local_api, "/documents/sync", {})
+    assert status == 200
+
+    # The job advances as the frontend polls the document list
+    _, body = post(local_api, "/documents/list", {})
+    assert "INDEXED" in json.dumps(body)
+    results = local_api.bedrock.index.search("warranty manufacturing defects", 3)
+    assert any(
+        result["location"]["s3Location"]["uri"].endswith("warranty.pdf")
+        for result in results
+    )
+
+
+def test_delete_removes_the_object(local_api):
+    status, _ = post(
+        local_api,
+        "/documents/delete",
+        {"documents": [{"s3Key": "s3://local-knowledge-base/refund-policy.pdf"}]},
+    )
+
+    assert status == 200
+    assert "refund-policy.pdf" not in local_api.s3.buckets["local-knowledge-base"]
+
+
+def test_serves_the_api_over_http(local_api):
+    server = local_server.make_server(local_api, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        request = urllib.request.Request(
+            f"http://localhost:{server.server_address[1]}/documents/list",
+            data=b"{}",
+            method="POST",
+        )
+        started = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=10) as response:
+            assert response.status == 200
+            assert response.headers["Access-Control-Allow-Origin"] == "*"
+            assert "refund-policy.pdf" in response.read().decode()
+        assert time.perf_counter() - started < 10
+    finally:
+        server.shutdown()
+        server.server_close()
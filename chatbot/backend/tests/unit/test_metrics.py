@@ -0,0 +1,48 @@
+import json
+
+from chatbot_common import metrics
+
+
+def test_route_dimension_is_limited_to_known_routes():
+    assert (
+        metrics.route_dimension({"httpMethod": "POST", "resource": "/chat"}) == "/chat"
+    )
+    assert (
+        metrics.route_dimension({"httpMethod": "GET", "resource": "/wp-admin"})
+        == metrics.OTHER_ROUTE
+    )
+    assert (
+        metrics.route_dimension({"requestContext": {"routeKey": "$connect"}})
+        == "$connect"
+    )
+    assert metrics.route_dimension({"jobId": "job-1"}) == metrics.ASYNC_ROUTE
+
+
+def test_each_handler_records_its_own_route(capsys, lambda_context):
+    list_metrics, chat_metrics = metrics.new_metrics(), metrics.new_metrics()
+
+    @metrics.instrument(list_metrics)
+    def list_handler(event, context):
+        metrics.count(list_metrics, "Listed")
+
+    @metrics.instrument(chat_metrics)
+    def chat_handler(event, context):
+        # Another handler run mid-invocation, as local_server's async jobs are
+        list_handler({"httpMethod": "GET", "resource": "/documents/list"}, context)
+        metrics.count(chat_metrics, "Answered")
+
+    chat_handler({"httpMethod": "POST", "resource": "/chat"}, lambda_context)
+    chat_handler({"jobId": "job-1"}, lambda_context)
+
+    records = [
+        record
+        for record in map(json.loads, capsys.readouterr().out.splitlines())
+        if "ColdStart" not in record
+    ]
+    assert [(record["Route"], "Listed" in record) for record in records] == [
+        ("/documents/list", True),
+        ("/chat", False),
+        ("/documents/list", True),
+        (metrics.ASYNC_ROUTE, False),
+    ]
+    assert all("Answered" in record for record in records[1::2])
@@ -0,0 +1,53 @@
+import time
+
+from .conftest import load_function
+
+
+def chunk(uri, text):
+    return {"content": {"text": text}, "location": {"s3Location": {"uri": uri}}}
+
+
+def test_compound_question_is_split_into_sub_queries():
+    multiquery = load_function("QueryKnowledgeBase", "multiquery")
+
+    sub_queries = multiquery.split_query(
+        "What is the refund policy? How do I cancel my subscription?"
+    )
+
+    assert sub_queries == [
+        "What is the refund policy? How do I cancel my subscription?",
+        "What is the refund policy",
+        "How do I cancel my subscription",
+    ]
+    assert multiquery.split_query("What is the refund policy?") == [
+        "What is the refund policy?"
+    ]
+
+
+def test_rrf_prefers_chunks_ranked_by_several_queries_and_dedups():
+    multiquery = load_function("QueryKnowledgeBase", "multiquery")
+    a, b, c = (
+        chunk("s3://kb/a.pdf", "A"),
+        chunk("s3://kb/b.pdf", "B"),
+        chunk("s3://kb/c.pdf", "C"),
+    )
+
+    fused = multiquery.reciprocal_rank_fusion([[a, b], [c, b], [b]], top_k=2)
+
+    assert [result["content"]["text"] for result in fused] == ["B", "A"]
+    assert fused[0]["fusedScore"] > fused[1]["fusedScore"]
+
+
+def test_fan_out_runs_retrievals_concurrently():
+    multiquery = load_function("QueryKnowledgeBase", "multiquery")
+
+    def slow_retrieve(sub_query):
+        time.sleep(0.2)
+        return [chunk("s3://kb/doc.pdf", sub_query)]
+
+    started = time.monotonic()
+    results = multiquery.fan_out_retrieve(slow_retrieve, ["q1", "q2", "q3", "q4"])
+    elapsed = time.monotonic() - started
+
+    assert [r[0]["content"]["text"] for r in results] == ["q1", "q2", "q3", "q4"]
+    assert elapsed < 0.5
@@ -0,0 +1,61 @@
+from .conftest import load_function
+
+
+def passage(uri, words):
+    text = " ".join(f"word{i}" for i in range(words))
+    return {"content": {"text": text}, "location": {"s3Location": {"uri": uri}}}
+
+
+def test_passages_that_fit_are_kept_whole():
+    packing = load_function("QueryKnowledgeBase", "packing")
+    passages = [passage("s3://kb/a.pdf", 20), passage("s3://kb/b.pdf", 20)]
+
+    packed, stats = packing.pack_context(passages, token_budget=1000)
+
+    assert packed == passages
+    assert stats["truncatedChunks"] == 0
+    assert stats["packedTokens"] == sum(
+        packing.estimate_tokens(p["content"]["text"]) for p in passages
+    )
+
+
+def test_short_chunks_that_fit_are_kept_whole():
+    packing = load_function("QueryKnowledgeBase", "packing")
+    # The second chunk is under MIN_CHUNK_TOKENS and gets no source reserve
+    passages = [passage("s3://kb/a.pdf", 20), passage("s3://kb/a.pdf", 5)]
+    assert packing.estimate_tokens(passages[1]["content"]["text"]) < (
+        packing.MIN_CHUNK_TOKENS
+    )
+
+    packed, stats = packing.pack_context(passages, token_budget=1000)
+
+    assert packed == passages
+    assert stats["droppedChunks"] == 0
+
+
+def test_tails_are_truncated_so_every_source_stays():
+    packing = load_function("QueryKnowledgeBase", "packing")
+    passages = [
+        passage("s3://kb/a.pdf", 300),
+        passage("s3://kb/a.pdf", 300),
+        passage("s3://kb/b.pdf", 300),
+        passage("s3://kb/c.pdf", 300),
+    ]
+
+    packed, stats = packing.pack_context(passages, token_budget=600)
+
+    sources = {p["location"]["s3Location"]["uri"] for p in packed}
+    assert sources == {"s3://kb/a.pdf", "s3://kb/b.pdf", "s3://kb/c.pdf"}
+    assert stats["packedTokens"] <= 600
+    assert all(p["content"]["text"].endswith(packing.TRUNCATION_MARKER) for p in packed)
+    # The best passage gets the leftover budget after every source is reserved
+    assert len(packed[0]["content"]["text"]) > len(packed[-1]["content"]["text"])
+    assert stats["droppedChunks"] == 1
+
+
+def test_truncation_keeps_whole_words():
+    packing = load_function("QueryKnowledgeBase", "packing")
+
+    text = packing.truncate_to_tokens("refundable deposits are returned", 3)
+
+    assert text == "refundable" + packing.TRUNCATION_MARKER
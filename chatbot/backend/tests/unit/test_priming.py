@@ -0,0 +1,90 @@
+import socket
+import threading
+
+import boto3
+import pytest
+
+from chatbot_common import clients, priming
+
+
+@pytest.fixture
+def endpoint():
+    """Local TCP endpoint counting the connections made to it"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    accepted = []
+
+    def accept():
+        while True:
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return
+            accepted.append(connection)
+
+    threading.Thread(target=accept, daemon=True).start()
+    host, port = server.getsockname()
+    yield f"http://{host}:{port}", accepted
+
+    server.close()
+    for connection in accepted:
+        connection.close()
+
+
+@pytest.fixture
+def provisioned(monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_INITIALIZATION_TYPE", "provisioned-concurrency")
+
+
+def test_on_demand_init_is_not_primed(monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_INITIALIZATION_TYPE", "on-demand")
+    s3 = clients.LazyClient("s3")
+
+    assert priming.prime({s3: ["GetObject"]}) is None
+    assert not s3.built
+
+
+def test_primed_client_has_a_connection_ready(provisioned, endpoint):
+    endpoint_url, accepted = endpoint
+    s3 = clients.LazyClient("s3", endpoint_url=endpoint_url)
+
+    summary = priming.prime({s3: ["GetObject"]})
+
+    assert summary["primed"] == ["s3"]
+    assert summary["failed"] == {}
+    assert s3.built
+    for _ in range(50):
+        if accepted:
+            break
+        threading.Event().wait(0.01)
+    assert len(accepted) == 1
+
+
+def test_failures_are_reported_not_raised(provisioned, endpoint):
+    endpoint_url, _ = endpoint
+
+    def warm_cache():
+        raise RuntimeError("store unavailable")
+
+    summary = priming.prime(
+        {boto3.client("s3", endpoint_url=endpoint_url): ["NoSuchOperation"]},
+        warm=[warm_cache],
+    )
+
+    assert summary["primed"] == []
+    assert set(summary["failed"]) == {"s3", "warm_cache"}
+
+
+def test_after_restore_rebuilds_lazy_clients(endpoint):
+    endpoint_url, _ = endpoint
+    s3 = clients.LazyClient("s3", endpoint_url=endpoint_url)
+    primer = priming.Primer({s3: ["GetObject"]})
+    primer.prime()
+    before = s3.get()
+
+    primer.before_snapshot()
+    summary = primer.after_restore()
+
+    assert summary["primed"] == ["s3"]
+    assert s3.get() is not before
@@ -0,0 +1,861 @@
+import json
+
+import boto3
+import pytest
+from botocore.exceptions import ReadTimeoutError
+from botocore.stub import ANY, Stubber
+
+from .conftest import load_function
+
+
+class FakeAgentRuntimeClient:
+    def __init__(self, text="Answer %[1]%", passage="Passage {i}  about   refunds."):
+        self.text = text
+        self.passage = passage
+        self.requests = []
+
+    def retrieve_and_generate(self, **kwargs):
+        self.requests.append(kwargs)
+        return {
+            "sessionId": kwargs.get("sessionId", "session-1"),
+            "output": {"text": self.text},
+            "citations": [
+                {
+                    "retrievedReferences": [
+                        {
+                            "content": {"text": "Refunds take 5 days."},
+                            "location": {
+                                "s3Location": {"uri": "s3://kb-bucket/policy.pdf"}
+                            },
+                            "metadata": {"x-amz-bedrock-kb-document-page-number": 2.0},
+                        }
+                    ]
+                }
+            ],
+        }
+
+    def retrieve_and_generate_stream(self, **kwargs):
+        self.requests.append(kwargs)
+        response = self.retrieve_and_generate(**kwargs)
+        references = response["citations"][0]["retrievedReferences"]
+        return {
+            "sessionId": response["sessionId"],
+            "stream": iter(
+                [
+                    {"output": {"text": "Answer "}},
+                    {"output": {"text": "%[1]%"}},
+                    {"citation": {"retrievedReferences": references}},
+                ]
+            ),
+        }
+
+    def retrieve(self, **kwargs):
+        self.requests.append(kwargs)
+        return {
+            "retrievalResults": [
+                {
+                    "content": {"text": self.passage.format(i=i)},
+                    "location": {"s3Location": {"uri": f"s3://kb-bucket/doc-{i}.pdf"}},
+                    "metadata": {"x-amz-bedrock-kb-document-page-number": float(i)},
+                }
+                for i in range(5)
+            ]
+        }
+
+
+class FakeGenerationClient:
+    def __init__(self):
+        self.requests = []
+
+    def converse(self, **kwargs):
+        self.requests.append(kwargs)
+        return {
+            "output": {
+                "message": {"role": "assistant", "content": [{"text": "Fused [1]"}]}
+            },
+            "usage": {"inputTokens": 120, "outputTokens": 30, "totalTokens": 150},
+        }
+
+    def converse_stream(self, **kwargs):
+        usage = self.converse(**kwargs)["usage"]
+        return {
+            "stream": iter(
+                [
+                    {"messageStart": {"role": "assistant"}},
+                    {"contentBlockDelta": {"delta": {"text": "Fused "}}},
+                    {"contentBlockDelta": {"delta": {"text": "[1]"}}},
+                    {"messageStop": {"stopReason": "end_turn"}},
+                    {"metadata": {"usage": usage}},
+                ]
+            )
+        }
+
+
+class FakeLambdaClient:
+    def __init__(self):
+        self.invocations = []
+
+    def invoke(self, **kwargs):
+        self.invocations.append(kwargs)
+        return {"StatusCode": 202}
+
+
+def chat_event(content, resource="/chat", **extra):
+    body = {"messages": [{"role": "USER", "content": content}], **extra}
+    return {"httpMethod": "POST", "resource": resource, "body": json.dumps(body)}
+
+
+@pytest.fixture
+def query_knowledge_base(monkeypatch, job_store):
+    module = load_function("QueryKnowledgeBase")
+    runtime_client = FakeAgentRuntimeClient()
+    monkeypatch.setattr(
+        module, "get_runtime_client", lambda read_timeout: runtime_client
+    )
+    generation_client = FakeGenerationClient()
+    monkeypatch.setattr(
+        module, "get_generation_client", lambda read_timeout: generation_client
+    )
+    monkeypatch.setattr(module, "LAMBDA_CLIENT", FakeLambdaClient())
+    return module
+
+
+def test_sync_chat_returns_answer(query_knowledge_base, lambda_context):
+    response = query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?"), lambda_context
+    )
+    body = json.loads(response["body"])
+
+    assert response["statusCode"] == 200
+    assert body["assistantMessage"]["content"] == "Answer [1]"
+    assert body["assistantMessage"]["citation"] == [{"page": 2.0, "file": "policy.pdf"}]
+
+
+def test_scoped_chat_filters_retrieval_by_metadata(
+    query_knowledge_base, lambda_context
+):
+    scope = {"documentIds": ["doc-1", "doc-2"], "tags": ["hr", "policy"]}
+    query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?", scope=scope), lambda_context
+    )
+
+    request = query_knowledge_base.get_runtime_client(1).requests[-1]
+    vector_search = request["retrieveAndGenerateConfiguration"][
+        "knowledgeBaseConfiguration"
+    ]["retrievalConfiguration"]["vectorSearchConfiguration"]
+    assert (
+        vector_search["numberOfResults"]
+        == query_knowledge_base.SCOPED_NUMBER_OF_RESULTS
+    )
+    assert vector_search["filter"] == {
+        "andAll": [
+            {"in": {"key": "documentId", "value": ["doc-1", "doc-2"]}},
+            {
+                "orAll": [
+                    {"listContains": {"key": "tags", "value": "hr"}},
+                    {"listContains": {"key": "tags", "value": "policy"}},
+                ]
+            },
+        ]
+    }
+    # Scoped answers depend on the pinned documents, so they are not cached
+    assert query_knowledge_base.ANSWER_CACHE == {}
+
+
+def test_multi_query_generates_from_fused_passages(
+    query_knowledge_base, lambda_context, capsys
+):
+    response = query_knowledge_base.lambda_handler(
+        chat_event(
+            "How long do refunds take? Can I cancel my order online?",
+            multiQuery=True,
+        ),
+        lambda_context,
+    )
+    body = json.loads(response["body"])
+
+    runtime_requests = query_knowledge_base.get_runtime_client(1).requests
+    assert [r["retrievalQuery"]["text"] for r in runtime_requests] == [
+        "How long do refunds take? Can I cancel my order online?",
+        "How long do refunds take",
+        "Can I cancel my order online",
+    ]
+    # Overlapping chunks are fused, only the top-k reach the prompt
+    prompt = query_knowledge_base.get_generation_client(1).requests[-1]["system"][1][
+        "text"
+    ]
+    assert prompt.count("Passage") == 5
+    assert body["assistantMessage"]["content"] == "Fused [1]"
+    assert body["assistantMessage"]["citation"][0] == {"page": 0.0, "file": "doc-0.pdf"}
+    assert body["sessionId"] is None
+
+    # Packed prompt size is published as an EMF metric when the handler returns
+    emf = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert emf["PackedContextTokens"] == [40.0]
+
+
+def test_identifier_question_is_answered_from_keyword_index(
+    query_knowledge_base, lambda_context, monkeypatch
+):
+    from chatbot_common.keyword_index import KeywordIndex, build_index
+
+    index = KeywordIndex(
+        build_index(
+            [
+                {"text": "Part AX-4410 ships in two days.", "uri": "s3://kb/parts.pdf"},
+                {"text": "Refunds take five days.", "uri": "s3://kb/policy.pdf"},
+            ]
+        )
+    )
+    monkeypatch.setattr(query_knowledge_base, "get_keyword_index", lambda: index)
+
+    response = query_knowledge_base.lambda_handler(
+        chat_event("When does AX-4410 ship?"), lambda_context
+    )
+    body = json.loads(response["body"])
+
+    # No vector retrieval or retrieve_and_generate round trip
+    assert query_knowledge_base.get_runtime_client(1).requests == []
+    prompt = query_knowledge_base.get_generation_client(1).requests[-1]["system"][1][
+        "text"
+    ]
+    assert "[1] Part AX-4410 ships in two days." in prompt
+    assert "Refunds" not in prompt
+    assert body["assistantMessage"]["citation"] == [
+        {"page": "Unknown", "file": "parts.pdf"}
+    ]
+
+
+def test_unknown_identifier_falls_through_to_vector_retrieval(
+    query_knowledge_base, lambda_context, monkeypatch
+):
+    from chatbot_common.keyword_index import KeywordIndex, build_index
+
+    index = KeywordIndex(
+        build_index(
+            [
+                {
+                    "text": "When does the refund policy apply?",
+                    "uri": "s3://kb/policy.pdf",
+                }
+            ]
+        )
+    )
+    monkeypatch.setattr(query_knowledge_base, "get_keyword_index", lambda: index)
+
+    query_knowledge_base.lambda_handler(
+        chat_event("When does ZZ-9999 ship?"), lambda_context
+    )
+
+    # Sharing "when" and "does" isn't a match for the identifier
+    assert query_knowledge_base.get_runtime_client(1).requests
+    assert query_knowledge_base.get_generation_client(1).requests == []
+
+
+def test_stub_classifier_routes_generation_model(
+    query_knowledge_base, lambda_context, monkeypatch, capsys
+):
+    router = query_knowledge_base.ModelRouter(
+        {"simple": "micro-arn", "standard": "lite-arn", "complex": "pro-arn"},
+        classifier=lambda features: (
+            "complex" if features["sessionDepth"] else "simple"
+        ),
+    )
+    monkeypatch.setattr(query_knowledge_base, "MODEL_ROUTER", router)
+
+    query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?"), lambda_context
+    )
+    request = query_knowledge_base.get_runtime_client(1).requests[-1]
+    assert (
+        request["retrieveAndGenerateConfiguration"]["knowledgeBaseConfiguration"][
+            "modelArn"
+        ]
+        == "micro-arn"
+    )
+
+    event = chat_event("And for gift cards?", sessionId="session-1")
+    body = json.loads(event["body"])
+    body["messages"] = [
+        {"role": "USER", "content": "How long do refunds take?"},
+        {"role": "ASSISTANT", "content": "Five days."},
+    ] + body["messages"]
+    event["body"] = json.dumps(body)
+    query_knowledge_base.lambda_handler(event, lambda_context)
+
+    request = query_knowledge_base.get_runtime_client(1).requests[-1]
+    assert (
+        request["retrieveAndGenerateConfiguration"]["knowledgeBaseConfiguration"][
+            "modelArn"
+        ]
+        == "pro-arn"
+    )
+
+    # Per-tier latency is published with a ModelTier dimension
+    tiers = [
+        emf["ModelTier"]
+        for emf in map(json.loads, capsys.readouterr().out.strip().splitlines())
+        if "GenerationLatency" in emf
+    ]
+    assert tiers == ["simple", "complex"]
+
+
+# Five of these fill the context past PROMPT_CACHE_MIN_TOKENS
+LONG_PASSAGE = "Passage {i}: " + "refunds are paid back within five days. " * 30
+
+
+def test_converse_caches_retrieved_context_and_history(
+    query_knowledge_base, lambda_context, monkeypatch, capsys
+):
+    runtime_client = FakeAgentRuntimeClient(passage=LONG_PASSAGE)
+    monkeypatch.setattr(
+        query_knowledge_base, "get_runtime_client", lambda read_timeout: runtime_client
+    )
+    # A real client validates the request against the bedrock-runtime model offline
+    runtime = boto3.client(
+        "bedrock-runtime",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    monkeypatch.setattr(
+        query_knowledge_base,
+        "MODEL_ROUTER",
+        query_knowledge_base.ModelRouter(
+            dict.fromkeys(("simple", "standard", "complex"), "nova-lite-arn")
+        ),
+    )
+    cache_point = {"cachePoint": {"type": "default"}}
+    with Stubber(runtime) as stubber:
+        stubber.add_response(
+            "converse",
+            {
+                "output": {
+                    "message": {"role": "assistant", "content": [{"text": "Ten [1]"}]}
+                },
+                "stopReason": "end_turn",
+                "usage": {
+                    "inputTokens": 40,
+                    "outputTokens": 8,
+                    "totalTokens": 1248,
+                    "cacheReadInputTokens": 1200,
+                    "cacheWriteInputTokens": 0,
+                },
+                "metrics": {"latencyMs": 300},
+            },
+            {
+                "modelId": "nova-lite-arn",
+                "system": [
+                    {"text": query_knowledge_base.SYSTEM_PROMPT},
+                    {"text": ANY},
+                    cache_point,
+                ],
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": [{"text": "How long do refunds take?"}],
+                    },
+                    {
+                        "role": "assistant",
+                        "content": [{"text": "Five days."}, cache_point],
+                    },
+                    {
+                        "role": "user",
+                        "content": [{"text": "User question: And for gift cards?"}],
+                    },
+                ],
+                "inferenceConfig": {"maxTokens": 2048},
+            },
+        )
+        monkeypatch.setattr(
+            query_knowledge_base, "get_generation_client", lambda read_timeout: runtime
+        )
+
+        event = chat_event("And for gift cards?", converse=True)
+        body = json.loads(event["body"])
+        body["messages"] = [
+            {"role": "USER", "content": "How long do refunds take?"},
+            {"role": "ASSISTANT", "content": "Five days."},
+        ] + body["messages"]
+        event["body"] = json.dumps(body)
+        response = query_knowledge_base.lambda_handler(event, lambda_context)
+
+        stubber.assert_no_pending_responses()
+
+    assert json.loads(response["body"])["assistantMessage"]["content"] == "Ten [1]"
+    # Follow-ups retrieve with the previous question for context
+    retrieval = runtime_client.requests[-1]
+    assert retrieval["retrievalQuery"]["text"] == (
+        "How long do refunds take? And for gift cards?"
+    )
+
+    # Each metric is its own EMF document
+    emf = {}
+    for line in capsys.readouterr().out.strip().splitlines():
+        emf.update(json.loads(line))
+    assert emf["CacheReadInputTokens"] == [1200.0]
+    assert emf["CacheWriteInputTokens"] == [0.0]
+
+
+def test_converse_messages_alternate_roles(query_knowledge_base):
+    messages = query_knowledge_base.build_converse_messages(
+        [
+            {"role": "ASSISTANT", "content": "Hi, how can I help?"},
+            {"role": "USER", "content": "Refunds?"},
+            {"role": "USER", "content": "For gift cards"},
+        ],
+        "User question: ...",
+        prefix_tokens=query_knowledge_base.PROMPT_CACHE_MIN_TOKENS,
+    )
+
+    assert [message["role"] for message in messages] == ["user", "assistant", "user"]
+    assert messages[0]["content"] == [{"text": "Refunds?"}, {"text": "For gift cards"}]
+    assert messages[1]["content"][-1] == query_knowledge_base.CACHE_POINT
+
+
+class PromptCachingGenerationClient(FakeGenerationClient):
+    """Reports cache reads as Bedrock does, for prefixes up to a cache point
+    an earlier request wrote and long enough to be cached
+    """
+
+    def __init__(self, min_tokens, count_tokens):
+        super().__init__()
+        self.min_tokens = min_tokens
+        self.count_tokens = count_tokens
+        self.cached = set()
+
+    def converse(self, **kwargs):
+        response = super().converse(**kwargs)
+        blocks = [*kwargs["system"]]
+        for message in kwargs["messages"]:
+            blocks.extend(message["content"])
+
+        cache_read = 0
+        for end, block in enumerate(blocks):
+            if "cachePoint" not in block:
+                continue
+            prefix = json.dumps(blocks[:end])
+            tokens = sum(self.count_tokens(b.get("text", "")) for b in blocks[:end])
+            if prefix in self.cached:
+                cache_read = tokens
+            elif tokens >= self.min_tokens:
+                self.cached.add(prefix)
+
+        return {
+            **response,
+            "usage": {**response["usage"], "cacheReadInputTokens": cache_read},
+        }
+
+
+def test_repeated_context_is_read_from_prompt_cache(
+    query_knowledge_base, lambda_context, monkeypatch, capsys
+):
+    runtime_client = FakeAgentRuntimeClient(passage=LONG_PASSAGE)
+    generation_client = PromptCachingGenerationClient(
+        query_knowledge_base.PROMPT_CACHE_MIN_TOKENS,
+        query_knowledge_base.estimate_tokens,
+    )
+    monkeypatch.setattr(
+        query_knowledge_base, "get_runtime_client", lambda read_timeout: runtime_client
+    )
+    monkeypatch.setattr(
+        query_knowledge_base,
+        "get_generation_client",
+        lambda read_timeout: generation_client,
+    )
+
+    for _ in range(2):
+        query_knowledge_base.lambda_handler(
+            chat_event("How long do refunds take?", converse=True), lambda_context
+        )
+
+    emf = [json.loads(line) for line in capsys.readouterr().out.strip().splitlines()]
+    cache_reads = [
+        doc["CacheReadInputTokens"] for doc in emf if "CacheReadInputTokens" in doc
+    ]
+    # The first request writes the instructions and context, the second reads them
+    assert cache_reads[0] == [0.0]
+    assert cache_reads[1][0] >= query_knowledge_base.PROMPT_CACHE_MIN_TOKENS
+
+
+def test_short_prefix_has_no_cache_point(query_knowledge_base, lambda_context):
+    query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?", converse=True), lambda_context
+    )
+
+    request = query_knowledge_base.get_generation_client(1).requests[-1]
+    blocks = [*request["system"]]
+    for message in request["messages"]:
+        blocks.extend(message["content"])
+    assert query_knowledge_base.CACHE_POINT not in blocks
+
+
+def test_precomputed_faq_answer_skips_retrieval(query_knowledge_base, lambda_context):
+    job = {"corpusVersion": "job-1", "queries": ["How long do refunds take?"]}
+    result = query_knowledge_base.lambda_handler(
+        {"precomputeAnswers": job}, lambda_context
+    )
+    assert result == {"corpusVersion": "job-1", "candidates": 1, "answered": 1}
+
+    runtime_client = query_knowledge_base.get_runtime_client(1)
+    requests_before = len(runtime_client.requests)
+    response = query_knowledge_base.lambda_handler(
+        chat_event("how long do  refunds take?"), lambda_context
+    )
+    body = json.loads(response["body"])
+
+    assert len(runtime_client.requests) == requests_before
+    assert body["precomputed"] is True
+    assert body["sessionId"] is None
+    assert body["assistantMessage"]["content"] == "Answer [1]"
+
+    # A new corpus replaces every earlier answer, not just the re-asked ones
+    query_knowledge_base.lambda_handler(
+        {"precomputeAnswers": {"corpusVersion": "job-2", "queries": ["Opening hours"]}},
+        lambda_context,
+    )
+    faq_store = query_knowledge_base.get_faq_store()
+    assert faq_store.get("how long do refunds take?") is None
+    assert faq_store.get("opening hours")["corpusVersion"] == "job-2"
+
+
+def test_faq_precompute_mines_standalone_questions_from_logs(
+    query_knowledge_base, lambda_context, monkeypatch
+):
+    class FakeLogsClient:
+        def start_query(self, **kwargs):
+            self.query_string = kwargs["queryString"]
+            return {"queryId": "query-1"}
+
+        def get_query_results(self, queryId):
+            row = [
+                {"field": "normalizedQuery", "value": "opening hours"},
+                {"field": "asks", "value": "12"},
+            ]
+            return {"status": "Complete", "results": [row]}
+
+    monkeypatch.setenv("AWS_LAMBDA_LOG_GROUP_NAME", "/aws/lambda/chatbot-test")
+    monkeypatch.setattr(query_knowledge_base, "LOGS_CLIENT", FakeLogsClient())
+
+    query_knowledge_base.lambda_handler(
+        {"precomputeAnswers": {"corpusVersion": "job-1"}}, lambda_context
+    )
+
+    request = query_knowledge_base.get_runtime_client(1).requests[-1]
+    assert request["input"]["text"] == "opening hours"
+    assert '"Standalone question"' in query_knowledge_base.LOGS_CLIENT.query_string
+
+
+def follow_up_event(content, session_id, history):
+    event = chat_event(content, sessionId=session_id)
+    body = json.loads(event["body"])
+    body["messages"] = history + body["messages"]
+    event["body"] = json.dumps(body)
+    return event
+
+
+def test_follow_up_is_answered_from_session_working_set(
+    query_knowledge_base, lambda_context
+):
+    query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?"), lambda_context
+    )
+    history = [
+        {"role": "USER", "content": "How long do refunds take?"},
+        {"role": "ASSISTANT", "content": "Answer [1]"},
+    ]
+    runtime_client = query_knowledge_base.get_runtime_client(1)
+    generation_client = query_knowledge_base.get_generation_client(1)
+    assert len(runtime_client.requests) == 1
+
+    response = query_knowledge_base.lambda_handler(
+        follow_up_event("How many days do refunds take?", "session-1", history),
+        lambda_context,
+    )
+    body = json.loads(response["body"])
+
+    # The cited chunk covers the follow-up, no second retrieval
+    assert len(runtime_client.requests) == 1
+    assert "Refunds take 5 days." in generation_client.requests[-1]["system"][1]["text"]
+    assert body["sessionId"] == "session-1"
+    assert body["assistantMessage"]["citation"] == [{"page": 2.0, "file": "policy.pdf"}]
+
+    # The Bedrock session never saw that turn, so misses stay off it
+    response = query_knowledge_base.lambda_handler(
+        follow_up_event("Can I return opened electronics?", "session-1", history),
+        lambda_context,
+    )
+    assert "retrievalQuery" in runtime_client.requests[-1]
+    assert "sessionId" not in runtime_client.requests[-1]
+    assert [m["role"] for m in generation_client.requests[-1]["messages"]] == [
+        "user",
+        "assistant",
+        "user",
+    ]
+    assert json.loads(response["body"])["sessionId"] == "session-1"
+
+
+def test_follow_up_miss_stays_on_bedrock_session(query_knowledge_base, lambda_context):
+    query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?"), lambda_context
+    )
+    history = [
+        {"role": "USER", "content": "How long do refunds take?"},
+        {"role": "ASSISTANT", "content": "Answer [1]"},
+    ]
+
+    query_knowledge_base.lambda_handler(
+        follow_up_event("Can I return opened electronics?", "session-1", history),
+        lambda_context,
+    )
+
+    runtime_client = query_knowledge_base.get_runtime_client(1)
+    assert runtime_client.requests[-1]["sessionId"] == "session-1"
+
+
+def test_async_chat_job_round_trip(query_knowledge_base, lambda_context):
+    response = query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?", sessionId="abc", **{"async": True}),
+        lambda_context,
+    )
+    body = json.loads(response["body"])
+
+    assert response["statusCode"] == 202
+    assert query_knowledge_base.get_runtime_client(1).requests == []
+
+    status_event = {
+        "httpMethod": "POST",
+        "resource": "/chat/status",
+        "body": json.dumps({"jobId": body["jobId"]}),
+    }
+    status = json.loads(
+        query_knowledge_base.lambda_handler(status_event, lambda_context)["body"]
+    )
+    assert status["status"] == "PENDING"
+
+    invocation = query_knowledge_base.LAMBDA_CLIENT.invocations[0]
+    assert invocation["InvocationType"] == "Event"
+    query_knowledge_base.lambda_handler(
+        json.loads(invocation["Payload"]), lambda_context
+    )
+
+    status = json.loads(
+        query_knowledge_base.lambda_handler(status_event, lambda_context)["body"]
+    )
+    assert status["status"] == "SUCCEEDED"
+    assert status["sessionId"] == "abc"
+    assert status["assistantMessage"]["content"] == "Answer [1]"
+
+
+def test_failed_chat_job_is_recorded_not_raised(
+    query_knowledge_base, lambda_context, job_store
+):
+    def fail(**kwargs):
+        raise RuntimeError("model unavailable")
+
+    query_knowledge_base.get_runtime_client(1).retrieve_and_generate = fail
+    job = job_store.create(query_knowledge_base.CHAT_JOB_TYPE)
+
+    query_knowledge_base.lambda_handler(
+        {"jobId": job["jobId"], "request": {"messages": [{"content": "hi"}]}},
+        lambda_context,
+    )
+
+    job = job_store.get(job["jobId"])
+    assert job["status"] == "FAILED"
+    assert job["error"] == "model unavailable"
+
+
+def test_websocket_chat_job_streams_deltas(
+    query_knowledge_base, lambda_context, job_store, connection_pusher
+):
+    job = job_store.create(query_knowledge_base.CHAT_JOB_TYPE)
+
+    query_knowledge_base.lambda_handler(
+        {
+            "jobId": job["jobId"],
+            "request": {"messages": [{"content": "hi"}]},
+            "connectionId": "conn-1",
+        },
+        lambda_context,
+    )
+
+    messages = [message for _, message in connection_pusher.sent]
+    assert [message["type"] for message in messages] == [
+        "chat.delta",
+        "chat.delta",
+        "chat.completed",
+    ]
+    assert "".join(m["text"] for m in messages[:2]) == "Answer %[1]%"
+    assert messages[2]["assistantMessage"]["content"] == "Answer [1]"
+    assert messages[2]["assistantMessage"]["citation"] == [
+        {"page": 2.0, "file": "policy.pdf"}
+    ]
+    assert job_store.get(job["jobId"])["status"] == "SUCCEEDED"
+
+
+def run_websocket_chat_job(query_knowledge_base, lambda_context, job_store, request):
+    job = job_store.create(query_knowledge_base.CHAT_JOB_TYPE)
+    query_knowledge_base.lambda_handler(
+        {"jobId": job["jobId"], "request": request, "connectionId": "conn-1"},
+        lambda_context,
+    )
+
+
+def test_websocket_chat_job_streams_only_the_generation_step(
+    query_knowledge_base, lambda_context, job_store, connection_pusher
+):
+    run_websocket_chat_job(
+        query_knowledge_base,
+        lambda_context,
+        job_store,
+        {
+            "messages": [
+                {
+                    "role": "USER",
+                    "content": "How long do refunds take? Can I cancel online?",
+                }
+            ],
+            "multiQuery": True,
+        },
+    )
+
+    # Retrieved per sub-query and reranked as a sync chat would be
+    assert len(query_knowledge_base.get_runtime_client(1).requests) == 3
+    messages = [message for _, message in connection_pusher.sent]
+    assert [m.get("text") for m in messages[:2]] == ["Fused ", "[1]"]
+    assert messages[2]["type"] == "chat.completed"
+    assert messages[2]["assistantMessage"]["content"] == "Fused [1]"
+    assert messages[2]["assistantMessage"]["citation"][0] == {
+        "page": 0.0,
+        "file": "doc-0.pdf",
+    }
+
+
+def test_websocket_chat_job_answers_faqs_without_generating(
+    query_knowledge_base, lambda_context, job_store, connection_pusher
+):
+    query_knowledge_base.lambda_handler(
+        {
+            "precomputeAnswers": {
+                "corpusVersion": "job-1",
+                "queries": ["How long do refunds take?"],
+            }
+        },
+        lambda_context,
+    )
+    requests_before = len(query_knowledge_base.get_runtime_client(1).requests)
+
+    run_websocket_chat_job(
+        query_knowledge_base,
+        lambda_context,
+        job_store,
+        {"messages": [{"role": "USER", "content": "How long do refunds take?"}]},
+    )
+
+    assert len(query_knowledge_base.get_runtime_client(1).requests) == requests_before
+    ((_, message),) = connection_pusher.sent
+    assert message["type"] == "chat.completed"
+    assert message["precomputed"] is True
+
+
+def test_generation_timeout_falls_back_to_retrieved_passages(
+    query_knowledge_base, lambda_context
+):
+    runtime_client = query_knowledge_base.get_runtime_client(1)
+
+    def timeout(**kwargs):
+        raise ReadTimeoutError(endpoint_url="https://bedrock")
+
+    runtime_client.retrieve_and_generate = timeout
+
+    response = query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?", sessionId="abc"), lambda_context
+    )
+    body = json.loads(response["body"])
+
+    assert response["statusCode"] == 200
+    assert body["fallback"] is True
+    assert body["sessionId"] == "abc"
+    assert "Passage 0 about refunds." in body["assistantMessage"]["content"]
+    assert body["assistantMessage"]["citation"] == [
+        {"page": 0.0, "file": "doc-0.pdf"},
+        {"page": 1.0, "file": "doc-1.pdf"},
+        {"page": 2.0, "file": "doc-2.pdf"},
+    ]
+    assert runtime_client.requests[-1]["retrievalQuery"] == {
+        "text": "How long do refunds take?"
+    }
+
+
+def test_generation_timeout_leaves_room_for_fallback(query_knowledge_base, monkeypatch):
+    timeouts = []
+    runtime_client = FakeAgentRuntimeClient()
+
+    def get_runtime_client(read_timeout):
+        timeouts.append(read_timeout)
+        return runtime_client
+
+    monkeypatch.setattr(query_knowledge_base, "get_runtime_client", get_runtime_client)
+    deadline = query_knowledge_base.Deadline(20000)
+
+    query_knowledge_base.run_chat({"messages": [{"content": "hi"}]}, deadline)
+
+    assert timeouts == [20 - query_knowledge_base.FALLBACK_RESERVE_SECONDS - 1]
+
+
+def test_open_breaker_serves_cached_answer(query_knowledge_base, lambda_context):
+    event = chat_event("How long do refunds take?")
+    query_knowledge_base.lambda_handler(event, lambda_context)
+
+    breaker = query_knowledge_base.BEDROCK_CALLER.breaker
+    for _ in range(breaker.throttle_threshold):
+        breaker.record_throttle()
+
+    response = query_knowledge_base.lambda_handler(
+        chat_event("how long do   refunds take?"), lambda_context
+    )
+    body = json.loads(response["body"])
+
+    assert body["cached"] is True
+    assert body["sessionId"] is None
+    assert body["assistantMessage"]["content"] == "Answer [1]"
+
+    # No cached answer for follow-ups, fall back to retrieved passages instead
+    response = query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?", sessionId="abc"), lambda_context
+    )
+    assert json.loads(response["body"])["fallback"] is True
+
+
+def test_traces_chat_pipeline_stages(query_knowledge_base, lambda_context, trace):
+    spans = trace(query_knowledge_base)
+
+    query_knowledge_base.lambda_handler(
+        chat_event("How long do refunds take?"), lambda_context
+    )
+
+    assert spans.span_names() == [
+        "## parse",
+        "## faq_lookup",
+        "## retrieve_and_generate",
+        "## format",
+        "## serialize",
+        "## lambda_handler",
+    ]
+    assert spans.find("## lambda_handler").annotations["FaqHit"] is False
+    assert spans.find("## format").annotations["RetrievedReferences"] == 1
+
+    query_knowledge_base.lambda_handler(
+        chat_event(
+            "How long do refunds take? Can I cancel my order online?",
+            multiQuery=True,
+        ),
+        lambda_context,
+    )
+
+    stages = spans.span_names()[6:]
+    assert stages.index("## retrieve") < stages.index("## rerank")
+    assert stages.index("## rerank") < stages.index("## generate")
+    assert stages.index("## generate") < stages.index("## format")
+    assert spans.find("## lambda_handler").annotations["RetrievedChunks"] == 15
@@ -0,0 +1,47 @@
+from .conftest import load_function
+
+
+def chunk(text):
+    return {"content": {"text": text}, "location": {"s3Location": {"uri": "s3://kb/a"}}}
+
+
+def test_lexical_match_is_promoted():
+    rerank = load_function("QueryKnowledgeBase", "rerank")
+    results = [
+        chunk("Our office opens at nine and closes at five on weekdays."),
+        chunk("Refunds are issued within five business days of the return."),
+    ]
+
+    reranked = rerank.rerank("How long do refunds take?", results, token_budget=1000)
+
+    assert reranked[0]["content"]["text"].startswith("Refunds")
+    assert reranked[0]["rerankScore"] > reranked[1]["rerankScore"]
+
+
+def test_near_duplicates_are_dropped():
+    rerank = load_function("QueryKnowledgeBase", "rerank")
+    text = "Refunds are issued within five business days of the return being received."
+    results = [chunk(text), chunk(text + " Thanks."), chunk("Shipping is free.")]
+
+    reranked = rerank.rerank("refunds", results, token_budget=1000)
+
+    assert [r["content"]["text"] for r in reranked] == [text, "Shipping is free."]
+
+
+def test_token_budget_limits_kept_chunks():
+    rerank = load_function("QueryKnowledgeBase", "rerank")
+    results = [chunk(f"refund policy section {i} " + "word " * 100) for i in range(5)]
+
+    reranked = rerank.rerank("refund policy", results, token_budget=300)
+
+    assert len(reranked) == 2
+    assert sum(rerank.estimate_tokens(r["content"]["text"]) for r in reranked) <= 300
+
+
+def test_term_token_estimate_matches_packing_without_punctuation():
+    rerank = load_function("QueryKnowledgeBase", "rerank")
+    text = "Refunds for internationalisation orders take five business days"
+
+    assert rerank.estimate_term_tokens(rerank.tokenize(text)) == (
+        rerank.estimate_tokens(text)
+    )
@@ -0,0 +1,186 @@
+import random
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from .conftest import load_function
+
+resilience = load_function("QueryKnowledgeBase", "resilience")
+deadline = load_function("QueryKnowledgeBase", "deadline")
+
+
+class StubRuntimeClient:
+    """Sleeps for latencies drawn from an injected distribution, in milliseconds"""
+
+    def __init__(self, latencies_ms, throttle=False):
+        self._latencies = iter(latencies_ms)
+        self.throttle = throttle
+        self.calls = 0
+
+    def retrieve_and_generate(self, **kwargs):
+        self.calls += 1
+        time.sleep(next(self._latencies) / 1000)
+
+        if self.throttle:
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "slow down"}},
+                "RetrieveAndGenerate",
+            )
+        return {"call": self.calls}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    caller = resilience.HedgedCaller(default_hedge_delay_seconds=0.02)
+    client = StubRuntimeClient([300, 5])
+
+    result = caller.call(client.retrieve_and_generate)
+
+    assert result == {"call": 2}
+    assert caller.stats()["hedgesFired"] == 1
+    assert caller.stats()["hedgesWon"] == 1
+
+
+def test_fast_primary_is_not_hedged():
+    caller = resilience.HedgedCaller(default_hedge_delay_seconds=0.2)
+    client = StubRuntimeClient([5])
+
+    caller.call(client.retrieve_and_generate)
+
+    assert client.calls == 1
+    assert caller.stats()["hedgesFired"] == 0
+
+
+def test_slow_calls_give_up_at_the_deadline():
+    caller = resilience.HedgedCaller(
+        default_hedge_delay_seconds=0.02, min_hedge_budget_seconds=0.05
+    )
+    client = StubRuntimeClient([500, 500])
+
+    started = time.monotonic()
+    with pytest.raises(resilience.DeadlineExceededError):
+        caller.call(
+            client.retrieve_and_generate,
+            deadline=deadline.Deadline(150),
+            reserve_seconds=0.05,
+        )
+
+    assert time.monotonic() - started < 0.3
+    assert caller.stats()["hedgesFired"] == 1
+
+
+def test_no_hedge_with_less_than_the_minimum_budget_left():
+    caller = resilience.HedgedCaller(default_hedge_delay_seconds=0.02)
+    client = StubRuntimeClient([100, 5])
+
+    result = caller.call(client.retrieve_and_generate, deadline=deadline.Deadline(1000))
+
+    assert result == {"call": 1}
+    assert client.calls == 1
+    assert caller.stats()["hedgesFired"] == 0
+
+
+def test_hedge_fires_under_the_production_read_timeout():
+    caller = resilience.HedgedCaller(default_hedge_delay_seconds=0.5)
+    client = StubRuntimeClient([1000, 5])
+    hedge_timeouts = []
+
+    def with_timeout(timeout_seconds):
+        hedge_timeouts.append(timeout_seconds)
+        return client.retrieve_and_generate
+
+    # As query_knowledge_base sizes it, from a sync chat's deadline
+    call_deadline = deadline.Deadline(27500)
+    read_timeout = call_deadline.timeout_seconds(4)
+    result = caller.call(
+        client.retrieve_and_generate,
+        deadline=call_deadline,
+        reserve_seconds=4,
+        with_timeout=with_timeout,
+    )
+
+    assert read_timeout == 23
+    assert result == {"call": 2}
+    assert caller.stats()["hedgesFired"] == 1
+    # The hedge's read timeout is what's left after the hedge delay
+    assert hedge_timeouts == [22]
+
+
+def test_hedge_delay_tracks_latency_percentile():
+    caller = resilience.HedgedCaller(
+        hedge_percentile=90, min_samples=10, min_hedge_delay_seconds=0.001
+    )
+    rng = random.Random(7)
+    latencies = [rng.lognormvariate(0, 0.5) for _ in range(200)]
+    for latency in latencies:
+        caller.latencies.record(latency)
+
+    recent = sorted(latencies[-100:])
+    assert caller.hedge_delay() == recent[90]
+
+
+def test_only_tail_latency_calls_are_hedged():
+    # Long tailed distribution: most calls 2ms, one in ten 200ms
+    latencies = ([2] * 9 + [200]) * 3 + [2] * 40
+    client = StubRuntimeClient(latencies)
+    caller = resilience.HedgedCaller(
+        hedge_percentile=80, min_samples=10, min_hedge_delay_seconds=0.03
+    )
+
+    for _ in range(30):
+        caller.call(client.retrieve_and_generate)
+
+    stats = caller.stats()
+    assert 1 <= stats["hedgesFired"] <= 3
+    assert stats["hedgesWon"] == stats["hedgesFired"]
+
+
+def test_breaker_trips_on_consecutive_throttles_and_recovers():
+    clock = FakeClock()
+    breaker = resilience.CircuitBreaker(
+        throttle_threshold=3, cooldown_seconds=10, clock=clock
+    )
+    caller = resilience.HedgedCaller(breaker=breaker)
+    throttled = StubRuntimeClient([0] * 10, throttle=True)
+
+    for _ in range(3):
+        with pytest.raises(ClientError):
+            caller.call(throttled.retrieve_and_generate, hedge=False)
+    assert caller.stats()["breakerState"] == "OPEN"
+
+    with pytest.raises(resilience.CircuitOpenError):
+        caller.call(throttled.retrieve_and_generate, hedge=False)
+    assert throttled.calls == 3
+    assert caller.stats()["shortCircuits"] == 1
+
+    clock.now = 10
+    assert caller.stats()["breakerState"] == "HALF_OPEN"
+    healthy = StubRuntimeClient([0])
+    caller.call(healthy.retrieve_and_generate, hedge=False)
+    assert caller.stats()["breakerState"] == "CLOSED"
+
+
+def test_half_open_trial_throttle_reopens_breaker():
+    clock = FakeClock()
+    breaker = resilience.CircuitBreaker(
+        throttle_threshold=1, cooldown_seconds=10, clock=clock
+    )
+    caller = resilience.HedgedCaller(breaker=breaker)
+    throttled = StubRuntimeClient([0] * 10, throttle=True)
+
+    with pytest.raises(ClientError):
+        caller.call(throttled.retrieve_and_generate, hedge=False)
+
+    clock.now = 10
+    with pytest.raises(ClientError):
+        caller.call(throttled.retrieve_and_generate, hedge=False)
+
+    assert caller.stats()["breakerState"] == "OPEN"
@@ -0,0 +1,31 @@
+from .conftest import load_function
+
+
+def test_lookups_route_small_and_synthesis_routes_large():
+    routing = load_function("QueryKnowledgeBase", "routing")
+    router = routing.ModelRouter(
+        {"simple": "micro", "standard": "lite", "complex": "pro"}
+    )
+
+    assert router.route("What is the refund window?") == ("simple", "micro")
+    assert router.route("Summarize the travel policy") == ("standard", "lite")
+    assert router.route(
+        "Compare the refund and exchange policies and explain why they differ?",
+        session_depth=5,
+        source_count=4,
+    ) == ("complex", "pro")
+
+
+def test_unconfigured_tiers_fall_back_to_larger_model_then_default():
+    routing = load_function("QueryKnowledgeBase", "routing")
+
+    assert routing.load_model_tiers('{"simple": "micro"}', "lite") == {
+        "simple": "micro",
+        "standard": "lite",
+        "complex": "lite",
+    }
+    assert routing.load_model_tiers(None, "lite") == {
+        "simple": "lite",
+        "standard": "lite",
+        "complex": "lite",
+    }
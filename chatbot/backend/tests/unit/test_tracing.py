@@ -0,0 +1,39 @@
+import pytest
+
+from chatbot_common.tracing import InMemoryProvider
+
+
+def test_nested_spans_record_parent_and_annotations():
+    provider = InMemoryProvider()
+
+    with provider.in_subsegment("## handler") as handler:
+        with provider.in_subsegment("## retrieve"):
+            provider.put_annotation("RetrievedChunks", 3)
+        provider.put_annotation("CacheHit", False)
+
+    retrieve = provider.find("## retrieve")
+    assert provider.span_names() == ["## retrieve", "## handler"]
+    assert retrieve.parent is handler
+    assert retrieve.annotations == {"RetrievedChunks": 3}
+    assert handler.annotations == {"CacheHit": False}
+    assert handler.duration_ms >= retrieve.duration_ms
+
+
+def test_failed_span_keeps_exception():
+    provider = InMemoryProvider()
+
+    with pytest.raises(ValueError):
+        with provider.in_subsegment("## generate"):
+            raise ValueError("throttled")
+
+    assert str(provider.find("## generate").exceptions[0]) == "throttled"
+
+
+def test_keeps_most_recent_spans():
+    provider = InMemoryProvider(max_spans=2)
+
+    for name in ("## a", "## b", "## c"):
+        with provider.in_subsegment(name):
+            pass
+
+    assert provider.span_names() == ["## b", "## c"]
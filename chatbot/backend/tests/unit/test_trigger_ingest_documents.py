@@ -0,0 +1,244 @@
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+from botocore.exceptions import ClientError
+
+from .conftest import load_function
+
+
+class FakePaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        return iter([{"documentDetails": self.client.snapshots[self.client.polls]}])
+
+
+class FakeBedrockAgentClient:
+    """Serves one document listing snapshot per ingestion job poll"""
+
+    def __init__(self, snapshots, job_statuses):
+        self.snapshots = snapshots
+        self.job_statuses = job_statuses
+        self.polls = 0
+
+    def get_paginator(self, name):
+        return FakePaginator(self)
+
+    def get_ingestion_job(self, **kwargs):
+        status = self.job_statuses[self.polls]
+        self.polls += 1
+        return {"ingestionJob": {"status": status}}
+
+    def start_ingestion_job(self, **kwargs):
+        return {"ingestionJob": {"ingestionJobId": "job-1", "status": "STARTING"}}
+
+
+def document(key, status):
+    return {"identifier": {"s3": {"uri": f"s3://kb-bucket/{key}"}}, "status": status}
+
+
+@pytest.fixture
+def trigger_ingest(monkeypatch, connection_pusher):
+    module = load_function("TriggerIngestDocumentsKnowledgeBase")
+    monkeypatch.setattr(module, "INGESTION_POLL_INTERVAL_SECONDS", 0)
+    return module
+
+
+def test_watch_pushes_only_status_transitions(
+    trigger_ingest, connection_registry, connection_pusher, lambda_context, monkeypatch
+):
+    connection_registry.subscribe("conn-1", ["documents"])
+    agent = FakeBedrockAgentClient(
+        snapshots=[
+            [document("a.pdf", "STARTING"), document("b.pdf", "INDEXED")],
+            [document("a.pdf", "IN_PROGRESS"), document("b.pdf", "INDEXED")],
+            [document("a.pdf", "INDEXED"), document("b.pdf", "INDEXED")],
+        ],
+        job_statuses=["IN_PROGRESS", "COMPLETE"],
+    )
+    monkeypatch.setattr(trigger_ingest, "BEDROCK_AGENT_CLIENT", agent)
+    # Seeded as the ingestion started, when only b.pdf existed
+    trigger_ingest.save_document_statuses("job-1", {"s3://kb-bucket/b.pdf": "INDEXED"})
+
+    trigger_ingest.lambda_handler({"ingestionJobId": "job-1"}, lambda_context)
+
+    pushed = [
+        (message.get("s3Key"), message["status"])
+        for _, message in connection_pusher.sent
+    ]
+    assert pushed == [
+        ("s3://kb-bucket/a.pdf", "STARTING"),
+        ("s3://kb-bucket/a.pdf", "IN_PROGRESS"),
+        ("s3://kb-bucket/a.pdf", "INDEXED"),
+        (None, "COMPLETE"),
+    ]
+
+
+class FakeS3VectorsClient:
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, **kwargs):
+        return iter(
+            [
+                {
+                    "vectors": [
+                        {
+                            "key": "vec-1",
+                            "metadata": {
+                                "AMAZON_BEDROCK_TEXT": "Part AX-4410 ships in two days.",
+                                "x-amz-bedrock-kb-source-uri": "s3://kb-bucket/parts.pdf",
+                                "x-amz-bedrock-kb-document-page-number": 3.0,
+                            },
+                        }
+                    ]
+                }
+            ]
+        )
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket):
+        uploaded = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        contents = [
+            {"Key": key, "LastModified": uploaded}
+            for bucket, key in self.objects
+            if bucket == Bucket
+        ]
+        return iter([{"Contents": contents}])
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+def test_completed_ingestion_rebuilds_keyword_index(
+    trigger_ingest, lambda_context, monkeypatch
+):
+    from chatbot_common.keyword_index import KEYWORD_INDEX_KEY, KeywordIndex
+
+    s3_client = FakeS3Client()
+    monkeypatch.setattr(trigger_ingest, "KEYWORD_INDEX_BUCKET", "index-bucket")
+    monkeypatch.setattr(trigger_ingest, "S3_CLIENT", s3_client)
+    monkeypatch.setattr(trigger_ingest, "S3_VECTORS_CLIENT", FakeS3VectorsClient())
+    monkeypatch.setattr(
+        trigger_ingest,
+        "BEDROCK_AGENT_CLIENT",
+        FakeBedrockAgentClient(snapshots=[[], []], job_statuses=["COMPLETE"]),
+    )
+
+    trigger_ingest.lambda_handler({"ingestionJobId": "job-1"}, lambda_context)
+
+    index = KeywordIndex(s3_client.objects[("index-bucket", KEYWORD_INDEX_KEY)])
+    (result,) = index.search("AX-4410", top_k=5)
+    assert result["metadata"]["x-amz-bedrock-kb-chunk-id"] == "vec-1"
+    assert result["metadata"]["x-amz-bedrock-kb-document-page-number"] == 3.0
+
+
+class FakeLambdaClient:
+    def __init__(self):
+        self.invocations = []
+
+    def invoke(self, **kwargs):
+        self.invocations.append(kwargs)
+        return {"StatusCode": 202}
+
+
+def test_completed_ingestion_starts_faq_precompute(
+    trigger_ingest, lambda_context, monkeypatch
+):
+    lambda_client = FakeLambdaClient()
+    monkeypatch.setattr(trigger_ingest, "QUERY_FUNCTION_NAME", "chatbot-query")
+    monkeypatch.setattr(trigger_ingest, "LAMBDA_CLIENT", lambda_client)
+    monkeypatch.setattr(
+        trigger_ingest,
+        "BEDROCK_AGENT_CLIENT",
+        FakeBedrockAgentClient(snapshots=[[], []], job_statuses=["COMPLETE"]),
+    )
+
+    trigger_ingest.lambda_handler({"ingestionJobId": "job-1"}, lambda_context)
+
+    (invocation,) = lambda_client.invocations
+    assert invocation["FunctionName"] == "chatbot-query"
+    assert invocation["InvocationType"] == "Event"
+    assert json.loads(invocation["Payload"]) == {
+        "precomputeAnswers": {"corpusVersion": "job-1"}
+    }
+
+
+def test_watch_hand_off_carries_only_the_job_id(
+    trigger_ingest, lambda_context, monkeypatch
+):
+    s3_client = FakeS3Client()
+    lambda_client = FakeLambdaClient()
+    monkeypatch.setattr(trigger_ingest, "KEYWORD_INDEX_BUCKET", "index-bucket")
+    monkeypatch.setattr(trigger_ingest, "S3_CLIENT", s3_client)
+    monkeypatch.setattr(trigger_ingest, "LAMBDA_CLIENT", lambda_client)
+    monkeypatch.setattr(
+        trigger_ingest,
+        "BEDROCK_AGENT_CLIENT",
+        FakeBedrockAgentClient(
+            snapshots=[[document("a.pdf", "IN_PROGRESS")]],
+            job_statuses=["IN_PROGRESS"],
+        ),
+    )
+    monkeypatch.setattr(lambda_context, "remaining_time_in_millis", 0)
+
+    trigger_ingest.lambda_handler({"ingestionJobId": "job-1"}, lambda_context)
+
+    (invocation,) = lambda_client.invocations
+    assert json.loads(invocation["Payload"]) == {"ingestionJobId": "job-1"}
+    assert trigger_ingest.load_document_statuses("job-1") == {
+        "s3://kb-bucket/a.pdf": "IN_PROGRESS"
+    }
+
+
+def test_sync_request_hands_everything_but_the_job_start_to_the_watch(
+    trigger_ingest, lambda_context, monkeypatch
+):
+    s3_client = FakeS3Client()
+    s3_client.put_object(Bucket="kb-bucket", Key="a.pdf", Body=b"%PDF")
+    lambda_client = FakeLambdaClient()
+    monkeypatch.setattr(trigger_ingest, "KNOWLEDGE_BASE_BUCKET", "kb-bucket")
+    monkeypatch.setattr(trigger_ingest, "S3_CLIENT", s3_client)
+    monkeypatch.setattr(trigger_ingest, "LAMBDA_CLIENT", lambda_client)
+    monkeypatch.setattr(
+        trigger_ingest,
+        "BEDROCK_AGENT_CLIENT",
+        FakeBedrockAgentClient(
+            snapshots=[[document("a.pdf", "INDEXED")]] * 2,
+            job_statuses=["COMPLETE"],
+        ),
+    )
+
+    response = trigger_ingest.lambda_handler(
+        {"httpMethod": "POST", "resource": "/documents/sync"}, lambda_context
+    )
+    assert response["statusCode"] == 200
+    # No sidecar written or status listed before the response
+    assert list(s3_client.objects) == [("kb-bucket", "a.pdf")]
+    assert trigger_ingest.load_document_statuses("job-1") == {}
+
+    (invocation,) = lambda_client.invocations
+    watch_event = json.loads(invocation["Payload"])
+    assert watch_event == {"ingestionJobId": "job-1", "prepare": True}
+
+    trigger_ingest.lambda_handler(watch_event, lambda_context)
+
+    assert ("kb-bucket", "a.pdf.metadata.json") in s3_client.objects
+    assert trigger_ingest.load_document_statuses("job-1") == {
+        "s3://kb-bucket/a.pdf": "INDEXED"
+    }
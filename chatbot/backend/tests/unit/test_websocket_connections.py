@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from .conftest import load_function
+
+
+class FakeLambdaClient:
+    def __init__(self):
+        self.invocations = []
+
+    def invoke(self, **kwargs):
+        self.invocations.append(kwargs)
+        return {"StatusCode": 202}
+
+
+def websocket_event(route_key, connection_id="conn-1", body=None):
+    event = {"requestContext": {"routeKey": route_key, "connectionId": connection_id}}
+    if body is not None:
+        event["body"] = json.dumps(body)
+    return event
+
+
+@pytest.fixture
+def websocket_connections(monkeypatch, job_store, connection_pusher):
+    monkeypatch.setenv(
+        "QUERY_KNOWLEDGE_BASE_FUNCTION_NAME", "chatbot-QueryKnowledgeBase"
+    )
+    module = load_function("WebSocketConnections")
+    monkeypatch.setattr(module, "LAMBDA_CLIENT", FakeLambdaClient())
+    return module
+
+
+def test_connect_subscribe_disconnect(
+    websocket_connections, connection_registry, lambda_context
+):
+    websocket_connections.lambda_handler(websocket_event("$connect"), lambda_context)
+    websocket_connections.lambda_handler(
+        websocket_event(
+            "$default", body={"action": "subscribe", "topics": ["documents", "other"]}
+        ),
+        lambda_context,
+    )
+    assert connection_registry.subscribers("documents") == ["conn-1"]
+    assert connection_registry.subscribers("other") == []
+
+    websocket_connections.lambda_handler(websocket_event("$disconnect"), lambda_context)
+    assert connection_registry.subscribers("documents") == []
+
+
+def test_chat_message_starts_streamed_job(
+    websocket_connections, connection_pusher, job_store, lambda_context
+):
+    body = {
+        "action": "chat",
+        "messages": [{"role": "USER", "content": "hi"}],
+        "sessionId": "abc",
+    }
+    response = websocket_connections.lambda_handler(
+        websocket_event("$default", body=body), lambda_context
+    )
+    assert response["statusCode"] == 200
+
+    invocation = websocket_connections.LAMBDA_CLIENT.invocations[0]
+    payload = json.loads(invocation["Payload"])
+    assert invocation["FunctionName"] == "chatbot-QueryKnowledgeBase"
+    assert invocation["InvocationType"] == "Event"
+    assert payload["connectionId"] == "conn-1"
+    assert payload["request"]["sessionId"] == "abc"
+
+    assert connection_pusher.sent == [
+        ("conn-1", {"type": "chat.accepted", "jobId": payload["jobId"]})
+    ]
+    assert job_store.get(payload["jobId"])["status"] == "PENDING"
+
+
+def test_unknown_action_is_rejected(websocket_connections, lambda_context):
+    response = websocket_connections.lambda_handler(
+        websocket_event("$default", body={"action": "nope"}), lambda_context
+    )
+    assert response["statusCode"] == 400
@@ -0,0 +1,49 @@
+import pytest
+
+from .conftest import load_function
+
+
+@pytest.fixture(scope="module")
+def working_set():
+    return load_function("QueryKnowledgeBase", "working_set")
+
+
+def chunk(text, chunk_id):
+    return {
+        "content": {"text": text},
+        "metadata": {"x-amz-bedrock-kb-chunk-id": chunk_id},
+    }
+
+
+def test_coverage_counts_content_terms_only(working_set):
+    chunks = [chunk("Gift cards are refunded as store credit.", "c1")]
+
+    assert working_set.coverage("And what about gift cards?", chunks) == 1.0
+    assert working_set.coverage("Gift card expiry dates?", chunks) == 0.25
+    # Nothing new to look up, the chunks in hand are what the user means
+    assert working_set.coverage("Why?", chunks) == 1.0
+
+
+def test_merge_keeps_recent_first_and_bounded(working_set):
+    existing = [chunk(f"Old {i}", f"c{i}") for i in range(3)]
+    recent = [chunk("Old 2", "c2"), chunk("New", "c9")]
+
+    merged = working_set.merge_chunks(recent, existing, size=3)
+
+    assert [c["metadata"]["x-amz-bedrock-kb-chunk-id"] for c in merged] == [
+        "c2",
+        "c9",
+        "c0",
+    ]
+
+
+def test_expired_working_set_is_gone(working_set, monkeypatch):
+    store = working_set.InMemoryWorkingSetStore()
+    store.put("session-1", [chunk("Refunds take 5 days.", "c1")])
+    assert store.get("session-1")["chunks"][0]["metadata"] == {
+        "x-amz-bedrock-kb-chunk-id": "c1"
+    }
+
+    later = working_set.now() + working_set.WORKING_SET_TTL_SECONDS + 1
+    monkeypatch.setattr(working_set, "now", lambda: later)
+    assert store.get("session-1") is None
@@ -0,0 +1,39 @@
+"""Local runners that drive the Lambda functions outside Lambda
+
+Run from chatbot/backend, e.g. python -m tools.ask_batch questions.txt
+"""
+
+import importlib.util
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.join(BACKEND_DIR, "lambda", "functions")
+COMMON_LAYER_DIR = os.path.join(
+    BACKEND_DIR, "lambda", "layers", "ChatbotCommon", "python"
+)
+
+if COMMON_LAYER_DIR not in sys.path:
+    sys.path.insert(0, COMMON_LAYER_DIR)
+
+
+def load_function(name, module_name="lambda_function"):
+    """Import lambda/functions/<name>/<module_name>.py under a unique module name"""
+    function_dir = os.path.join(FUNCTIONS_DIR, name)
+
+    # Sibling modules are imported by bare name, drop any left over from another function
+    for file_name in os.listdir(function_dir):
+        if file_name.endswith(".py") and file_name != f"{module_name}.py":
+            sys.modules.pop(file_name[:-3], None)
+
+    sys.path.insert(0, function_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            f"{name}.{module_name}", os.path.join(function_dir, f"{module_name}.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(function_dir)
+
+    return module
@@ -0,0 +1,111 @@
+"""Answer a list of questions through the QueryKnowledgeBase pipeline, NDJSON out
+
+Calls the pipeline in process with bounded concurrency instead of looping
+over /chat, so a batch isn't held to the API stage throttle. Uses the local
+AWS credentials and the same environment variables as the deployed function.
+
+Run from chatbot/backend:
+
+    KNOWLEDGE_BASE_ID=... MODEL_ARN=... python -m tools.ask_batch questions.txt > answers.ndjson
+
+Questions are one per line, or JSON lines with a "question" field. Each
+answer is written as one JSON line as soon as it finishes, with its latency.
+"""
+
+import argparse
+import contextlib
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tools import load_function
+
+DEFAULT_CONCURRENCY = 4
+# Matches what /chat gets from API Gateway
+QUESTION_BUDGET_MS = 29000
+
+
+def read_questions(lines):
+    questions = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        questions.append(json.loads(line)["question"] if line[0] == "{" else line)
+    return questions
+
+
+def run_batch(questions, answer, concurrency=DEFAULT_CONCURRENCY):
+    """Yield one record per question in completion order, at most concurrency in flight"""
+
+    def timed_answer(index, question):
+        started = time.perf_counter()
+        record = {"index": index, "question": question}
+        try:
+            record["response"] = answer(question)
+        except Exception as e:
+            record["error"] = str(e)
+        record["latencyMs"] = round((time.perf_counter() - started) * 1000, 1)
+        return record
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(timed_answer, index, question)
+            for index, question in enumerate(questions)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def summarize(records):
+    latencies = sorted(record["latencyMs"] for record in records)
+    if not latencies:
+        return {"questions": 0}
+
+    return {
+        "questions": len(latencies),
+        "errors": sum(1 for record in records if "error" in record),
+        "p50Ms": statistics.median(latencies),
+        "p95Ms": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        "maxMs": latencies[-1],
+    }
+
+
+def make_answer(query_knowledge_base):
+    """Ask one standalone question the way /chat would"""
+
+    def answer(question):
+        request_body = {"messages": [{"role": "USER", "content": question}]}
+        deadline = query_knowledge_base.Deadline(QUESTION_BUDGET_MS)
+        return query_knowledge_base.run_chat(request_body, deadline)
+
+    return answer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", type=argparse.FileType("r"))
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    questions = read_questions(args.questions)
+    output = sys.stdout
+
+    # The function logs and publishes EMF metrics on stdout, keep it for answers
+    with contextlib.redirect_stdout(sys.stderr):
+        query_knowledge_base = load_function("QueryKnowledgeBase")
+        records = []
+        for record in run_batch(
+            questions, make_answer(query_knowledge_base), args.concurrency
+        ):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            records.append(record)
+
+    print(json.dumps(summarize(records)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Build each function's bundled asset and report its size against the shared layers
+
+Runs the same bundling step ApiGatewayStack uses at synth, into a scratch
+directory, and prints what each function would ship: total size, module
+count, the services whose models it carries and the largest packages.
+Byte-compiles with the runtime's interpreter (python3.12) when it's
+installed.
+
+Run from chatbot/backend:
+
+    python -m tools.bundle [ListDocuments ...] [--json] [--out DIR]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+from stacks import bundling
+from tools import FUNCTIONS_DIR
+from tools.init_profile import function_names
+
+RUNTIME_INTERPRETER = "python3.12"
+
+
+def layers_size():
+    return sum(
+        bundling.directory_size(layer_dir)[1] for layer_dir in bundling.SEARCH_PATH
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("functions", nargs="*", help="default: every function")
+    parser.add_argument("--json", action="store_true", help="one JSON line each")
+    parser.add_argument(
+        "--out", help="keep the bundles here instead of discarding them"
+    )
+    parser.add_argument("--interpreter", default=RUNTIME_INTERPRETER)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        out_dir = args.out or scratch_dir
+        if not args.json:
+            print(f"shared layers: {bundling.format_size(layers_size())}")
+
+        for name in args.functions or function_names():
+            report = bundling.bundle_function(
+                os.path.join(FUNCTIONS_DIR, name),
+                os.path.join(out_dir, name),
+                args.interpreter,
+            )
+            print(json.dumps(report) if args.json else bundling.format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Record botocore HTTP exchanges once and replay them without AWS
+
+A cassette patches botocore.httpsession.URLLib3Session.send, below signing,
+retries and parsing, so every client in the process goes through it with
+the real wire payloads. Recording sends each request to AWS and saves the
+request, the response and how long it took to a JSON file, with
+credentials, signatures and account ids redacted. Replaying answers each
+request from the file, in recorded order per endpoint, and never opens a
+connection. With latency_scale above 0 each replayed response waits its
+recorded time, scaled.
+
+    with Cassette("tests/cassettes/list_documents.json", record=True):
+        lambda_function.lambda_handler(event, context)
+"""
+
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from io import BytesIO
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from botocore.awsrequest import AWSResponse
+from botocore.httpsession import URLLib3Session
+from urllib3.response import HTTPResponse
+
+REDACTED = "REDACTED"
+REDACTED_HEADERS = {"authorization", "x-amz-security-token", "x-amz-credential"}
+REDACTED_QUERY_PARAMS = {"X-Amz-Signature", "X-Amz-Credential", "X-Amz-Security-Token"}
+ACCOUNT_ID_IN_ARN = re.compile(rb"(arn:aws[\w-]*:[\w-]+:[\w-]*:)\d{12}")
+# Recorded in one region, replayed in whichever the test environment sets
+REGION_IN_HOST = re.compile(r"\.[a-z]{2}(-[a-z]+)+-\d(?=\.)")
+
+
+class CassetteMiss(Exception):
+    """A replayed request has no recorded response left"""
+
+
+def redact_url(url):
+    parts = urlsplit(url)
+    query = [
+        (name, REDACTED if name in REDACTED_QUERY_PARAMS else value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def redact_headers(headers):
+    redacted = {}
+    for name, value in headers.items():
+        if name.lower() in REDACTED_HEADERS:
+            value = REDACTED
+        redacted[name] = value.decode() if isinstance(value, bytes) else value
+    return redacted
+
+
+def redact_body(body):
+    return ACCOUNT_ID_IN_ARN.sub(rb"\g<1>000000000000", body)
+
+
+def request_key(method, url):
+    """What a replayed request must match, its method, endpoint and path"""
+    parts = urlsplit(redact_url(url))
+    return f"{method} {REGION_IN_HOST.sub('', parts.netloc)}{parts.path}?{parts.query}"
+
+
+def body_bytes(body):
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode()
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    # Streamed uploads are not kept, only matched by endpoint
+    return None
+
+
+def encode_body(body):
+    try:
+        return {"body": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"bodyBase64": base64.b64encode(body).decode()}
+
+
+def decode_body(saved):
+    if "bodyBase64" in saved:
+        return base64.b64decode(saved["bodyBase64"])
+    return saved.get("body", "").encode("utf-8")
+
+
+def replay_response(url, status, headers, content):
+    raw = HTTPResponse(
+        body=BytesIO(content),
+        headers=headers,
+        status=status,
+        preload_content=False,
+        decode_content=False,
+    )
+    return AWSResponse(url, status, headers, raw)
+
+
+class Cassette:
+    """Context manager that records to, or replays from, one JSON file"""
+
+    def __init__(self, path, record=False, latency_scale=0.0):
+        self.path = path
+        self.record = record
+        self.latency_scale = latency_scale
+        self.interactions = []
+        self._unplayed = {}
+        self._lock = threading.Lock()
+        self._original_send = None
+
+        if not record:
+            with open(path) as cassette_file:
+                self.interactions = json.load(cassette_file)["interactions"]
+            for interaction in self.interactions:
+                key = request_key(
+                    interaction["request"]["method"], interaction["request"]["url"]
+                )
+                self._unplayed.setdefault(key, []).append(interaction)
+
+    def __enter__(self):
+        self._original_send = URLLib3Session.send
+        cassette = self
+
+        def send(session, request):
+            if cassette.record:
+                return cassette._record(session, request)
+            return cassette._replay(request)
+
+        URLLib3Session.send = send
+        return self
+
+    def __exit__(self, *exc_info):
+        URLLib3Session.send = self._original_send
+        if self.record:
+            self.save()
+        return False
+
+    def save(self):
+        with open(self.path, "w") as cassette_file:
+            json.dump({"interactions": self.interactions}, cassette_file, indent=1)
+            cassette_file.write("\n")
+
+    def _record(self, session, request):
+        started = time.perf_counter()
+        response = self._original_send(session, request)
+        content = response.content
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        request_body = body_bytes(request.body)
+        interaction = {
+            "request": {
+                "method": request.method,
+                "url": redact_url(request.url),
+                "headers": redact_headers(dict(request.headers)),
+                "bodySha256": (
+                    hashlib.sha256(redact_body(request_body)).hexdigest()
+                    if request_body is not None
+                    else None
+                ),
+            },
+            "response": {
+                "status": response.status_code,
+                "headers": dict(response.headers),
+                **encode_body(redact_body(content)),
+            },
+            "elapsedMs": round(elapsed_ms, 1),
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+        # The stream was read for the recording, hand the caller a fresh one
+        return replay_response(
+            response.url, response.status_code, dict(response.headers), content
+        )
+
+    def _replay(self, request):
+        key = request_key(request.method, request.url)
+        request_body = body_bytes(request.body)
+        digest = (
+            hashlib.sha256(redact_body(request_body)).hexdigest()
+            if request_body is not None
+            else None
+        )
+
+        with self._lock:
+            candidates = self._unplayed.get(key)
+            if not candidates:
+                raise CassetteMiss(f"{self.path}: nothing recorded for {key}")
+            # Same payload first, else the next one recorded for this endpoint
+            interaction = next(
+                (
+                    candidate
+                    for candidate in candidates
+                    if candidate["request"]["bodySha256"] == digest
+                ),
+                candidates[0],
+            )
+            candidates.remove(interaction)
+
+        if self.latency_scale:
+            time.sleep(interaction["elapsedMs"] * self.latency_scale / 1000)
+
+        saved = interaction["response"]
+        return replay_response(
+            request.url, saved["status"], saved["headers"], decode_body(saved)
+        )
@@ -0,0 +1,189 @@
+"""Compare QueryKnowledgeBase configurations on a golden question set
+
+Every configuration answers every golden question through the real pipeline
+against the stubbed backend in tools.stub_bedrock, and the results are
+printed as a markdown table:
+
+- recall@k: share of a question's expected sources among its first k citations
+- prompt tokens: estimated size of the prompt sent for generation
+- latency: end-to-end time of run_chat with the stub's modelled latencies
+
+Run from chatbot/backend:
+
+    python -m tools.evaluate
+    python -m tools.evaluate --configs my-configs.json --latency-scale 0
+
+A configuration is {"name", "settings"?, "request"?, "chunkWords"?}. settings
+override QueryKnowledgeBase module constants (NUMBER_OF_RESULTS,
+RERANK_CANDIDATES, CONTEXT_TOKEN_BUDGET, ...), request adds fields to the
+/chat body (multiQuery, converse) and chunkWords re-chunks the corpus.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+
+from tools import load_function
+from tools.stub_bedrock import CHUNK_WORDS, StubBedrock
+
+EVAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eval")
+DEFAULT_CORPUS = os.path.join(EVAL_DIR, "corpus.jsonl")
+DEFAULT_GOLDEN = os.path.join(EVAL_DIR, "golden.jsonl")
+RECALL_AT = 3
+# Matches what /chat gets from API Gateway
+QUESTION_BUDGET_MS = 29000
+
+DEFAULT_CONFIGURATIONS = [
+    {"name": "baseline"},
+    {"name": "top-5", "settings": {"NUMBER_OF_RESULTS": 5}},
+    {"name": "chunks-60-words", "chunkWords": 60},
+    {"name": "multi-query", "request": {"multiQuery": True}},
+    {"name": "converse", "request": {"converse": True}},
+    {
+        "name": "converse-budget-800",
+        "request": {"converse": True},
+        "settings": {"CONTEXT_TOKEN_BUDGET": 800},
+    },
+]
+
+
+def read_jsonl(path):
+    with open(path) as jsonl_file:
+        return [json.loads(line) for line in jsonl_file if line.strip()]
+
+
+def recall_at_k(expected_sources, cited_files, k=RECALL_AT):
+    expected = set(expected_sources)
+    if not expected:
+        return 1.0
+    return len(expected & set(cited_files[:k])) / len(expected)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def load_pipeline(configuration, documents, latency_scale):
+    """A fresh QueryKnowledgeBase module wired to its own stub backend"""
+    packing = load_function("QueryKnowledgeBase", "packing")
+    query_knowledge_base = load_function("QueryKnowledgeBase")
+
+    for name, value in configuration.get("settings", {}).items():
+        if not hasattr(query_knowledge_base, name):
+            raise ValueError(f"{configuration['name']}: unknown setting {name}")
+        setattr(query_knowledge_base, name, value)
+
+    backend = StubBedrock(
+        documents,
+        chunk_words=configuration.get("chunkWords", CHUNK_WORDS),
+        count_tokens=packing.estimate_tokens,
+        latency_scale=latency_scale,
+    )
+    query_knowledge_base.get_runtime_client = lambda read_timeout: backend
+    query_knowledge_base.get_generation_client = lambda read_timeout: backend
+    query_knowledge_base.get_keyword_index = lambda: backend.index
+
+    return query_knowledge_base, backend
+
+
+def evaluate(configuration, documents, golden, latency_scale=1.0, k=RECALL_AT):
+    """Answer every golden question with one configuration, returning its summary row"""
+    query_knowledge_base, backend = load_pipeline(
+        configuration, documents, latency_scale
+    )
+
+    recalls = []
+    prompt_tokens = []
+    latencies = []
+    errors = 0
+
+    for case in golden:
+        request_body = {
+            "messages": [{"role": "USER", "content": case["question"]}],
+            **configuration.get("request", {}),
+        }
+        generations_before = len(backend.prompt_tokens)
+        started = time.perf_counter()
+        try:
+            response = query_knowledge_base.run_chat(
+                request_body, query_knowledge_base.Deadline(QUESTION_BUDGET_MS)
+            )
+        except Exception:
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        cited_files = [
+            citation["file"] for citation in response["assistantMessage"]["citation"]
+        ]
+        recalls.append(recall_at_k(case["expectedSources"], cited_files, k))
+        # A hedged call generates twice from the same prompt
+        prompt_tokens.append(max(backend.prompt_tokens[generations_before:], default=0))
+
+    return {
+        "configuration": configuration["name"],
+        f"recall@{k}": statistics.mean(recalls) if recalls else 0.0,
+        "promptTokens": statistics.mean(prompt_tokens) if prompt_tokens else 0.0,
+        "p50Ms": statistics.median(latencies) if latencies else 0.0,
+        "p95Ms": percentile(latencies, 95) if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def format_table(rows, k=RECALL_AT):
+    lines = [
+        f"| configuration | recall@{k} | prompt tokens | p50 ms | p95 ms | errors |",
+        "|---|---:|---:|---:|---:|---:|",
+    ]
+    for row in rows:
+        lines.append(
+            f"| {row['configuration']} | {row[f'recall@{k}']:.2f} "
+            f"| {row['promptTokens']:.0f} | {row['p50Ms']:.0f} "
+            f"| {row['p95Ms']:.0f} | {row['errors']} |"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN)
+    parser.add_argument("--configs", help="JSON file with a list of configurations")
+    parser.add_argument("-k", type=int, default=RECALL_AT)
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="multiplier for the stub's modelled latencies, 0 disables them",
+    )
+    args = parser.parse_args(argv)
+
+    # Nothing reaches AWS, the clients built at import time only need a region
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    documents = read_jsonl(args.corpus)
+    golden = read_jsonl(args.golden)
+    configurations = DEFAULT_CONFIGURATIONS
+    if args.configs:
+        with open(args.configs) as configs_file:
+            configurations = json.load(configs_file)
+
+    output = sys.stdout
+    rows = []
+    # The function logs and publishes EMF metrics on stdout, keep it for the table
+    with contextlib.redirect_stdout(sys.stderr):
+        for configuration in configurations:
+            rows.append(
+                evaluate(configuration, documents, golden, args.latency_scale, args.k)
+            )
+
+    print(format_table(rows, args.k), file=output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""In-memory stand-ins for the AWS services the handlers call
+
+They implement only the operations and response fields the handlers use,
+with the same names and shapes as the boto3 clients they replace.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+from chatbot_common.documents import is_metadata_key, metadata_key
+
+LIST_PAGE_SIZE = 1000
+
+
+def client_error(operation, code, message, status=400):
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": message},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        },
+        operation,
+    )
+
+
+class FakePaginator:
+    def __init__(self, list_pages):
+        self._list_pages = list_pages
+
+    def paginate(self, **kwargs):
+        kwargs.pop("PaginationConfig", None)
+        return iter(self._list_pages(**kwargs))
+
+
+class LambdaContext:
+    """The parts of the Lambda context object the handlers read"""
+
+    def __init__(self, function_name, timeout_seconds=30, memory_limit_in_mb=128):
+        self.function_name = function_name
+        self.memory_limit_in_mb = memory_limit_in_mb
+        self.invoked_function_arn = (
+            f"arn:aws:lambda:us-east-1:000000000000:function:{function_name}"
+        )
+        self.aws_request_id = str(uuid.uuid4())
+        self._expires_at = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self):
+        return max(int((self._expires_at - time.monotonic()) * 1000), 0)
+
+
+class FakeS3:
+    """Buckets of objects in memory, presigned URLs point at the local server"""
+
+    def __init__(self, base_url="http://localhost:3001"):
+        self.base_url = base_url
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, bucket):
+        return self.buckets.setdefault(bucket, {})
+
+    def put_object(
+        self, Bucket, Key, Body=b"", ContentType=None, Metadata=None, **kwargs
+    ):
+        body = Body.encode() if isinstance(Body, str) else bytes(Body)
+        with self._lock:
+            self._bucket(Bucket)[Key] = {
+                "Body": body,
+                "ContentType": ContentType or "binary/octet-stream",
+                "Metadata": dict(Metadata or {}),
+                "LastModified": datetime.now(timezone.utc),
+                "ETag": f'"{hashlib.md5(body).hexdigest()}"',
+            }
+        return {"ETag": self._bucket(Bucket)[Key]["ETag"]}
+
+    def get_body(self, bucket, key):
+        obj = self._bucket(bucket).get(key)
+        if obj is None:
+            raise client_error("GetObject", "NoSuchKey", "Key not found", 404)
+        return obj["Body"]
+
+    def head_object(self, Bucket, Key, **kwargs):
+        obj = self._bucket(Bucket).get(Key)
+        if obj is None:
+            raise client_error("HeadObject", "404", "Not Found", 404)
+        return {
+            "ETag": obj["ETag"],
+            "ContentLength": len(obj["Body"]),
+            "LastModified": obj["LastModified"],
+            "Metadata": obj["Metadata"],
+        }
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        with open(Filename, "wb") as local_file:
+            local_file.write(self.get_body(Bucket, Key))
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        deleted = []
+        with self._lock:
+            for item in Delete["Objects"]:
+                self._bucket(Bucket).pop(item["Key"], None)
+                deleted.append({"Key": item["Key"]})
+        return {"Deleted": deleted}
+
+    def _list_objects_pages(self, Bucket, Prefix=""):
+        with self._lock:
+            keys = sorted(key for key in self._bucket(Bucket) if key.startswith(Prefix))
+            objects = [
+                {
+                    "Key": key,
+                    "Size": len(self._bucket(Bucket)[key]["Body"]),
+                    "LastModified": self._bucket(Bucket)[key]["LastModified"],
+                    "ETag": self._bucket(Bucket)[key]["ETag"],
+                }
+                for key in keys
+            ]
+        for start in range(0, max(len(objects), 1), LIST_PAGE_SIZE):
+            yield {"Contents": objects[start : start + LIST_PAGE_SIZE]}
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(operation_name)
+        return FakePaginator(self._list_objects_pages)
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600, **kwargs):
+        return f"{self.base_url}/s3/{Params['Bucket']}/{Params['Key']}"
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, **kwargs):
+        return {
+            "url": f"{self.base_url}/s3/{Bucket}",
+            "fields": {**(Fields or {}), "key": Key},
+        }
+
+
+class FakeBedrockAgent:
+    """One knowledge base over an S3 bucket, ingestion jobs finish after a delay
+
+    A completed job indexes every document in the bucket, with its sidecar
+    metadata, into the retrieval backend.
+    """
+
+    def __init__(
+        self,
+        s3,
+        bucket,
+        backend,
+        knowledge_base_id="LOCALKB",
+        data_source_id="LOCALDS",
+        ingestion_seconds=2.0,
+    ):
+        self.s3 = s3
+        self.bucket = bucket
+        self.backend = backend
+        self.knowledge_base_id = knowledge_base_id
+        self.data_source_id = data_source_id
+        self.ingestion_seconds = ingestion_seconds
+        self.jobs = {}
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def start_ingestion_job(self, knowledgeBaseId, dataSourceId, **kwargs):
+        job = {
+            "knowledgeBaseId": knowledgeBaseId,
+            "dataSourceId": dataSourceId,
+            "ingestionJobId": uuid.uuid4().hex[:10].upper(),
+            "status": "STARTING",
+            "startedAt": datetime.now(timezone.utc),
+        }
+        with self._lock:
+            self.jobs[job["ingestionJobId"]] = job
+            for key in self._document_keys():
+                self._set_status(key, "STARTING")
+        return {"ingestionJob": dict(job)}
+
+    def get_ingestion_job(self, ingestionJobId, **kwargs):
+        self._advance()
+        return {"ingestionJob": dict(self.jobs[ingestionJobId])}
+
+    def _list_documents_pages(self, **kwargs):
+        self._advance()
+        with self._lock:
+            documents = [dict(document) for document in self.documents.values()]
+        for start in range(0, max(len(documents), 1), LIST_PAGE_SIZE):
+            yield {"documentDetails": documents[start : start + LIST_PAGE_SIZE]}
+
+    def list_knowledge_base_documents(self, maxResults=100, nextToken=None, **kwargs):
+        self._advance()
+        with self._lock:
+            documents = [dict(document) for document in self.documents.values()]
+        start = int(nextToken or 0)
+        response = {"documentDetails": documents[start : start + maxResults]}
+        if start + maxResults < len(documents):
+            response["nextToken"] = str(start + maxResults)
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_knowledge_base_documents":
+            raise NotImplementedError(operation_name)
+        return FakePaginator(self._list_documents_pages)
+
+    def ingest(self):
+        """Index the bucket immediately, used to seed a knowledge base"""
+        with self._lock:
+            self._index_bucket()
+
+    def _document_keys(self):
+        return [key for key in self.s3._bucket(self.bucket) if not is_metadata_key(key)]
+
+    def _set_status(self, key, status):
+        uri = f"s3://{self.bucket}/{key}"
+        self.documents[uri] = {
+            "knowledgeBaseId": self.knowledge_base_id,
+            "dataSourceId": self.data_source_id,
+            "identifier": {"dataSourceType": "S3", "s3": {"uri": uri}},
+            "status": status,
+            "statusReason": "",
+            "updatedAt": datetime.now(timezone.utc),
+        }
+
+    def _advance(self):
+        """Move running jobs along by wall clock, indexing the bucket when one finishes"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for job in self.jobs.values():
+                if job["status"] == "COMPLETE":
+                    continue
+                elapsed = (now - job["startedAt"]).total_seconds()
+                if elapsed < self.ingestion_seconds:
+                    if job["status"] == "STARTING":
+                        job["status"] = "IN_PROGRESS"
+                        for key in self._document_keys():
+                            self._set_status(key, "IN_PROGRESS")
+                    continue
+
+                self._index_bucket()
+                job["status"] = "COMPLETE"
+
+    def _index_bucket(self):
+        self.documents = {}
+        documents = []
+        for key in self._document_keys():
+            self._set_status(key, "INDEXED")
+            attributes = {}
+            try:
+                sidecar = self.s3.get_body(self.bucket, metadata_key(key))
+                attributes = json.loads(sidecar)["metadataAttributes"]
+            except ClientError:
+                pass
+
+            # No document parsing locally, text and text-bearing PDFs only
+            text = self.s3.get_body(self.bucket, key).decode("utf-8", "ignore")
+            documents.append(
+                {
+                    "uri": f"s3://{self.bucket}/{key}",
+                    "text": text,
+                    "documentId": attributes.get("documentId"),
+                    "tags": attributes.get("tags"),
+                }
+            )
+
+        self.backend.reindex(documents)
+
+
+class FakeLambda:
+    """Event invocations run the target handler on a background thread"""
+
+    def __init__(self, handlers, timeouts=None):
+        self.handlers = handlers
+        self.timeouts = timeouts or {}
+        self.threads = []
+
+    def invoke(self, FunctionName, Payload=b"{}", InvocationType="RequestResponse"):
+        handler = self.handlers[FunctionName]
+        event = json.loads(Payload)
+        context = LambdaContext(FunctionName, self.timeouts.get(FunctionName, 30))
+
+        if InvocationType == "Event":
+            thread = threading.Thread(
+                target=handler, args=(event, context), daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+            return {"StatusCode": 202}
+
+        result = handler(event, context)
+        return {"StatusCode": 200, "Payload": json.dumps(result)}
@@ -0,0 +1,116 @@
+"""Profile each function's module init the way INIT_PROFILE=true does in Lambda
+
+Imports every handler module in a fresh interpreter with the init profiler
+on and prints the report its first invocation would publish: time per
+import group (boto3, botocore, each powertools subsystem) and per boto3
+client built at module scope. The packages come from the LambdaCore layer
+directory, the versions the functions deploy with.
+
+Run from chatbot/backend:
+
+    python -m tools.init_profile [ListDocuments ...] [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from tools import BACKEND_DIR, FUNCTIONS_DIR, load_function
+
+CORE_LAYER_DIR = os.path.join(BACKEND_DIR, "lambda", "layers", "LambdaCore", "python")
+DEFAULT_RUNS = 3
+TOP_GROUPS = 5
+
+
+def function_names():
+    return sorted(
+        name
+        for name in os.listdir(FUNCTIONS_DIR)
+        if os.path.exists(os.path.join(FUNCTIONS_DIR, name, "lambda_function.py"))
+    )
+
+
+def profile_once(name, use_core_layer=True):
+    """Init report for one cold import of the function, from a child interpreter"""
+    env = {
+        **os.environ,
+        "INIT_PROFILE": "true",
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+    }
+    if use_core_layer:
+        env["PYTHONPATH"] = os.pathsep.join(
+            [CORE_LAYER_DIR] + [p for p in [env.get("PYTHONPATH")] if p]
+        )
+
+    completed = subprocess.run(
+        [sys.executable, "-m", "tools.init_profile", "--child", name],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def profile(name, runs=DEFAULT_RUNS, use_core_layer=True):
+    """Report of the run with the median init time"""
+    reports = sorted(
+        (profile_once(name, use_core_layer) for _ in range(runs)),
+        key=lambda report: report["initMs"],
+    )
+    report = reports[len(reports) // 2]
+    return {
+        "function": name,
+        **report,
+        "initMsRuns": [r["initMs"] for r in reports],
+    }
+
+
+def format_report(report):
+    lines = [
+        f"{report['function']}: init {report['initMs']} ms "
+        f"(imports {report['importMs']} ms, clients {report['clientMs']} ms, "
+        f"median of {len(report['initMsRuns'])}, "
+        f"spread {statistics.pstdev(report['initMsRuns']):.1f} ms)"
+    ]
+    for group, ms in list(report["imports"].items())[:TOP_GROUPS]:
+        lines.append(f"  import {group:<28} {ms:>8.1f} ms")
+    for client in report["clients"]:
+        lines.append(f"  client {client['service']:<28} {client['ms']:>8.1f} ms")
+    return "\n".join(lines)
+
+
+def run_child(name):
+    from chatbot_common import init_profile
+
+    load_function(name)
+    print(json.dumps(init_profile.stop()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("functions", nargs="*", help="default: every function")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--json", action="store_true", help="one JSON line each")
+    parser.add_argument(
+        "--installed",
+        action="store_true",
+        help="use the installed packages instead of the LambdaCore layer",
+    )
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return run_child(args.child)
+
+    for name in args.functions or function_names():
+        report = profile(name, args.runs, not args.installed)
+        print(json.dumps(report) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
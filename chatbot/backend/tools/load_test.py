@@ -0,0 +1,453 @@
+"""Replay weighted chat and document scenarios against the API at fixed arrival rates
+
+Scenarios start at each rate in --rates for --duration seconds, open loop,
+so a slow deployment builds a queue instead of slowing the load down. A
+step is summarised when its last scenario finishes: achieved requests per
+second, the share of 429 throttles and of errors, and a latency histogram
+per route. Throughput flattening while latency and 429s climb marks the
+knee.
+
+Run from chatbot/backend against the local server (python -m tools.local_server
+--throttle applies the stage limits) or a deployed stage:
+
+    python -m tools.load_test http://localhost:3001 --rates 2,5,10,20 --duration 30
+    python -m tools.load_test https://<id>.execute-api.<region>.amazonaws.com/chatbot \\
+        --rates 5,10,15 --json > capacity.ndjson
+
+Scenarios (--mix chat=6,list=3,upload=1,delete=1):
+
+- chat: a session of 1-3 turns, polling /chat/status when a turn is queued
+- list: a client polling /documents/list
+- upload: one upload-link request for a batch of loadtest-*.pdf files
+- delete: deletes the loadtest-* files whose links were issued
+
+Links are issued but nothing is uploaded to them. Deletes go through the
+issued keys, and anything still outstanding is deleted when the run ends.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+from tools.evaluate import DEFAULT_GOLDEN, read_jsonl
+
+DEFAULT_MIX = {"chat": 6, "list": 3, "upload": 1, "delete": 1}
+HISTOGRAM_BOUNDS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+REQUEST_TIMEOUT_SECONDS = 35  # just above the API Gateway integration timeout
+CHAT_POLL_SECONDS = 1.0
+CHAT_POLL_LIMIT = 120
+MAX_TURNS = 3
+UPLOAD_BATCH = 5
+LIST_POLLS = 3
+LIST_POLL_SECONDS = 2.0
+
+
+class HttpConnection:
+    """One keep-alive HTTP/1.1 connection, enough of the protocol for the API"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, host, port, use_tls):
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=ssl.create_default_context() if use_tls else None
+        )
+        return cls(reader, writer)
+
+    async def request(self, method, host, path, body=b""):
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        self.writer.write(head.encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        version, status = status_line.split()[:2]
+        status = int(status)
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            response_body = b"".join(chunks)
+        else:
+            response_body = await self.reader.readexactly(
+                int(headers.get("content-length", 0))
+            )
+
+        connection = headers.get("connection", "").lower()
+        if version == b"HTTP/1.0":
+            reusable = connection == "keep-alive"
+        else:
+            reusable = connection != "close"
+        return status, response_body, reusable
+
+    def close(self):
+        self.writer.close()
+
+
+class ApiClient:
+    """POSTs JSON to the API over a pool of keep-alive connections, timing each call"""
+
+    def __init__(self, base_url, recorder):
+        parts = urlsplit(base_url)
+        self.use_tls = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.use_tls else 80)
+        self.host_header = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.recorder = recorder
+        self._idle = []
+
+    async def _send(self, route, body):
+        # An idle connection may have been closed by the server, retry on a new one
+        while self._idle:
+            connection = self._idle.pop()
+            try:
+                return connection, await connection.request(
+                    "POST", self.host_header, f"{self.prefix}{route}", body
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                connection.close()
+            except BaseException:
+                connection.close()
+                raise
+
+        connection = await HttpConnection.open(self.host, self.port, self.use_tls)
+        try:
+            return connection, await connection.request(
+                "POST", self.host_header, f"{self.prefix}{route}", body
+            )
+        except BaseException:
+            connection.close()
+            raise
+
+    async def post(self, route, payload):
+        """Returns (status, parsed body), status 0 when no response arrived"""
+        started = time.perf_counter()
+        status, body = 0, None
+        try:
+            connection, (status, raw_body, reusable) = await asyncio.wait_for(
+                self._send(route, json.dumps(payload).encode()),
+                REQUEST_TIMEOUT_SECONDS,
+            )
+            if reusable:
+                self._idle.append(connection)
+            else:
+                connection.close()
+            body = json.loads(raw_body) if raw_body else None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.recorder.record(route, status, (time.perf_counter() - started) * 1000)
+        return status, body
+
+    def close(self):
+        for connection in self._idle:
+            connection.close()
+        self._idle = []
+
+
+class Recorder:
+    """Latencies and statuses per route for one rate step"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.started = time.perf_counter()
+
+    def record(self, route, status, latency_ms):
+        self.samples[route].append((status, latency_ms))
+
+    def summary(self, rate):
+        elapsed = time.perf_counter() - self.started
+        everything = [sample for samples in self.samples.values() for sample in samples]
+        routes = {route: summarize(samples) for route, samples in self.samples.items()}
+        return {
+            "targetScenariosPerSecond": rate,
+            "elapsedSeconds": round(elapsed, 1),
+            "achievedRps": round(len(everything) / elapsed, 2) if elapsed else 0.0,
+            **summarize(everything),
+            "routes": routes,
+        }
+
+
+def summarize(samples):
+    latencies = sorted(latency for _, latency in samples)
+    requests = len(samples)
+    throttled = sum(1 for status, _ in samples if status == 429)
+    errors = sum(1 for status, _ in samples if status == 0 or status >= 500)
+
+    histogram = {}
+    for bound in HISTOGRAM_BOUNDS_MS + [None]:
+        label = f"<={bound}" if bound else f">{HISTOGRAM_BOUNDS_MS[-1]}"
+        histogram[label] = 0
+    for latency in latencies:
+        for bound in HISTOGRAM_BOUNDS_MS:
+            if latency <= bound:
+                histogram[f"<={bound}"] += 1
+                break
+        else:
+            histogram[f">{HISTOGRAM_BOUNDS_MS[-1]}"] += 1
+
+    def percentile(percent):
+        if not latencies:
+            return 0.0
+        return round(latencies[min(int(requests * percent / 100), requests - 1)], 1)
+
+    return {
+        "requests": requests,
+        "throttleRate": round(throttled / requests, 4) if requests else 0.0,
+        "errorRate": round(errors / requests, 4) if requests else 0.0,
+        "p50Ms": round(statistics.median(latencies), 1) if latencies else 0.0,
+        "p95Ms": percentile(95),
+        "p99Ms": percentile(99),
+        "histogram": histogram,
+    }
+
+
+class Scenarios:
+    """The user flows, sharing the loadtest files issued by upload bursts"""
+
+    def __init__(self, client, questions, rng):
+        self.client = client
+        self.questions = questions
+        self.rng = rng
+        self.issued_keys = deque()
+
+    async def chat(self):
+        messages = []
+        session_id = None
+        for _ in range(self.rng.randint(1, MAX_TURNS)):
+            messages.append(
+                {"role": "USER", "content": self.rng.choice(self.questions)}
+            )
+            payload = {"messages": messages}
+            if session_id:
+                payload["sessionId"] = session_id
+
+            status, body = await self.client.post("/chat", payload)
+            if status == 202 and body:
+                status, body = await self._wait_for_chat_job(body["jobId"])
+            if status != 200 or not body or "assistantMessage" not in body:
+                return
+
+            session_id = body.get("sessionId", session_id)
+            messages.append(body["assistantMessage"])
+
+    async def _wait_for_chat_job(self, job_id):
+        for _ in range(CHAT_POLL_LIMIT):
+            await asyncio.sleep(CHAT_POLL_SECONDS)
+            status, body = await self.client.post("/chat/status", {"jobId": job_id})
+            if status != 200 or not body:
+                return status, body
+            if body.get("status") in ("SUCCEEDED", "FAILED"):
+                return status, body
+        return 0, None
+
+    async def list(self):
+        for poll in range(LIST_POLLS):
+            if poll:
+                await asyncio.sleep(LIST_POLL_SECONDS)
+            await self.client.post("/documents/list", {})
+
+    async def upload(self):
+        files = [
+            {
+                "fileName": f"loadtest-{uuid.uuid4().hex[:12]}.pdf",
+                "fileType": "application/pdf",
+            }
+            for _ in range(UPLOAD_BATCH)
+        ]
+        status, body = await self.client.post(
+            "/documents/uploadpresignedurl", {"files": files}
+        )
+        if status == 200 and body:
+            for result in body.get("results", []):
+                if result.get("success"):
+                    self.issued_keys.append(result["fields"]["key"])
+
+    async def delete(self, keys=None):
+        if keys is None:
+            keys = [
+                self.issued_keys.popleft()
+                for _ in range(min(UPLOAD_BATCH, len(self.issued_keys)))
+            ]
+        if not keys:
+            keys = [f"loadtest-{uuid.uuid4().hex[:12]}.pdf"]
+        await self.client.post(
+            "/documents/delete",
+            {"documents": [{"s3Key": f"s3://loadtest/{key}"} for key in keys]},
+        )
+
+    async def clean_up(self):
+        while self.issued_keys:
+            await self.delete()
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"unknown scenario {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run_step(scenarios, mix, rate, duration, rng, max_in_flight):
+    """Start scenarios as a Poisson process at rate per second for duration seconds"""
+    recorder = Recorder()
+    scenarios.client.recorder = recorder
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    slots = asyncio.Semaphore(max_in_flight)
+    tasks = []
+    skipped = 0
+
+    async def run(name):
+        try:
+            await getattr(scenarios, name)()
+        finally:
+            slots.release()
+
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(rng.expovariate(rate))
+        if slots.locked():
+            # The generator itself is the bottleneck, don't hide it
+            skipped += 1
+            continue
+        await slots.acquire()
+        tasks.append(asyncio.create_task(run(rng.choices(names, weights)[0])))
+
+    await asyncio.gather(*tasks)
+    summary = recorder.summary(rate)
+    summary["scenarios"] = len(tasks)
+    summary["skippedScenarios"] = skipped
+    return summary
+
+
+async def run_load(
+    base_url, rates, duration, mix=None, questions=None, seed=7, max_in_flight=500
+):
+    rng = random.Random(seed)
+    client = ApiClient(base_url, Recorder())
+    scenarios = Scenarios(
+        client,
+        questions or [case["question"] for case in read_jsonl(DEFAULT_GOLDEN)],
+        rng,
+    )
+    try:
+        summaries = []
+        for rate in rates:
+            summaries.append(
+                await run_step(
+                    scenarios, mix or DEFAULT_MIX, rate, duration, rng, max_in_flight
+                )
+            )
+        await scenarios.clean_up()
+        return summaries
+    finally:
+        client.close()
+
+
+def format_step(summary):
+    lines = [
+        f"{summary['targetScenariosPerSecond']} scenarios/s: "
+        f"{summary['achievedRps']} req/s over {summary['elapsedSeconds']} s, "
+        f"{summary['requests']} requests, throttled {summary['throttleRate']:.1%}, "
+        f"errors {summary['errorRate']:.1%}, skipped {summary['skippedScenarios']}",
+        "| route | requests | 429 | errors | p50 ms | p95 ms | p99 ms |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for route, row in sorted(summary["routes"].items()):
+        lines.append(
+            f"| {route} | {row['requests']} | {row['throttleRate']:.1%} "
+            f"| {row['errorRate']:.1%} | {row['p50Ms']} | {row['p95Ms']} "
+            f"| {row['p99Ms']} |"
+        )
+    histogram = " ".join(
+        f"{label}:{count}" for label, count in summary["histogram"].items()
+    )
+    lines.append(f"latency ms {histogram}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base_url")
+    parser.add_argument(
+        "--rates",
+        default="5",
+        help="comma separated scenario start rates per second, one step each",
+    )
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--questions", help="questions file, one per line")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="one JSON line per step")
+    parser.add_argument(
+        "--max-error-rate",
+        type=float,
+        help="exit 1 when any step's error rate is above this",
+    )
+    args = parser.parse_args(argv)
+
+    questions = None
+    if args.questions:
+        with open(args.questions) as questions_file:
+            questions = [line.strip() for line in questions_file if line.strip()]
+
+    summaries = asyncio.run(
+        run_load(
+            args.base_url,
+            [float(rate) for rate in args.rates.split(",")],
+            args.duration,
+            args.mix,
+            questions,
+            args.seed,
+            args.max_in_flight,
+        )
+    )
+
+    for summary in summaries:
+        print(json.dumps(summary) if args.json else format_step(summary) + "\n")
+
+    if args.max_error_rate is not None and any(
+        summary["errorRate"] > args.max_error_rate for summary in summaries
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""Serve the REST API locally with every handler backed by in-memory AWS fakes
+
+The six API functions are loaded as they are deployed and called with API
+Gateway proxy events. S3, the knowledge base, Lambda and Bedrock are
+replaced by the fakes in tools.fakes and tools.stub_bedrock. The sample
+corpus in tools/eval is uploaded and indexed at start.
+
+Run from chatbot/backend:
+
+    python -m tools.local_server --port 3001 --latency-scale 1
+
+then point the frontend at it with VITE_API_URL=http://localhost:3001.
+--latency-scale 0 removes the modelled Bedrock latency when profiling the
+handlers themselves.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from tools import load_function
+from tools.evaluate import DEFAULT_CORPUS, read_jsonl
+from tools.fakes import FakeBedrockAgent, FakeLambda, FakeS3, LambdaContext
+from tools.stub_bedrock import StubBedrock
+
+KNOWLEDGE_BASE_BUCKET = "local-knowledge-base"
+
+# Path to function, as wired in api_gateway_stack
+ROUTES = {
+    "/chat": "QueryKnowledgeBase",
+    "/chat/status": "QueryKnowledgeBase",
+    "/documents/list": "ListDocuments",
+    "/documents/downloadpresignedurl": "GenerateDownloadDocumentLink",
+    "/documents/uploadpresignedurl": "GenerateUploadDocumentLink",
+    "/documents/sync": "TriggerIngestDocumentsKnowledgeBase",
+    "/documents/delete": "DeleteDocuments",
+    "/documents/delete/status": "DeleteDocuments",
+}
+# Function timeouts in seconds, also from api_gateway_stack
+TIMEOUTS = {
+    "QueryKnowledgeBase": 300,
+    "ListDocuments": 30,
+    "GenerateDownloadDocumentLink": 30,
+    "GenerateUploadDocumentLink": 30,
+    "TriggerIngestDocumentsKnowledgeBase": 300,
+    "DeleteDocuments": 300,
+}
+
+# Stage throttle from api_gateway_stack, applied with --throttle
+THROTTLE_RATE_LIMIT = 10
+THROTTLE_BURST_LIMIT = 20
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization, X-Amz-Date, X-Api-Key",
+}
+
+
+def proxy_event(method, path, body, headers=None):
+    """The API Gateway REST proxy event the handlers receive"""
+    return {
+        "resource": path,
+        "path": path,
+        "httpMethod": method,
+        "headers": dict(headers or {}),
+        "queryStringParameters": None,
+        "pathParameters": None,
+        "body": body,
+        "isBase64Encoded": False,
+        "requestContext": {
+            "resourcePath": path,
+            "httpMethod": method,
+            "path": f"/local{path}",
+            "stage": "local",
+            "requestId": str(time.time_ns()),
+            "requestTimeEpoch": int(time.time() * 1000),
+        },
+    }
+
+
+class LocalApi:
+    """The handlers wired to shared fakes, callable without HTTP"""
+
+    def __init__(
+        self,
+        base_url="http://localhost:3001",
+        latency_scale=1.0,
+        ingestion_seconds=2.0,
+        corpus_path=DEFAULT_CORPUS,
+    ):
+        # Read by the handlers at import time
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        os.environ["KNOWLEDGE_BASE_ID"] = "LOCALKB"
+        os.environ["DATA_SOURCE_ID"] = "LOCALDS"
+        os.environ["KNOWLEDGE_BASE_BUCKET"] = KNOWLEDGE_BASE_BUCKET
+        os.environ.setdefault("MODEL_ARN", "local-model")
+
+        self.handlers = {name: load_function(name) for name in TIMEOUTS}
+        packing = load_function("QueryKnowledgeBase", "packing")
+
+        self.s3 = FakeS3(base_url)
+        self.bedrock = StubBedrock(
+            [], count_tokens=packing.estimate_tokens, latency_scale=latency_scale
+        )
+        self.agent = FakeBedrockAgent(
+            self.s3,
+            KNOWLEDGE_BASE_BUCKET,
+            self.bedrock,
+            ingestion_seconds=ingestion_seconds,
+        )
+        self.lambda_client = FakeLambda(
+            {name: module.lambda_handler for name, module in self.handlers.items()},
+            TIMEOUTS,
+        )
+
+        for module in self.handlers.values():
+            self._wire(module)
+
+        self._seed(read_jsonl(corpus_path) if corpus_path else [])
+
+    def _wire(self, module):
+        for name, fake in (
+            ("S3_CLIENT", self.s3),
+            ("BEDROCK_AGENT_CLIENT", self.agent),
+            ("LAMBDA_CLIENT", self.lambda_client),
+        ):
+            if hasattr(module, name):
+                setattr(module, name, fake)
+
+        if hasattr(module, "get_runtime_client"):
+            module.get_runtime_client = lambda read_timeout: self.bedrock
+            module.get_generation_client = lambda read_timeout: self.bedrock
+            module.get_keyword_index = lambda: self.bedrock.index
+
+    def _seed(self, documents):
+        from chatbot_common.documents import write_metadata
+
+        for document in documents:
+            key = document["uri"].split("/", 3)[-1]
+            if key in self.s3._bucket(KNOWLEDGE_BASE_BUCKET):
+                # Pages of one file, keep them as a single object
+                key_body = self.s3.get_body(KNOWLEDGE_BASE_BUCKET, key).decode()
+                document = {**document, "text": f"{key_body}\n\n{document['text']}"}
+            self.s3.put_object(
+                Bucket=KNOWLEDGE_BASE_BUCKET, Key=key, Body=document["text"]
+            )
+            write_metadata(self.s3, KNOWLEDGE_BASE_BUCKET, key)
+
+        self.agent.ingest()
+
+    def handle(self, method, path, body, headers=None):
+        """Invoke the function behind path, returning status, headers and body"""
+        function_name = ROUTES.get(path)
+        if function_name is None:
+            return 404, {}, json.dumps({"message": "Missing Authentication Token"})
+
+        context = LambdaContext(function_name, TIMEOUTS[function_name])
+        response = self.handlers[function_name].lambda_handler(
+            proxy_event(method, path, body, headers), context
+        )
+
+        return (
+            response["statusCode"],
+            response.get("headers") or {},
+            response.get("body") or "",
+        )
+
+    def upload(self, bucket, content_type, body):
+        """Accept a presigned POST form, as S3 would"""
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        fields = {}
+        file_body = b""
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                file_body = part.get_payload(decode=True)
+            else:
+                fields[name] = part.get_content()
+
+        self.s3.put_object(
+            Bucket=bucket,
+            Key=fields["key"],
+            Body=file_body,
+            ContentType=fields.get("Content-Type"),
+            Metadata={
+                name.removeprefix("x-amz-meta-"): value
+                for name, value in fields.items()
+                if name.startswith("x-amz-meta-")
+            },
+        )
+
+        # The Object Created event EventBridge delivers for the upload
+        function_name = "GenerateUploadDocumentLink"
+        self.handlers[function_name].lambda_handler(
+            {
+                "source": "aws.s3",
+                "detail-type": "Object Created",
+                "detail": {
+                    "bucket": {"name": bucket},
+                    "object": {"key": fields["key"]},
+                },
+            },
+            LambdaContext(function_name, TIMEOUTS[function_name]),
+        )
+
+
+class TokenBucket:
+    """API Gateway's throttle, rate requests per second with a burst allowance"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def make_request_handler(api, throttle=None):
+    class RequestHandler(BaseHTTPRequestHandler):
+        # Keep-alive, as API Gateway and browsers use it
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, headers, body):
+            body = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            for name, value in {**headers, **CORS_HEADERS}.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def do_OPTIONS(self):
+            self._send(200, {}, b"")
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path.startswith("/s3/"):
+                bucket = path.split("/")[2]
+                api.upload(bucket, self.headers["Content-Type"], self._body())
+                return self._send(204, {}, b"")
+
+            # Read even when throttled, the connection is reused
+            body = self._body().decode() or None
+            if throttle and not throttle.take():
+                return self._send(429, {}, json.dumps({"message": "Too Many Requests"}))
+
+            status, headers, body = api.handle("POST", path, body, dict(self.headers))
+            self._send(status, headers, body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if not path.startswith("/s3/"):
+                return self._send(404, {}, b"")
+
+            _, _, bucket, key = path.split("/", 3)
+            obj = api.s3.buckets.get(bucket, {}).get(unquote(key))
+            if obj is None:
+                return self._send(404, {}, b"")
+            self._send(200, {"Content-Type": obj["ContentType"]}, obj["Body"])
+
+    return RequestHandler
+
+
+def make_server(api, host="localhost", port=3001, throttle=None):
+    return ThreadingHTTPServer((host, port), make_request_handler(api, throttle))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="multiplier for the modelled Bedrock latencies, 0 disables them",
+    )
+    parser.add_argument("--ingestion-seconds", type=float, default=2.0)
+    parser.add_argument(
+        "--throttle",
+        action="store_true",
+        help=f"429 above {THROTTLE_RATE_LIMIT} req/s, burst {THROTTLE_BURST_LIMIT}, as the stage does",
+    )
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    args = parser.parse_args(argv)
+
+    api = LocalApi(
+        f"http://{args.host}:{args.port}",
+        args.latency_scale,
+        args.ingestion_seconds,
+        args.corpus,
+    )
+    throttle = (
+        TokenBucket(THROTTLE_RATE_LIMIT, THROTTLE_BURST_LIMIT)
+        if args.throttle
+        else None
+    )
+    server = make_server(api, args.host, args.port, throttle)
+    print(f"Serving the chatbot API on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
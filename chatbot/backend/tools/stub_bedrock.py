@@ -0,0 +1,167 @@
+"""In-process stand-in for bedrock-agent-runtime and bedrock-runtime over a local corpus
+
+Retrieval is BM25 over the chunked corpus using the keyword index format, so
+results are repeatable without a knowledge base. Latency is modelled, a fixed
+retrieval cost plus a generation cost that grows with the prompt, and can be
+scaled down to zero for tests.
+"""
+
+import threading
+import time
+import uuid
+
+from chatbot_common.keyword_index import KeywordIndex, build_index
+
+CHUNK_WORDS = 120
+# retrieve_and_generate cites a few of the retrieved chunks, not all of them
+CITED_PASSAGES = 3
+RETRIEVE_LATENCY_MS = 150
+GENERATION_LATENCY_MS = 600
+GENERATION_MS_PER_1K_TOKENS = 200
+OUTPUT_TOKENS = 60
+
+
+def chunk_documents(documents, chunk_words=CHUNK_WORDS):
+    """Split each {"uri", "text", "page"?} document into chunks of chunk_words words"""
+    chunks = []
+    for document in documents:
+        words = document["text"].split()
+        for start in range(0, len(words), chunk_words):
+            chunks.append(
+                {
+                    "text": " ".join(words[start : start + chunk_words]),
+                    "uri": document["uri"],
+                    "page": document.get("page"),
+                    "chunkId": f"{document['uri']}#{start}",
+                    "documentId": document.get("documentId"),
+                    "tags": document.get("tags") or [],
+                }
+            )
+    return chunks
+
+
+def filter_scope(retrieval_filter):
+    """Document ids and tags named by a filter from build_retrieval_filter"""
+    document_ids = []
+    tags = []
+
+    def walk(condition):
+        if isinstance(condition, list):
+            for item in condition:
+                walk(item)
+            return
+        for operator, operand in condition.items():
+            if operator in ("andAll", "orAll"):
+                walk(operand)
+            elif operator == "in" and operand["key"] == "documentId":
+                document_ids.extend(operand["value"])
+            elif operator == "listContains" and operand["key"] == "tags":
+                tags.append(operand["value"])
+
+    walk(retrieval_filter or {})
+    return document_ids or None, tags or None
+
+
+def answer_text(passages):
+    markers = ", ".join(f"%[{index}]%" for index in range(1, len(passages) + 1))
+    return f"Stub answer from the retrieved context {markers}".strip()
+
+
+class StubBedrock:
+    """Serves retrieve, retrieve_and_generate and converse, recording prompt sizes"""
+
+    def __init__(
+        self,
+        documents,
+        chunk_words=CHUNK_WORDS,
+        count_tokens=None,
+        latency_scale=1.0,
+    ):
+        self.chunk_words = chunk_words
+        self.reindex(documents)
+        self.count_tokens = count_tokens or (lambda text: len(text.split()))
+        self.latency_scale = latency_scale
+        self.prompt_tokens = []
+        self._lock = threading.Lock()
+
+    def reindex(self, documents):
+        self.index = KeywordIndex(
+            build_index(chunk_documents(documents, self.chunk_words))
+        )
+
+    def _wait(self, milliseconds):
+        if self.latency_scale:
+            time.sleep(milliseconds * self.latency_scale / 1000)
+
+    def search(self, query, retrieval_configuration):
+        vector_search = retrieval_configuration["vectorSearchConfiguration"]
+        self._wait(RETRIEVE_LATENCY_MS)
+
+        document_ids, tags = filter_scope(vector_search.get("filter"))
+        results = self.index.search(
+            query, vector_search["numberOfResults"], document_ids, tags
+        )
+        # Shaped like vector results, the keyword flag is the index's own
+        for result in results:
+            result.pop("keywordMatch", None)
+        return results
+
+    def generate(self, prompt):
+        tokens = self.count_tokens(prompt)
+        with self._lock:
+            self.prompt_tokens.append(tokens)
+        self._wait(GENERATION_LATENCY_MS + GENERATION_MS_PER_1K_TOKENS * tokens / 1000)
+        return tokens
+
+    def retrieve(self, retrievalQuery, retrievalConfiguration, **kwargs):
+        return {
+            "retrievalResults": self.search(
+                retrievalQuery["text"], retrievalConfiguration
+            )
+        }
+
+    def retrieve_and_generate(
+        self, input, retrieveAndGenerateConfiguration, sessionId=None, **kwargs
+    ):
+        knowledge_base = retrieveAndGenerateConfiguration["knowledgeBaseConfiguration"]
+        results = self.search(input["text"], knowledge_base["retrievalConfiguration"])
+
+        template = knowledge_base["generationConfiguration"]["promptTemplate"][
+            "textPromptTemplate"
+        ]
+        search_results = "\n\n".join(result["content"]["text"] for result in results)
+        self.generate(
+            template.replace("$search_results$", search_results).replace(
+                "$query$", input["text"]
+            )
+        )
+
+        cited = results[:CITED_PASSAGES]
+        return {
+            "sessionId": sessionId or str(uuid.uuid4()),
+            "output": {"text": answer_text(cited)},
+            "citations": [{"retrievedReferences": cited}],
+        }
+
+    def converse(self, messages, system=(), **kwargs):
+        texts = [block["text"] for block in system if "text" in block]
+        for message in messages:
+            texts.extend(
+                block["text"] for block in message["content"] if "text" in block
+            )
+        input_tokens = self.generate("\n\n".join(texts))
+
+        return {
+            "output": {
+                "message": {
+                    "role": "assistant",
+                    "content": [{"text": "Stub answer from the retrieved context [1]"}],
+                }
+            },
+            "stopReason": "end_turn",
+            "usage": {
+                "inputTokens": input_tokens,
+                "outputTokens": OUTPUT_TOKENS,
+                "totalTokens": input_tokens + OUTPUT_TOKENS,
+            },
+        }
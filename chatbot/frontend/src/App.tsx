@@ -11,6 +11,11 @@ import KnowledgeBase from "./features/knowledgeBase/KnowledgeBase";
 import Chat from "./features/chat/Chat";
 import { getKnowledgeBaseDocuments } from "./features/knowledgeBase/services/KnowledgeBaseApi";
 import { generateUUID } from "./utils/uuid";
+import {
+  isRealtimeEnabled,
+  sendRealtimeMessage,
+  subscribeRealtime,
+} from "./utils/realtime";
 
 function App() {
   const [documentList, setDocumentList] = useState<DocumentObject[]>([]);
@@ -89,6 +94,19 @@ function App() {
     });
   }
 
+  function handlePinDocuments(id: string, documentIds: string[]) {
+    setChats((prevChats) => {
+      if (!prevChats[id]) {
+        return prevChats;
+      }
+
+      return {
+        ...prevChats,
+        [id]: { ...prevChats[id], pinnedDocumentIds: documentIds },
+      };
+    });
+  }
+
   // Handle session expiration by creating a new chat
   function handleSessionExpired(expiredChatId: string) {
     console.log("Session expired for chat:", expiredChatId);
@@ -134,6 +152,36 @@ function App() {
     fetchInitialDocs();
   }, []);
 
+  // Apply pushed ingestion status changes instead of re-listing documents
+  useEffect(() => {
+    if (!isRealtimeEnabled()) return;
+
+    const unsubscribe = subscribeRealtime((message) => {
+      if (message.type !== "document.status") return;
+
+      setDocumentList((documents) =>
+        documents.map((doc) =>
+          doc.s3Key === message.s3Key
+            ? {
+                ...doc,
+                status: message.status,
+                statusReason: message.statusReason,
+                updatedAt: message.updatedAt ?? doc.updatedAt,
+              }
+            : doc
+        )
+      );
+    });
+
+    sendRealtimeMessage({ action: "subscribe", topics: ["documents"] }).catch(
+      (error) => console.error("Failed to subscribe to document status:", error)
+    );
+
+    return () => {
+      unsubscribe();
+    };
+  }, []);
+
   return (
     <div className="app-container">
       <div className="sidebar">
@@ -158,6 +206,8 @@ function App() {
             selectedChat={chats[selectedChatId]}
             handleUpdateChatMessageList={handleUpdateChatMessageList}
             onSessionExpired={handleSessionExpired}
+            documentList={documentList}
+            handlePinDocuments={handlePinDocuments}
           />
         ) : (
           <div>Select a chat to get started</div>
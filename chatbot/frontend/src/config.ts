@@ -3,3 +3,11 @@ export const API_BASE_URL =
   import.meta.env.VITE_API_URL ||
   "https://werewrwer.execute-api.us-east-1.amazonaws.com/chatbot";
 // replace with your own API for local development
+
+// Run chat requests as background jobs and poll for the answer, avoids the
+// API Gateway 29s limit on long answers
+export const CHAT_ASYNC_MODE = import.meta.env.VITE_CHAT_ASYNC_MODE === "true";
+
+// WebSocket API used for chat answer chunks and document status push,
+// falls back to plain REST requests when not set
+export const WEBSOCKET_URL = import.meta.env.VITE_WEBSOCKET_URL || "";
@@ -0,0 +1,71 @@
+import {
+  act,
+  cleanup,
+  fireEvent,
+  render,
+  screen,
+} from "@testing-library/react";
+import { afterEach, expect, it, vi } from "vitest";
+import type { ChatObject, MessageObject } from "../../types";
+import Chat from "./Chat";
+import { getAssistantResponse } from "./services/ChatApi";
+
+vi.mock("./services/ChatApi", () => ({ getAssistantResponse: vi.fn() }));
+
+afterEach(cleanup);
+
+const chat: ChatObject = {
+  id: "chat-1",
+  title: "Refunds",
+  messages: [],
+  createdAt: new Date(),
+  updatedAt: new Date(),
+};
+
+it("shows streamed answer chunks before the answer completes", async () => {
+  let complete!: (response: {
+    message: MessageObject;
+    sessionId: string;
+  }) => void;
+  vi.mocked(getAssistantResponse).mockImplementation(
+    (_messages, _sessionId, onDelta) => {
+      onDelta?.("Refunds take ");
+      onDelta?.("5 days.");
+      return new Promise((resolve) => {
+        complete = resolve;
+      });
+    }
+  );
+  const handleUpdateChatMessageList = vi.fn();
+
+  render(
+    <Chat
+      selectedChat={chat}
+      handleUpdateChatMessageList={handleUpdateChatMessageList}
+      documentList={[]}
+      handlePinDocuments={vi.fn()}
+    />
+  );
+  const input = screen.getByPlaceholderText("How can I help you today?");
+  fireEvent.change(input, { target: { value: "How long do refunds take?" } });
+  fireEvent.keyDown(input, { key: "Enter" });
+
+  expect(await screen.findByText("Refunds take 5 days.")).toBeTruthy();
+
+  const answer: MessageObject = {
+    id: "answer-1",
+    role: "ASSISTANT",
+    content: "Refunds take 5 days.",
+    citation: [],
+    timestamp: new Date(),
+  };
+  await act(async () => complete({ message: answer, sessionId: "session-1" }));
+
+  // The completed answer goes to the chat, the streamed copy is dropped
+  expect(handleUpdateChatMessageList).toHaveBeenLastCalledWith(
+    "chat-1",
+    answer,
+    "session-1"
+  );
+  expect(screen.queryByText("Refunds take 5 days.")).toBeNull();
+});
@@ -1,6 +1,7 @@
 import { useState } from "react";
-import type { ChatObject, MessageObject } from "../../types";
+import type { ChatObject, DocumentObject, MessageObject } from "../../types";
 import MessageList from "./components/MessageList";
+import DocumentScope from "./components/DocumentScope";
 import { getAssistantResponse } from "./services/ChatApi";
 import ChatInputBox from "./components/InputBox";
 import { generateUUID } from "../../utils/uuid";
@@ -13,16 +14,25 @@ interface ChatProps {
     sessionId?: string
   ) => void;
   onSessionExpired?: (chatId: string) => void;
+  documentList: DocumentObject[];
+  handlePinDocuments: (id: string, documentIds: string[]) => void;
 }
 
 export default function Chat({
   selectedChat,
   handleUpdateChatMessageList,
   onSessionExpired,
+  documentList,
+  handlePinDocuments,
 }: ChatProps) {
   const [inputBoxValue, setInputBoxValue] = useState<string>("");
   const [isLoading, setIsLoading] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
+  // Answer chunks pushed over the WebSocket while the answer is generated
+  const [streamingAnswer, setStreamingAnswer] = useState<{
+    chatId: string;
+    content: string;
+  } | null>(null);
 
   function handleSetInputBox(userInput: string) {
     setInputBoxValue(userInput);
@@ -47,10 +57,19 @@ export default function Chat({
       // Prepare messages for backend (include the new user message)
       const updatedMessages = [...selectedChat.messages, newMessage];
 
-      // Send request with current sessionId
+      // Send request with current sessionId, scoped to any pinned documents
+      const pinnedDocumentIds = selectedChat.pinnedDocumentIds ?? [];
       const response = await getAssistantResponse(
         updatedMessages,
-        selectedChat.sessionId
+        selectedChat.sessionId,
+        (text) =>
+          setStreamingAnswer((streaming) => ({
+            chatId,
+            content: (streaming?.content ?? "") + text,
+          })),
+        pinnedDocumentIds.length > 0
+          ? { documentIds: pinnedDocumentIds }
+          : undefined
       );
 
       // Only update if we're still on the same chat
@@ -79,13 +98,37 @@ export default function Chat({
       }
     } finally {
       setIsLoading(false);
+      setStreamingAnswer(null);
     }
   }
 
+  // Shown after the chat's messages until the completed answer replaces it
+  const messages =
+    streamingAnswer && streamingAnswer.chatId === selectedChat.id
+      ? [
+          ...selectedChat.messages,
+          {
+            id: "streaming-answer",
+            role: "ASSISTANT" as const,
+            content: streamingAnswer.content,
+            citation: [],
+            timestamp: new Date(),
+          },
+        ]
+      : selectedChat.messages;
+
   return (
     <div className="chat-container">
       <div className="chat-header">{selectedChat.title}</div>
 
+      <DocumentScope
+        documentList={documentList}
+        pinnedDocumentIds={selectedChat.pinnedDocumentIds ?? []}
+        onChange={(documentIds) =>
+          handlePinDocuments(selectedChat.id, documentIds)
+        }
+      />
+
       {error && (
         <div className="error-banner">
           <span className="error-text">{error}</span>
@@ -96,7 +139,7 @@ export default function Chat({
       )}
 
       <div className="chat-message-list" id="ChatMessageList">
-        <MessageList messages={selectedChat.messages} />
+        <MessageList messages={messages} />
       </div>
 
       <ChatInputBox
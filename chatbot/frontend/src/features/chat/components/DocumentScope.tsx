@@ -0,0 +1,59 @@
+import { Pin } from "lucide-react";
+import type { DocumentObject } from "../../../types";
+
+interface DocumentScopeProps {
+  documentList: DocumentObject[];
+  pinnedDocumentIds: string[];
+  onChange: (documentIds: string[]) => void;
+}
+
+export default function DocumentScope({
+  documentList,
+  pinnedDocumentIds,
+  onChange,
+}: DocumentScopeProps) {
+  // Only indexed documents carry the metadata the retrieval filter matches on
+  const pinnableDocuments = documentList.filter(
+    (doc) => doc.status === "INDEXED"
+  );
+
+  if (pinnableDocuments.length === 0) {
+    return null;
+  }
+
+  function handleToggle(documentId: string) {
+    if (pinnedDocumentIds.includes(documentId)) {
+      onChange(pinnedDocumentIds.filter((id) => id !== documentId));
+    } else {
+      onChange([...pinnedDocumentIds, documentId]);
+    }
+  }
+
+  return (
+    <details className="document-scope">
+      <summary>
+        <Pin size={14} />
+        {pinnedDocumentIds.length > 0
+          ? `Searching ${pinnedDocumentIds.length} pinned document(s)`
+          : "Searching all documents"}
+      </summary>
+      <div className="document-scope-list">
+        {pinnableDocuments.map((doc) => (
+          <label key={doc.id} className="document-scope-item">
+            <input
+              type="checkbox"
+              checked={pinnedDocumentIds.includes(doc.id)}
+              onChange={() => handleToggle(doc.id)}
+            />
+            {doc.displayName}
+          </label>
+        ))}
+      </div>
+      {pinnedDocumentIds.length > 0 && (
+        <button className="document-scope-clear" onClick={() => onChange([])}>
+          Clear pins
+        </button>
+      )}
+    </details>
+  );
+}
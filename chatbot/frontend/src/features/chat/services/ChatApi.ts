@@ -1,5 +1,10 @@
-import type { MessageObject } from "../../../types";
-import { API_BASE_URL } from "../../../config";
+import type { ChatScope, MessageObject } from "../../../types";
+import { API_BASE_URL, CHAT_ASYNC_MODE } from "../../../config";
+import {
+  isRealtimeEnabled,
+  sendRealtimeMessage,
+  subscribeRealtime,
+} from "../../../utils/realtime";
 
 interface ChatApiResponse {
   message: MessageObject;
@@ -8,9 +13,22 @@ interface ChatApiResponse {
 
 export async function getAssistantResponse(
   messages: MessageObject[],
-  sessionId?: string
+  sessionId?: string,
+  onDelta?: (text: string) => void,
+  scope?: ChatScope
 ): Promise<ChatApiResponse> {
   try {
+    if (isRealtimeEnabled()) {
+      return toChatApiResponse(
+        await getAssistantResponseOverWebSocket(
+          messages,
+          sessionId,
+          onDelta,
+          scope
+        )
+      );
+    }
+
     const requestPayload: any = {
       messages: messages,
     };
@@ -20,6 +38,15 @@ export async function getAssistantResponse(
       requestPayload.sessionId = sessionId;
     }
 
+    // Restrict retrieval to pinned documents or tags
+    if (scope) {
+      requestPayload.scope = scope;
+    }
+
+    if (CHAT_ASYNC_MODE) {
+      requestPayload.async = true;
+    }
+
     const response = await fetch(`${API_BASE_URL}/chat`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
@@ -36,28 +63,102 @@ export async function getAssistantResponse(
       throw new Error(errorData.message || `HTTP Error: ${response.status}`);
     }
 
-    const data = await response.json();
+    let data = await response.json();
+
+    if (response.status === 202) {
+      data = await waitForChatJob(data.jobId);
+    }
 
     // Handle your backend's response structure
     if (data.statusCode !== 200) {
       throw new Error(data.message || "Backend returned error");
     }
 
-    // Convert backend response to frontend format
-    const assistantMessage: MessageObject = {
-      id: data.assistantMessage.id,
-      role: data.assistantMessage.role,
-      content: data.assistantMessage.content,
-      citation: data.assistantMessage.citation || [],
-      timestamp: new Date(data.assistantMessage.timestamp),
-    };
-
-    return {
-      message: assistantMessage,
-      sessionId: data.sessionId,
-    };
+    return toChatApiResponse(data);
   } catch (error) {
     console.error("Error in getAssistantResponse:", error);
     throw error;
   }
 }
+
+const CHAT_JOB_POLL_INTERVAL_MS = 1000;
+
+async function waitForChatJob(jobId: string) {
+  while (true) {
+    await new Promise((resolve) =>
+      setTimeout(resolve, CHAT_JOB_POLL_INTERVAL_MS)
+    );
+
+    const response = await fetch(`${API_BASE_URL}/chat/status`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ jobId }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP Error: ${response.status}`);
+    }
+
+    const data = await response.json();
+
+    if (data.status === "SUCCEEDED") {
+      return data;
+    }
+    if (data.status === "FAILED") {
+      throw new Error(data.error || "Chat job failed");
+    }
+  }
+}
+
+function toChatApiResponse(data: any): ChatApiResponse {
+  // Convert backend response to frontend format
+  const assistantMessage: MessageObject = {
+    id: data.assistantMessage.id,
+    role: data.assistantMessage.role,
+    content: data.assistantMessage.content,
+    citation: data.assistantMessage.citation || [],
+    timestamp: new Date(data.assistantMessage.timestamp),
+  };
+
+  return {
+    message: assistantMessage,
+    sessionId: data.sessionId,
+  };
+}
+
+function getAssistantResponseOverWebSocket(
+  messages: MessageObject[],
+  sessionId?: string,
+  onDelta?: (text: string) => void,
+  scope?: ChatScope
+): Promise<any> {
+  return new Promise((resolve, reject) => {
+    let jobId: string | null = null;
+
+    const unsubscribe = subscribeRealtime((message) => {
+      // The first accepted job on this socket after sending is ours
+      if (message.type === "chat.accepted" && jobId === null) {
+        jobId = message.jobId;
+        return;
+      }
+      if (message.jobId !== jobId) return;
+
+      if (message.type === "chat.delta") {
+        onDelta?.(message.text);
+      } else if (message.type === "chat.completed") {
+        unsubscribe();
+        resolve(message);
+      } else if (message.type === "chat.failed") {
+        unsubscribe();
+        reject(new Error(message.error || "Chat job failed"));
+      }
+    });
+
+    sendRealtimeMessage({ action: "chat", messages, sessionId, scope }).catch(
+      (error) => {
+        unsubscribe();
+        reject(error);
+      }
+    );
+  });
+}
@@ -85,14 +85,51 @@ export const deleteDocuments = async (
       throw new Error(`HTTP error! status: ${response.status}`);
     }
 
-    const data: DeleteDocumentsResponse = await response.json();
-    return data;
+    const data = await response.json();
+
+    // Large deletes run as a background job, wait for it to finish
+    if (response.status === 202) {
+      return await waitForDeleteJob(data.jobId);
+    }
+
+    return data as DeleteDocumentsResponse;
   } catch (error) {
     console.error("Failed to delete documents:", error);
     throw new Error("Failed to delete documents. Please try again.");
   }
 };
 
+const DELETE_JOB_POLL_INTERVAL_MS = 2000;
+
+const waitForDeleteJob = async (
+  jobId: string
+): Promise<DeleteDocumentsResponse> => {
+  while (true) {
+    await new Promise((resolve) =>
+      setTimeout(resolve, DELETE_JOB_POLL_INTERVAL_MS)
+    );
+
+    const response = await fetch(`${API_BASE_URL}/documents/delete/status`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ jobId }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+
+    if (data.status === "SUCCEEDED") {
+      return data as DeleteDocumentsResponse;
+    }
+    if (data.status === "FAILED") {
+      throw new Error(data.error || "Delete job failed");
+    }
+  }
+};
+
 export const triggerSyncKnowledgeBase = async () => {
   const response = await fetch(`${API_BASE_URL}/documents/sync`, {
     method: "POST",
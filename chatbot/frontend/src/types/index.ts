@@ -37,11 +37,18 @@ export interface ChatObject {
   createdAt: Date;
   updatedAt: Date;
   sessionId?: string;
+  pinnedDocumentIds?: string[];
+}
+
+export interface ChatScope {
+  documentIds?: string[];
+  tags?: string[];
 }
 
 export interface ChatRequest {
   messages: MessageObject[];
   sessionId?: string;
+  scope?: ChatScope;
 }
 
 export interface DocumentObject {
@@ -0,0 +1,42 @@
+import { WEBSOCKET_URL } from "../config";
+
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+export type RealtimeMessage = { type: string; [key: string]: any };
+type Listener = (message: RealtimeMessage) => void;
+
+const listeners = new Set<Listener>();
+let connection: Promise<WebSocket> | null = null;
+
+export function isRealtimeEnabled(): boolean {
+  return Boolean(WEBSOCKET_URL);
+}
+
+function connect(): Promise<WebSocket> {
+  if (connection) return connection;
+
+  connection = new Promise((resolve, reject) => {
+    const socket = new WebSocket(WEBSOCKET_URL);
+
+    socket.onopen = () => resolve(socket);
+    socket.onerror = (error) => reject(error);
+    socket.onclose = () => {
+      connection = null;
+    };
+    socket.onmessage = (event) => {
+      const message: RealtimeMessage = JSON.parse(event.data);
+      listeners.forEach((listener) => listener(message));
+    };
+  });
+
+  return connection;
+}
+
+export async function sendRealtimeMessage(message: object) {
+  const socket = await connect();
+  socket.send(JSON.stringify(message));
+}
+
+export function subscribeRealtime(listener: Listener): () => void {
+  listeners.add(listener);
+  return () => listeners.delete(listener);
+}
@@ -51,6 +51,10 @@ cdk destroy "${PROJECT_NAME}-FrontendStack" --app "python frontend_app.py" --for
 echo "Destroying API Gateway stack..."
 cdk destroy "${PROJECT_NAME}-ApiGatewayStack" --force || true
 
+# Destroy WebSocket stack
+echo "Destroying WebSocket stack..."
+cdk destroy "${PROJECT_NAME}-WebSocketStack" --force || true
+
 # Destroy Bedrock stack
 echo "Destroying Bedrock stack..."
 cdk destroy "${PROJECT_NAME}-BedrockStack" --force || true
@@ -63,6 +67,10 @@ cdk destroy "${PROJECT_NAME}-LayerStack" --force || true
 echo "Destroying IAM roles stack..."
 cdk destroy "${PROJECT_NAME}-RoleStack" --force || true
 
+# Destroy DynamoDB stack
+echo "Destroying DynamoDB stack..."
+cdk destroy "${PROJECT_NAME}-DynamoDBStack" --force || true
+
 # Destroy S3 stack last (empty buckets first)
 echo "Destroying S3 stack..."
 empty_bucket "${PROJECT_NAME}-S3Stack"
@@ -36,9 +36,11 @@ echo "📦 Deploying backend stacks..."
 cd chatbot/backend
 cdk deploy \
   "${PROJECT_NAME}-S3Stack" \
+  "${PROJECT_NAME}-DynamoDBStack" \
   "${PROJECT_NAME}-RoleStack" \
   "${PROJECT_NAME}-LayerStack" \
   "${PROJECT_NAME}-BedrockStack" \
+  "${PROJECT_NAME}-WebSocketStack" \
   "${PROJECT_NAME}-ApiGatewayStack" \
   --exclusively \
   --require-approval never
@@ -62,18 +64,27 @@ fi
 
 echo "✅ Found API URL: $API_URL"
 
+WEBSOCKET_URL=$(aws cloudformation describe-stacks \
+  --stack-name "${PROJECT_NAME}-WebSocketStack" \
+  --query 'Stacks[0].Outputs[?OutputKey==`WebSocketUrl`].OutputValue' \
+  --output text)
+
+echo "✅ Found WebSocket URL: $WEBSOCKET_URL"
+
 # Step 3: Deploy frontend with the actual API URL using separate app
 echo "🌐 Deploying frontend stack with API URL..."
 if [ -n "$ALLOWED_IP" ]; then
   cdk deploy "${PROJECT_NAME}-FrontendStack" \
     --app "python frontend_app.py" \
     -c api_url="$API_URL" \
+    -c websocket_url="$WEBSOCKET_URL" \
     -c allowed_ip="$ALLOWED_IP" \
     --require-approval never
 else
   cdk deploy "${PROJECT_NAME}-FrontendStack" \
     --app "python frontend_app.py" \
     -c api_url="$API_URL" \
+    -c websocket_url="$WEBSOCKET_URL" \
     --require-approval never
 fi
 